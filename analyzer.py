@@ -0,0 +1,423 @@
+"""
+Офлайн-анализ накопленных архивов archive_*.zip / bundle_*.zip.
+
+Записи читаются потоково прямо из членов ZIP (без распаковки на диск и без загрузки
+файлов целиком), по каждому архиву считаются агрегаты фиксированного размера,
+архивы обрабатываются параллельно в нескольких процессах.
+
+Запуск:
+    python analyzer.py sending/
+    python analyzer.py sending/ archive/ --workers 4 --json > report.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import zipfile
+import zlib
+
+import clock
+import framestream
+
+# Сбои из соседних архивов склеиваются, если между ними не больше этого промежутка
+MERGE_GAP_SECS = 120
+
+
+def rtt_bucket(rtt):
+    """
+    Корзина гистограммы RTT: 1 мс до 1 секунды, дальше по 100 мс.
+    Гистограмма ограничена по размеру независимо от количества проб.
+    """
+    if rtt < 1000:
+        return int(rtt)
+    return 1000 + int((rtt - 1000) // 100) * 100
+
+
+def histogram_percentile(histogram, pct):
+    """
+    Перцентиль по гистограмме {корзина: количество}.
+    """
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = total * pct / 100
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= rank:
+            return bucket
+    return max(histogram)
+
+
+def active_interface(record):
+    """
+    Интерфейс, через который шла проверка: тот, у которого есть шлюз по умолчанию.
+    """
+    interfaces = (record.get('network_info') or {}).get('interfaces') or []
+    for iface in interfaces:
+        if iface.get('gateway'):
+            return iface.get('name') or 'unknown'
+    return 'unknown'
+
+
+class Report:
+    """
+    Агрегаты по ключу (день, цель, интерфейс). Размер не зависит от количества записей.
+    """
+
+    def __init__(self):
+        self.groups = {}
+        self.path_changes = {}
+        self.faults = {}
+        self.records = 0
+
+    def group(self, day, target, interface):
+        key = (day, target, interface)
+        group = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = {"probes": 0, "sent": 0, "reached": 0, "failed_probes": 0, "rtt": {}}
+        return group
+
+    def add_probe(self, day, target, interface, sent, reached, times, weight=1):
+        group = self.group(day, target, interface)
+        group["probes"] += 1
+        group["sent"] += sent
+        group["reached"] += reached
+        if not reached:
+            group["failed_probes"] += 1
+        for rtt in times:
+            bucket = rtt_bucket(rtt)
+            group["rtt"][bucket] = group["rtt"].get(bucket, 0) + weight
+
+    def add_path_change(self, day, target):
+        key = (day, target)
+        self.path_changes[key] = self.path_changes.get(key, 0) + 1
+
+    def add_fault(self, day, target, fault):
+        faults = self.faults.setdefault((day, target), {})
+        faults[fault] = faults.get(fault, 0) + 1
+
+    def merge(self, other):
+        self.records += other.records
+        for key, src in other.groups.items():
+            dst = self.group(*key)
+            for field in ("probes", "sent", "reached", "failed_probes"):
+                dst[field] += src[field]
+            for bucket, count in src["rtt"].items():
+                dst["rtt"][bucket] = dst["rtt"].get(bucket, 0) + count
+        for key, count in other.path_changes.items():
+            self.path_changes[key] = self.path_changes.get(key, 0) + count
+        for key, faults in other.faults.items():
+            dst = self.faults.setdefault(key, {})
+            for fault, count in faults.items():
+                dst[fault] = dst.get(fault, 0) + count
+
+
+class Segment:
+    """
+    Последовательность проб одной цели из одного файла ping: интервалы сбоев
+    и флаги того, что сбой продолжался на границах файла (для склейки между архивами).
+    Метки проб - мс эпохи.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.first = None
+        self.last = None
+        self.outages = []
+        self.open_start = False
+        self.current = None
+
+    def feed(self, stamp, ok):
+        if self.first is None:
+            self.first = stamp
+            self.open_start = not ok
+        self.last = stamp
+        if not ok:
+            if self.current is None:
+                self.current = [stamp, stamp, 0]
+            self.current[1] = stamp
+            self.current[2] += 1
+        elif self.current is not None:
+            self.current[1] = stamp
+            self.outages.append(self.current)
+            self.current = None
+
+    def close(self):
+        open_end = self.current is not None
+        if open_end:
+            self.outages.append(self.current)
+            self.current = None
+        return {
+            "target": self.target,
+            "first": self.first,
+            "last": self.last,
+            "outages": self.outages,
+            "open_start": self.open_start,
+            "open_end": open_end
+        }
+
+
+def member_stamp(name):
+    """
+    Метка ротации из имени члена архива: ping_<stamp>.jsonl.gz -> <stamp>.
+    """
+    return name.split('_', 1)[1].split('.', 1)[0]
+
+
+def member_target(name):
+    """
+    Тег цели из метки (<date>_<time>_<tag>), если клиент следил за несколькими целями.
+    """
+    parts = member_stamp(name).split('_', 2)
+    return parts[2] if len(parts) == 3 else None
+
+
+def iter_members(archive):
+    """
+    Потоково читает записи интересующих членов архива.
+
+    :param archive: Открытый zipfile.ZipFile (archive_*.zip или bundle_*.zip).
+    :return: Генератор (тип потока, имя члена, запись).
+    """
+    # Сначала ping: из них берётся цель для файлов без поля target (losses)
+    for info in sorted(archive.infolist(), key=lambda i: (not i.filename.startswith('ping_'), i.filename)):
+        name = info.filename
+        kind = name.split('_', 1)[0]
+        if kind not in ('ping', 'paths', 'rollup', 'losses', 'uplinks'):
+            continue
+        with archive.open(info) as f:
+            if kind in ('rollup', 'losses'):
+                yield kind, name, json.load(f)
+            else:
+                for record in framestream.iter_records(f, name):
+                    yield kind, name, record
+
+
+def analyze_archive(path):
+    """
+    Считает агрегаты одного архива (выполняется в процессе пула).
+
+    Если для метки есть свёртка (rollup), потери и задержки берутся из её поминутных
+    агрегатов, а оставшиеся записи ping используются только для поиска сбоев.
+
+    :param path: Путь к архиву.
+    :return: Кортеж (путь, Report или None, список сегментов, ошибка или None).
+    """
+    report = Report()
+    segments = []
+    segment = None
+    segment_member = None
+    stamp_targets = {}
+    try:
+        with zipfile.ZipFile(path) as archive:
+            rolled = {member_stamp(n) for n in archive.namelist() if n.startswith('rollup_')}
+            for kind, name, record in iter_members(archive):
+                report.records += 1
+                stamp = member_stamp(name)
+                target = record.get('target') or stamp_targets.get(stamp) or member_target(name) or 'default'
+                if kind == 'ping':
+                    stamp_targets.setdefault(stamp, target)
+                    if segment is None or segment_member != name or segment.target != target:
+                        if segment is not None:
+                            segments.append(segment.close())
+                        segment = Segment(target)
+                        segment_member = name
+                    times = record.get('times_ms') or []
+                    record_ms = clock.to_ms(record['stamp'])
+                    segment.feed(record_ms, bool(times))
+                    if stamp not in rolled:
+                        sent = record.get('sent', max(len(times), 1))
+                        report.add_probe(
+                            clock.local_day(record_ms), target, active_interface(record), sent, len(times), times
+                        )
+                elif kind == 'uplinks':
+                    # Пробы через отдельные каналы - своей строкой на интерфейс, в сбои не входят
+                    times = record.get('times_ms') or []
+                    report.add_probe(
+                        clock.local_day(clock.to_ms(record['stamp'])), target, f"uplink:{record.get('interface')}",
+                        record.get('sent', max(len(times), 1)), len(times), times
+                    )
+                elif kind == 'paths':
+                    report.add_path_change(clock.local_day(clock.to_ms(record['stamp'])), target)
+                elif kind == 'losses':
+                    # Классы сбоев по минутам (локализация потерь)
+                    for minute, counters in record.items():
+                        if isinstance(counters, dict) and counters.get('fault'):
+                            report.add_fault(clock.local_day(clock.parse_minute_key(minute)), target, counters['fault'])
+                elif kind == 'rollup':
+                    # Распределение задержек внутри минуты не сохраняется, берём медиану с весом дошедших
+                    for minute, stats in (record.get('minutes') or {}).items():
+                        times = [stats['rtt_p50']] if stats.get('rtt_p50') is not None else []
+                        report.add_probe(
+                            clock.local_day(clock.parse_minute_key(minute)), target, 'unknown', stats.get('packets', 0), stats.get('reached', 0),
+                            times, weight=stats.get('reached', 0)
+                        )
+        if segment is not None:
+            segments.append(segment.close())
+    except (zipfile.BadZipFile, zlib.error, OSError, EOFError, ValueError, KeyError) as e:
+        return path, None, [], str(e)
+    return path, report, segments, None
+
+
+def merge_outages(segments, merge_gap=MERGE_GAP_SECS):
+    """
+    Склеивает сбои, продолжавшиеся через границы файлов и архивов.
+
+    :param segments: Сегменты всех архивов.
+    :param merge_gap: Максимальный разрыв между сегментами для склейки, сек.
+    :return: Список сбоев {"target", "start", "end", "failed_probes", "duration_secs"}, start и end - ISO.
+    """
+    by_target = {}
+    for segment in segments:
+        if segment["first"] is not None:
+            by_target.setdefault(segment["target"], []).append(segment)
+
+    result = []
+    for target, target_segments in sorted(by_target.items()):
+        target_segments.sort(key=lambda s: s["first"])
+        merged = []
+        previous = None
+        for segment in target_segments:
+            outages = [list(o) for o in segment["outages"]]
+            if (
+                    outages and segment["open_start"] and previous is not None and previous["open_end"]
+                    and segment["first"] - previous["last"] <= merge_gap * 1000
+            ):
+                # Сбой начался в предыдущем сегменте: продлеваем его
+                first = outages.pop(0)
+                merged[-1][1] = first[1]
+                merged[-1][2] += first[2]
+            merged.extend(outages)
+            previous = segment
+
+        for start, end, failed in merged:
+            result.append({
+                "target": target,
+                "start": clock.to_iso(start),
+                "end": clock.to_iso(end),
+                "failed_probes": failed,
+                "duration_secs": round((end - start) / 1000, 1)
+            })
+    return result
+
+
+def find_archives(paths):
+    """
+    Архивы из списка файлов и каталогов (каталоги просматриваются без рекурсии).
+    """
+    archives = []
+    for path in paths:
+        if os.path.isdir(path):
+            archives.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.endswith('.zip') and name.startswith(('archive_', 'bundle_'))
+            )
+        else:
+            archives.append(path)
+    return archives
+
+
+def analyze(paths, workers=None):
+    """
+    Анализирует архивы параллельно и сводит результаты.
+
+    Каждый процесс возвращает агрегаты фиксированного размера, поэтому память главного
+    процесса не растёт с объёмом записей.
+
+    :param paths: Файлы архивов и/или каталоги с ними.
+    :param workers: Количество процессов (по умолчанию по числу CPU).
+    :return: dict отчёта.
+    """
+    archives = find_archives(paths)
+    total = Report()
+    segments = []
+    errors = []
+    workers = max(1, min(workers or os.cpu_count() or 1, len(archives) or 1))
+
+    if workers == 1:
+        results = map(analyze_archive, archives)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers)
+        results = pool.imap_unordered(analyze_archive, archives)
+    try:
+        for path, report, archive_segments, error in results:
+            if error is not None:
+                errors.append({"archive": path, "error": error})
+                continue
+            total.merge(report)
+            segments.extend(archive_segments)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    groups = []
+    for (day, target, interface), group in sorted(total.groups.items()):
+        sent = group["sent"]
+        groups.append({
+            "day": day,
+            "target": target,
+            "interface": interface,
+            "probes": group["probes"],
+            "failed_probes": group["failed_probes"],
+            "sent": sent,
+            "reached": group["reached"],
+            "loss_pct": round(100 * (sent - group["reached"]) / sent, 2) if sent else None,
+            "rtt_p50": histogram_percentile(group["rtt"], 50),
+            "rtt_p90": histogram_percentile(group["rtt"], 90),
+            "rtt_p99": histogram_percentile(group["rtt"], 99),
+            "path_changes": total.path_changes.get((day, target), 0),
+            "faults": total.faults.get((day, target), {})
+        })
+
+    return {
+        "archives": len(archives),
+        "records": total.records,
+        "groups": groups,
+        "outages": merge_outages(segments),
+        "errors": errors
+    }
+
+
+def print_report(report):
+    print(f"Архивов: {report['archives']}, записей: {report['records']}")
+    print()
+    print(f"{'День':<10}  {'Цель':<20}  {'Интерфейс':<12}  {'Отпр.':>7}  {'Потери %':>8}  "
+          f"{'p50':>6}  {'p90':>6}  {'p99':>6}  {'Маршр.':>6}  Сбои (мин.)")
+    for g in report["groups"]:
+        print(
+            f"{g['day']:<10}  {g['target']:<20}  {g['interface']:<12}  {g['sent']:>7}  "
+            f"{g['loss_pct'] if g['loss_pct'] is not None else '-':>8}  "
+            f"{g['rtt_p50'] if g['rtt_p50'] is not None else '-':>6}  "
+            f"{g['rtt_p90'] if g['rtt_p90'] is not None else '-':>6}  "
+            f"{g['rtt_p99'] if g['rtt_p99'] is not None else '-':>6}  {g['path_changes']:>6}  "
+            f"{', '.join(f'{k}: {v}' for k, v in sorted(g['faults'].items())) or '-'}"
+        )
+    print()
+    print(f"Сбоев: {len(report['outages'])}")
+    for o in report["outages"]:
+        print(f"  {o['target']}: {o['start']} - {o['end']} ({o['duration_secs']} с, проб без ответа {o['failed_probes']})")
+    for e in report["errors"]:
+        print(f"Ошибка чтения {e['archive']}: {e['error']}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн-анализ архивов ethercheck")
+    parser.add_argument('paths', nargs='+', help="Архивы или каталоги с архивами")
+    parser.add_argument('--workers', type=int, default=None, help="Количество процессов")
+    parser.add_argument('--json', action='store_true', help="Вывести отчёт в JSON")
+    args = parser.parse_args()
+
+    report = analyze(args.paths, args.workers)
+    if args.json:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Бенчмарк теста задержки под нагрузкой (loadtest) на локальной заглушке.
+
+Заглушка изображает узкое место канала: общий буфер размером --buffer, который разгружается
+со скоростью --bandwidth. Данные скачивания (/download) и отправки (/upload) проходят через буфер,
+а ответ на пробу задержки (/ping) задерживается на время разгрузки того, что в буфере уже лежит, -
+как пакеты, стоящие в очереди переполненного буфера роутера.
+
+Проба задержки - та же HTTP-проба клиента (tcpprobe), в качестве RTT берётся время до первого байта.
+Выводит RTT на свободном канале и под нагрузкой, прирост задержки и достигнутую скорость:
+по счёту клиента (как в записи load) и по байтам, прошедшим через узкое место. При отправке
+клиент считает байты целыми запросами, поэтому на коротком тесте расхождение больше.
+
+Запуск:
+    python bench/bufferbloat_bench.py
+    python bench/bufferbloat_bench.py --bandwidth 2000000 --buffer 65536 1048576 --streams 4
+    python bench/bufferbloat_bench.py --mode upload
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('room', 'bench')
+
+from aiohttp import web  # noqa: E402
+
+import config  # noqa: E402
+import loadtest  # noqa: E402
+import tcpprobe  # noqa: E402
+
+logging.getLogger('aiohttp.server').setLevel(logging.CRITICAL)
+
+RECEIVE_BUFFER_BYTES = 64 * 1024
+
+
+class BottleneckLink:
+    """
+    Очередь перед узким местом: байты ждут в буфере и уходят со скоростью bandwidth.
+    """
+
+    def __init__(self, bandwidth, buffer_bytes):
+        self.bandwidth = bandwidth
+        self.buffer_bytes = buffer_bytes
+        self.queued = 0.0
+        self.delivered = 0
+        self.updated = time.monotonic()
+
+    def drain(self):
+        now = time.monotonic()
+        self.queued = max(0.0, self.queued - (now - self.updated) * self.bandwidth)
+        self.updated = now
+
+    async def send(self, size):
+        self.drain()
+        # Пустой буфер принимает кусок любого размера
+        while self.queued and self.queued + size > self.buffer_bytes:
+            await asyncio.sleep((self.queued + size - self.buffer_bytes) / self.bandwidth)
+            self.drain()
+        self.queued += size
+        self.delivered += size
+
+    def queue_delay(self):
+        self.drain()
+        return self.queued / self.bandwidth
+
+
+class StandInServer:
+    def __init__(self, link, base_rtt, download_bytes):
+        self.link = link
+        self.base_rtt = base_rtt
+        self.download_bytes = download_bytes
+
+    async def ping(self, request):
+        await asyncio.sleep(self.base_rtt + self.link.queue_delay())
+        return web.Response(text='pong')
+
+    async def download(self, request):
+        response = web.StreamResponse()
+        await response.prepare(request)
+        chunk = bytes(loadtest.CHUNK_BYTES)
+        try:
+            for _ in range(self.download_bytes // len(chunk)):
+                await self.link.send(len(chunk))
+                await response.write(chunk)
+            await response.write_eof()
+        except ConnectionError:
+            pass  # клиент закрыл поток по окончании нагрузки
+        return response
+
+    async def upload(self, request):
+        try:
+            async for chunk in request.content.iter_chunked(loadtest.CHUNK_BYTES):
+                await self.link.send(len(chunk))
+        except ConnectionError:
+            pass
+        return web.Response(text='ok')
+
+    async def start(self, port):
+        app = web.Application(client_max_size=1 << 30)
+        app.router.add_route('*', '/ping', self.ping)
+        app.router.add_get('/download', self.download)
+        app.router.add_post('/upload', self.upload)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        # Маленький приёмный буфер, как окно TCP на настоящем канале: иначе буферы loopback
+        # вмещают мегабайты и очередь перед узким местом почти не видна
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_BYTES)
+        sock.bind(('127.0.0.1', port))
+        await web.SockSite(runner, sock).start()
+        return runner
+
+
+async def probe_ttfb(target):
+    """
+    Одна HTTP-проба; RTT - время до первого байта ответа.
+    """
+    record = await tcpprobe.probe(target, 1, timeout=5)
+    return {"sent": record["sent"], "times_ms": record.get("ttfb_ms") or []}
+
+
+async def run(args):
+    print(
+        f"Полоса {args.bandwidth / 1e6 * 8:.1f} Мбит/с, базовый RTT {args.base_rtt * 1000:.0f} мс, "
+        f"{args.mode}, {args.streams} потоков, нагрузка {args.duration} с"
+    )
+    print(f"{'буфер КБ':>9} {'idle p50':>9} {'idle p99':>9} {'load p50':>9} {'load p99':>9} {'прирост':>8} {'Мбит/с':>7} {'узкое м.':>8}")
+    port = args.port
+    for buffer_bytes in args.buffer:
+        link = BottleneckLink(args.bandwidth, buffer_bytes)
+        server = StandInServer(link, args.base_rtt, 64 * 1024 * 1024)
+        runner = await server.start(port)
+        try:
+            cfg = config.LoadTestConfig(
+                enabled=True,
+                url=f'http://127.0.0.1:{port}/{args.mode}',
+                mode=args.mode,
+                streams=args.streams,
+                idle_secs=args.idle,
+                duration_secs=args.duration,
+                probe_interval_secs=args.probe_interval
+            )
+            target = f'http://127.0.0.1:{port}/ping'
+            record = await loadtest.run(target, cfg, lambda: probe_ttfb(target))
+            # Байты за время нагрузки: всё, что прошло через узкое место, кроме очереди
+            link_mbps = (link.delivered - link.queued) * 8 / record["duration_secs"] / 1e6
+        finally:
+            await runner.cleanup()
+        port += 1
+        idle, loaded = record["idle"], record["loaded"]
+        print(
+            f"{buffer_bytes / 1024:>9.0f} {idle['rtt_p50']:>9} {idle['rtt_p99']:>9} "
+            f"{loaded['rtt_p50']:>9} {loaded['rtt_p99']:>9} {record['rtt_increase_ms']:>8} "
+            f"{record['throughput_mbps']:>7} {link_mbps:>8.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bandwidth', type=int, default=1_250_000, help="Полоса узкого места, байт/с")
+    parser.add_argument('--buffer', type=int, nargs='+', default=[32 * 1024, 256 * 1024, 1024 * 1024],
+                        help="Размер буфера узкого места, байт")
+    parser.add_argument('--base-rtt', type=float, default=0.01, help="Задержка без очереди, с")
+    parser.add_argument('--mode', choices=('download', 'upload'), default='download')
+    parser.add_argument('--streams', type=int, default=4)
+    parser.add_argument('--idle', type=float, default=2)
+    parser.add_argument('--duration', type=float, default=5)
+    parser.add_argument('--probe-interval', type=float, default=0.2)
+    parser.add_argument('--port', type=int, default=18180)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
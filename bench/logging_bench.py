@@ -0,0 +1,99 @@
+"""
+Бенчмарк стоимости логирования.
+
+Воспроизводит поток сообщений клиента: строку [LOG] на каждую запись append_to_log
+и редкие сообщения других подсистем. Сравнивает прежнюю схему (неограниченная очередь,
+root DEBUG, f-строка с os.stat на каждую запись, файл без ротации) с конвейером logger.py.
+Пересчитывает CPU и байты лога на час работы при заданной частоте записей.
+
+Запуск:
+    python bench/logging_bench.py --records 20000
+    python bench/logging_bench.py --records-per-hour 1200
+"""
+import argparse
+import logging.handlers
+import os
+import queue
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logger  # noqa: E402
+
+
+def legacy_pipeline(path):
+    que = queue.Queue(-1)
+    handler = logging.handlers.QueueHandler(que)
+    file_handler = logging.FileHandler(path, mode='a')
+    file_handler.setFormatter(logging.Formatter(logger.LOG_FORMAT))
+    return handler, logging.handlers.QueueListener(que, file_handler), logging.DEBUG
+
+
+def current_pipeline(path):
+    # Бенчмарк сжимает часы работы в секунды, поэтому ограничение частоты выключено,
+    # иначе оно отбросило бы почти все сообщения и исказило сравнение
+    handler, listener, _ = logger.build_pipeline(path, console=False, rate_burst=0)
+    return handler, listener, logging.INFO
+
+
+def run(name, factory, records):
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, 'app.log')
+        data_file = os.path.join(tmp, 'ping.jsonl')
+        handler, listener, level = factory(log_path)
+        log = logging.getLogger(f'bench.{name}')
+        log.propagate = False
+        log.setLevel(level)
+        log.addHandler(handler)
+        listener.start()
+
+        started = time.process_time()
+        for i in range(records):
+            with open(data_file, 'a') as f:
+                f.write('{"stamp": 1764016116025, "times_ms": [12.4, 11.9]}\n')
+            if name == 'legacy':
+                log.info(f"[LOG] Добавлены данные в {data_file}, размер теперь: {os.stat(data_file).st_size} байт")
+            else:
+                log.debug("[LOG] Добавлены данные в %s", data_file)
+            if i % 100 == 0:
+                log.info(f"[SENDER] Найдено {i} архив(ов) для отправки")
+        listener.stop()
+        cpu = time.process_time() - started
+
+        # Стоимость самой записи данных без логирования
+        started = time.process_time()
+        for _ in range(records):
+            with open(data_file, 'a') as f:
+                f.write('{"stamp": 1764016116025, "times_ms": [12.4, 11.9]}\n')
+        base = time.process_time() - started
+
+        log_bytes = sum(
+            os.path.getsize(os.path.join(tmp, n)) for n in os.listdir(tmp) if n.startswith('app.log')
+        )
+        log.removeHandler(handler)
+        for h in listener.handlers:
+            h.close()
+    return max(cpu - base, 0.0), log_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--records-per-hour', type=int, default=720,
+                        help="Записей в час (по умолчанию ping раз в 10 секунд и trace/metrics)")
+    args = parser.parse_args()
+
+    scale = args.records_per_hour / args.records
+    print(f"Записей: {args.records}, пересчёт на {args.records_per_hour} записей/час")
+    for name, factory in (('legacy', legacy_pipeline), ('current', current_pipeline)):
+        cpu, log_bytes = run(name, factory, args.records)
+        print(
+            f"{name:<8} CPU логирования {cpu * 1e6 / args.records:8.1f} мкс/запись, "
+            f"{cpu * scale * 1000:8.2f} мс CPU/час, {log_bytes * scale / 1024:8.1f} КБ лога/час"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Бенчмарк масштабирования шардированного мониторинга.
+
+Каждый воркер крутит циклы мониторинга для своего шарда целей так же, как main.monitor_host:
+запуск "пинга" в пуле потоков, разбор вывода и сетевой информации, запись JSONL-записи.
+Вместо сетевого ping используется заготовленный вывод, поэтому измеряется именно
+стоимость обработки пробы на стороне клиента, а не задержка сети.
+
+Запуск:
+    python bench/sharding_bench.py --targets 64 --duration 10
+    python bench/sharding_bench.py --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import clock  # noqa: E402
+import nettools  # noqa: E402
+import supervisor  # noqa: E402
+
+PING_OUTPUT = """PING 1.1.1.1 (1.1.1.1) 56(84) bytes of data.
+64 bytes from 1.1.1.1: icmp_seq=1 ttl=57 time=12.4 ms
+64 bytes from 1.1.1.1: icmp_seq=2 ttl=57 time=11.9 ms
+
+--- 1.1.1.1 ping statistics ---
+2 packets transmitted, 2 received, 0% packet loss, time 1001ms
+rtt min/avg/max/mdev = 11.900/12.150/12.400/0.250 ms
+"""
+
+IP_ADDR_OUTPUT = """1: lo: <LOOPBACK,UP,LOWER_UP> mtu 65536 qdisc noqueue state UNKNOWN group default qlen 1000
+    link/loopback 00:00:00:00:00:00 brd 00:00:00:00:00:00
+    inet 127.0.0.1/8 scope host lo
+2: eth0: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc fq_codel state UP group default qlen 1000
+    link/ether 52:54:00:12:34:56 brd ff:ff:ff:ff:ff:ff
+    inet 10.8.1.23/24 brd 10.8.1.255 scope global dynamic eth0
+3: wlan0: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc noqueue state UP group default qlen 1000
+    link/ether 52:54:00:65:43:21 brd ff:ff:ff:ff:ff:ff
+    inet 192.168.0.14/24 brd 192.168.0.255 scope global dynamic wlan0
+"""
+
+
+def fake_ping(host):
+    times = nettools.parse_ping_output(PING_OUTPUT, platform.system().lower())
+    interfaces = nettools.parse_linux_ip_addr(IP_ADDR_OUTPUT)
+    return {
+        "stamp": clock.now_ms(),
+        "raw": PING_OUTPUT,
+        "sent": 2,
+        "times_ms": times,
+        "avg_ms": sum(times) / len(times),
+        "network_info": {"raw": IP_ADDR_OUTPUT, "interfaces": interfaces}
+    }
+
+
+async def probe_loop(host, path, deadline, counter):
+    loop = asyncio.get_running_loop()
+    with open(path, 'a') as f:
+        while time.monotonic() < deadline:
+            record = await loop.run_in_executor(None, fake_ping, host)
+            json.dump(record, f)
+            f.write('\n')
+            counter[0] += 1
+
+
+def worker(hosts, duration, data_dir, results):
+    counter = [0]
+    deadline = time.monotonic() + duration
+
+    async def run():
+        await asyncio.gather(*(
+            probe_loop(host, os.path.join(data_dir, f'ping_{os.getpid()}_{host}.jsonl'), deadline, counter)
+            for host in hosts
+        ))
+
+    asyncio.run(run())
+    results.put(counter[0])
+
+
+def measure(workers, targets, duration):
+    hosts = [f'10.0.{i // 256}.{i % 256}' for i in range(targets)]
+    shards = supervisor.shard_targets(hosts, workers)
+    results = multiprocessing.Queue()
+    with tempfile.TemporaryDirectory() as data_dir:
+        processes = [
+            multiprocessing.Process(target=worker, args=(shard, duration, data_dir, results))
+            for shard in shards
+        ]
+        for process in processes:
+            process.start()
+        total = sum(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+    return total / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, nargs='+')
+    args = parser.parse_args()
+
+    cpu = os.cpu_count() or 1
+    workers_list = args.workers or sorted({1, 2, 4, cpu} - {0})
+    print(f"CPU: {cpu}, целей: {args.targets}, длительность: {args.duration} с")
+    baseline = None
+    for workers in workers_list:
+        rate = measure(workers, args.targets, args.duration)
+        baseline = baseline or rate
+        print(f"workers={workers:<3} {rate:10.1f} проб/с  x{rate / baseline:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""
+Бенчмарк разгрузки очереди отправки.
+
+Поднимает локальный aiohttp-сервер, повторяющий POST /upload/<room>/, с настраиваемой
+задержкой ответа, пропускной способностью, долей ошибок и обрывов посреди загрузки.
+Генерирует очередь архивов, похожих на настоящие (ping/trace/losses в zip), и разгружает её
+через client.send_to_server так же, как periodic_sender: отправка, удаление успешных,
+повтор остальных в следующем проходе. Опционально очередь сначала уплотняется spool.compact.
+
+Выводит архивов/с, байт/с, байты, переданные впустую (ошибки и обрывы), и память.
+
+Запуск:
+    python bench/upload_bench.py --archives 50 --concurrency 1 4
+    python bench/upload_bench.py --bandwidth 2000000 --latency 0.2 --error-rate 0.1 --disconnect-rate 0.1
+    python bench/upload_bench.py --batch 0 5242880
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('room', 'bench')
+
+from aiohttp import web  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import client  # noqa: E402
+import config  # noqa: E402
+import spool  # noqa: E402
+
+PING_RAW = """PING 1.1.1.1 (1.1.1.1) 56(84) bytes of data.
+64 bytes from 1.1.1.1: icmp_seq=1 ttl=57 time=12.4 ms
+64 bytes from 1.1.1.1: icmp_seq=2 ttl=57 time=11.9 ms
+
+--- 1.1.1.1 ping statistics ---
+2 packets transmitted, 2 received, 0% packet loss, time 1001ms
+"""
+
+
+class StandInServer:
+    """
+    Заглушка сервера приёма архивов.
+    """
+
+    def __init__(self, latency, bandwidth, error_rate, disconnect_rate, seed, size_hint):
+        self.size_hint = size_hint
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.disconnect_rate = disconnect_rate
+        self.random = random.Random(seed)
+        self.accepted_bytes = 0
+        self.wasted_bytes = 0
+        self.requests = 0
+        self.errors = 0
+        self.disconnects = 0
+
+    async def upload(self, request):
+        self.requests += 1
+        disconnect = self.random.random() < self.disconnect_rate
+        fail = not disconnect and self.random.random() < self.error_rate
+        # Обрыв происходит на случайной доле тела запроса (тело идёт chunked, размер заранее неизвестен)
+        size = request.content_length or self.size_hint
+        cut_at = self.random.uniform(0.1, 0.9) * size if disconnect else None
+
+        received = 0
+        async for chunk in request.content.iter_chunked(64 * 1024):
+            received += len(chunk)
+            if self.bandwidth:
+                await asyncio.sleep(len(chunk) / self.bandwidth)
+            if cut_at is not None and received >= cut_at:
+                self.disconnects += 1
+                self.wasted_bytes += received
+                request.transport.close()
+                return web.Response(status=500)
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if fail:
+            self.errors += 1
+            self.wasted_bytes += received
+            return web.Response(status=500, text='bench error')
+        self.accepted_bytes += received
+        return web.Response(text='ok')
+
+    async def start(self, port):
+        app = web.Application(client_max_size=1 << 30)
+        app.router.add_post('/upload/{room}/', self.upload)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, '127.0.0.1', port).start()
+        return runner
+
+
+def fake_record(stamp, rng):
+    times = [round(rng.uniform(8, 40), 1) for _ in range(2)]
+    return {
+        "stamp": int(stamp.timestamp() * 1000),
+        "target": "1.1.1.1",
+        "raw": PING_RAW,
+        "sent": 2,
+        "times_ms": times,
+        "avg_ms": round(sum(times) / len(times), 2),
+        "network_info": {"raw": "", "interfaces": [{"name": "eth0", "ipv4": "10.8.1.23", "gateway": "10.8.1.1"}]}
+    }
+
+
+def generate_backlog(directory, archives, records, seed):
+    """
+    Создаёт очередь archive_<stamp>.zip, как после долгого отключения: по одному архиву
+    на период ротации, внутри ping/trace/losses.
+
+    :return: Суммарный размер архивов, байт.
+    """
+    rng = random.Random(seed)
+    start = datetime(2025, 11, 24, 0, 0)
+    total = 0
+    for i in range(archives):
+        period = start + timedelta(seconds=1000 * i)
+        stamp = period.strftime('%Y-%m-%d_%H-%M')
+        path = os.path.join(directory, f'archive_{stamp}.zip')
+        lines = '\n'.join(
+            json.dumps(fake_record(period + timedelta(seconds=10 * j), rng)) for j in range(records)
+        ) + '\n'
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_LZMA) as zf:
+            zf.writestr(f'ping_{stamp}.jsonl', lines)
+            zf.writestr(f'trace_{stamp}.jsonl', '')
+            zf.writestr(f'losses_{stamp}.json', '{}')
+        total += os.path.getsize(path)
+    return total
+
+
+async def drain(sending_dir, concurrency, max_rounds):
+    """
+    Разгружает очередь, как periodic_sender, но с concurrency одновременными отправками.
+
+    :return: Количество проходов.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(name):
+        path = os.path.join(sending_dir, name)
+        async with semaphore:
+            if await client.send_to_server(path):
+                os.remove(path)
+
+    for round_number in range(1, max_rounds + 1):
+        names = sorted((f for f in os.listdir(sending_dir) if f.endswith('.zip')), key=spool.queue_stamp)
+        if not names:
+            return round_number - 1
+        await asyncio.gather(*(send(name) for name in names))
+    return max_rounds
+
+
+async def measure(args, backlog_dir, backlog_bytes, concurrency, batch_bytes, port):
+    server = StandInServer(
+        args.latency, args.bandwidth, args.error_rate, args.disconnect_rate, args.seed,
+        size_hint=batch_bytes or backlog_bytes // args.archives
+    )
+    runner = await server.start(port)
+    client.SERVER_URL = f'http://127.0.0.1:{port}'
+    try:
+        with tempfile.TemporaryDirectory() as sending_dir:
+            for name in os.listdir(backlog_dir):
+                shutil.copy(os.path.join(backlog_dir, name), sending_dir)
+
+            tracemalloc.start()
+            started = time.monotonic()
+            if batch_bytes:
+                spool.compact(sending_dir, 1, batch_bytes)
+            rounds = await drain(sending_dir, concurrency, args.max_rounds)
+            elapsed = time.monotonic() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            left = len([f for f in os.listdir(sending_dir) if f.endswith('.zip')])
+    finally:
+        await runner.cleanup()
+
+    return {
+        "elapsed": elapsed,
+        "rounds": rounds,
+        "left": left,
+        "requests": server.requests,
+        "errors": server.errors,
+        "disconnects": server.disconnects,
+        "accepted_bytes": server.accepted_bytes,
+        "wasted_bytes": server.wasted_bytes,
+        "peak_mem": peak,
+    }
+
+
+async def run(args):
+    with tempfile.TemporaryDirectory() as backlog_dir:
+        backlog_bytes = generate_backlog(backlog_dir, args.archives, args.records, args.seed)
+        print(
+            f"Очередь: {args.archives} архивов, {backlog_bytes / 1024:.0f} КБ; "
+            f"задержка {args.latency} с, полоса {args.bandwidth or 'без ограничения'} байт/с, "
+            f"ошибки {args.error_rate:.0%}, обрывы {args.disconnect_rate:.0%}"
+        )
+        print(
+            f"{'conc':>4} {'batch':>9} {'архив/с':>8} {'КБ/с':>9} {'запросов':>8} "
+            f"{'впустую КБ':>10} {'проходов':>8} {'осталось':>8} {'пик КБ':>8}"
+        )
+        port = args.port
+        for concurrency in args.concurrency:
+            for batch_bytes in args.batch:
+                result = await measure(args, backlog_dir, backlog_bytes, concurrency, batch_bytes, port)
+                port += 1
+                delivered = args.archives - result["left"]
+                print(
+                    f"{concurrency:>4} {batch_bytes or '-':>9} "
+                    f"{delivered / result['elapsed']:>8.1f} "
+                    f"{result['accepted_bytes'] / result['elapsed'] / 1024:>9.1f} "
+                    f"{result['requests']:>8} {result['wasted_bytes'] / 1024:>10.1f} "
+                    f"{result['rounds']:>8} {result['left']:>8} {result['peak_mem'] / 1024:>8.0f}"
+                )
+    if resource is not None:
+        print(f"Пиковый RSS процесса: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} МБ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--archives', type=int, default=50)
+    parser.add_argument('--records', type=int, default=100, help="Записей ping в архиве")
+    parser.add_argument('--latency', type=float, default=0.05, help="Задержка ответа сервера, с")
+    parser.add_argument('--bandwidth', type=int, default=0, help="Полоса сервера, байт/с (0 - без ограничения)")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--disconnect-rate', type=float, default=0.0)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--batch', type=int, nargs='+', default=[0, 5 * 1024 * 1024],
+                        help="Размер пачки spool.compact, байт (0 - без объединения)")
+    parser.add_argument('--max-rounds', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--port', type=int, default=18080)
+    args = parser.parse_args()
+
+    # Паузы на время проб в бенчмарке не нужны: проб нет
+    config.config.upload.pause_during_probes = False
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import logging
+import os
+
+import framestream
+
+# Хранилища блобов по пути файла blobs_<stamp>.jsonl (одно на архив ротации)
+_stores = {}
+
+
+def blob_hash(text):
+    """
+    Вычисляет контентный хеш строки, по которому на неё ссылаются записи.
+
+    :param text: Исходная строка (сырой вывод команды).
+    :return: Hex-строка хеша.
+    """
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+
+class BlobStore:
+    """
+    Хранилище уникальных сырых выводов в пределах одного архива ротации.
+    Каждый блоб записывается в файл blobs_<stamp>.jsonl(.gz) ровно один раз
+    строкой {"hash": ..., "data": ...}, записи ссылаются на него через *_ref.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.known = set()
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                self.known.update(entry['hash'] for entry in framestream.iter_records(f, path))
+
+    def put(self, text):
+        """
+        Сохраняет строку, если она ещё не встречалась в этом архиве.
+
+        :param text: Сырой вывод.
+        :return: Хеш, по которому запись ссылается на блоб.
+        """
+        digest = blob_hash(text)
+        if digest not in self.known:
+            # Блоб пишется до записи, которая на него ссылается,
+            # в сжатом потоке - отдельным кадром сразу же
+            entry = {"hash": digest, "data": text}
+            if self.path.endswith('.gz'):
+                framestream.append_frame(self.path, [json.dumps(entry)])
+            else:
+                with open(self.path, 'a') as f:
+                    json.dump(entry, f)
+                    f.write('\n')
+                    f.flush()
+            self.known.add(digest)
+        return digest
+
+
+def store_for(path):
+    """
+    Возвращает хранилище блобов для файла blobs_<stamp>.jsonl, создавая его при первом обращении.
+    """
+    store = _stores.get(path)
+    if store is None:
+        store = _stores[path] = BlobStore(path)
+    return store
+
+
+def release(path):
+    """
+    Забывает хранилище после ротации, чтобы следующий архив начинался с пустого набора блобов.
+    """
+    _stores.pop(path, None)
+
+
+def dedup_record(record, store):
+    """
+    Заменяет поля raw и network_info.raw ссылками raw_ref на блобы.
+
+    :param record: Запись ping/trace в текущей схеме.
+    :param store: BlobStore текущего архива.
+    :return: Новая запись со ссылками вместо сырых строк.
+    """
+    record = dict(record)
+    if isinstance(record.get('raw'), str):
+        record['raw_ref'] = store.put(record.pop('raw'))
+
+    network_info = record.get('network_info')
+    if isinstance(network_info, dict) and isinstance(network_info.get('raw'), str):
+        network_info = dict(network_info)
+        network_info['raw_ref'] = store.put(network_info.pop('raw'))
+        record['network_info'] = network_info
+    return record
+
+
+def expand_record(record, blobs):
+    """
+    Обратное преобразование к dedup_record: подставляет сырые строки обратно по ссылкам.
+    Записи без ссылок возвращаются без изменений.
+
+    :param record: Запись из архива.
+    :param blobs: Словарь хеш -> строка (см. load_blobs).
+    :return: Запись в текущей схеме.
+    """
+    if 'raw_ref' not in record and 'raw_ref' not in (record.get('network_info') or {}):
+        return record
+
+    record = dict(record)
+    if 'raw_ref' in record:
+        record['raw'] = _resolve(record.pop('raw_ref'), blobs)
+
+    network_info = record.get('network_info')
+    if isinstance(network_info, dict) and 'raw_ref' in network_info:
+        network_info = dict(network_info)
+        network_info['raw'] = _resolve(network_info.pop('raw_ref'), blobs)
+        record['network_info'] = network_info
+    return record
+
+
+def load_blobs(lines):
+    """
+    Читает строки файла blobs_<stamp>.jsonl.
+
+    :param lines: Итерируемый набор строк.
+    :return: Словарь хеш -> строка.
+    """
+    blobs = {}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            # Недописанная последняя строка после аварийного завершения
+            continue
+        blobs[entry['hash']] = entry['data']
+    return blobs
+
+
+def _resolve(digest, blobs):
+    data = blobs.get(digest)
+    if data is None:
+        logging.info("[BLOBS] Блоб %s не найден", digest)
+    return data
@@ -6,6 +6,8 @@ from pathlib import Path
 import aiohttp
 
 import config
+import executors
+import throttle
 
 ROOM = config.config.room
 if ROOM is None:
@@ -27,24 +29,42 @@ TIMEOUT_CONNECT = config.config.timing.timeouts.connect_secs
 TIMUPLOAD_TOTAL = config.config.timing.timeouts.upload_secs
 
 
+async def read_chunk(fileobj, size):
+    return await executors.run('disk', fileobj.read, size)
+
+
 async def send_to_server(zip_path: str | Path) -> bool:
     """
     Отправка ZIP-архива на сервер.
     Возвращает True только если сервер вернул 200 OK.
+
+    Файл отдаётся кусками с ограничением скорости upload.rate_limit_bytes и паузами,
+    пока идут пробы задержки, чтобы отправка не искажала измерения.
     """
     zip_path = Path(zip_path)
     if not zip_path.is_file():
-        logging.info(f"[SEND] File not found: {zip_path}")
+        logging.info("[SEND] File not found: %s", zip_path)
         return False
 
     url = f"{SERVER_URL}/upload/{ROOM}/"
-    logging.info(f"[SEND] Sending {zip_path.name} ({zip_path.stat().st_size // 1024} KB) → {url}")
+    logging.info("[SEND] Sending %s (%s KB) → %s", zip_path.name, zip_path.stat().st_size // 1024, url)
+
+    upload_config = config.config.upload
+    stats = throttle.UploadStats()
+    fileobj = zip_path.open('rb')
 
     # Формируем multipart-данные вручную, чтобы контролировать имя поля и filename
     data = aiohttp.FormData()
     data.add_field(
         'file',
-        zip_path.open('rb'),
+        throttle.throttled_chunks(
+            fileobj, read_chunk,
+            upload_config.chunk_bytes,
+            upload_config.rate_limit_bytes,
+            upload_config.pause_during_probes,
+            upload_config.max_pause_secs,
+            stats
+        ),
         filename=zip_path.name,
         content_type='application/zip'
     )
@@ -55,22 +75,46 @@ async def send_to_server(zip_path: str | Path) -> bool:
     )
 
     try:
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            async with session.post(url, data=data) as resp:
-                if resp.status == 200:
-                    logging.info(f"[SEND] Successfully sent {zip_path.name}")
-                    return True
-                else:
-                    text = await resp.text()
-                    logging.info(f"[SEND] Server returned {resp.status}: {text}")
-                    return False
+        with throttle.uploading():
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.post(url, data=data) as resp:
+                    if resp.status == 200:
+                        logging.info(
+                            "[SEND] Successfully sent %s: %s KB, %.1f KB/s, paused %s times (%.1f s)",
+                            zip_path.name, stats.bytes // 1024, stats.throughput() / 1024, stats.pauses,
+                            stats.paused_secs
+                        )
+                        return True
+                    else:
+                        text = await resp.text()
+                        logging.info("[SEND] Server returned %s: %s", resp.status, text)
+                        return False
 
     except aiohttp.ClientResponseError as e:
-        logging.info(f"[SEND] HTTP error {e.status}: {e.message}")
+        logging.info("[SEND] HTTP error %s: %s", e.status, e.message)
         return False
     except asyncio.TimeoutError:
-        logging.info(f"[SEND] Timeout while sending {zip_path}")
+        logging.info("[SEND] Timeout while sending %s", zip_path)
         return False
     except Exception as e:
-        logging.info(f"[ERROR] Unexpected error while sending {zip_path}: {e}")
+        logging.info("[ERROR] Unexpected error while sending %s: %s", zip_path, e)
+        return False
+    finally:
+        fileobj.close()
+
+
+async def send_heartbeats(session: aiohttp.ClientSession, minutes: list) -> bool:
+    """
+    Отправка пачки итогов минут на сервер через переданную (постоянную) сессию.
+    Возвращает True только если сервер вернул 200 OK.
+    """
+    url = f"{SERVER_URL}/heartbeat/{ROOM}/"
+    try:
+        async with session.post(url, json={"room": ROOM, "minutes": minutes}) as resp:
+            if resp.status == 200:
+                return True
+            logging.info("[HEARTBEAT] Server returned %s", resp.status)
+            return False
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.info("[HEARTBEAT] Failed to send %s minute(s): %r", len(minutes), e)
         return False
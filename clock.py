@@ -0,0 +1,77 @@
+"""
+Время в данных клиента.
+
+Метки записей и ключи поминутных агрегатов - целые миллисекунды эпохи (UTC), интервалы
+между действиями отмеряются монотонными часами (time.monotonic). В читаемый вид
+("YYYY-MM-DD HH:MM", ISO) время переводится только при выводе: в отчётах, API и логах.
+
+Архивы прежних версий хранят метки строками ISO и ключи минут строками "YYYY-MM-DD HH:MM" -
+to_ms и parse_minute_key понимают оба формата.
+"""
+import time
+from datetime import datetime
+
+MINUTE_MS = 60_000
+HOUR_MS = 60 * MINUTE_MS
+
+
+def now_ms():
+    """
+    Текущее время, целые мс эпохи.
+    """
+    return time.time_ns() // 1_000_000
+
+
+def minute_of(ms):
+    """
+    Начало минуты, в которую попадает метка (мс эпохи).
+    """
+    return ms - ms % MINUTE_MS
+
+
+def hour_of(ms):
+    """
+    Начало часа, в который попадает метка (мс эпохи).
+    """
+    return ms - ms % HOUR_MS
+
+
+def to_ms(stamp):
+    """
+    Метка записи в мс эпохи: число - как есть, строка ISO (записи прежних версий) - по местному времени.
+    """
+    if isinstance(stamp, (int, float)):
+        return int(stamp)
+    return int(datetime.fromisoformat(stamp).timestamp() * 1000)
+
+
+def parse_minute_key(key):
+    """
+    Ключ минуты из losses/rollup в мс эпохи: "1760000040000" или прежний "YYYY-MM-DD HH:MM".
+    """
+    if isinstance(key, int):
+        return key
+    if key.isdigit():
+        return int(key)
+    return int(datetime.strptime(key, "%Y-%m-%d %H:%M").timestamp() * 1000)
+
+
+def to_iso(ms):
+    """
+    Метка для вывода: местное время ISO с миллисекундами.
+    """
+    return datetime.fromtimestamp(ms / 1000).isoformat(timespec='milliseconds')
+
+
+def format_minute(ms):
+    """
+    Минута для вывода: "YYYY-MM-DD HH:MM" по местному времени.
+    """
+    return datetime.fromtimestamp(ms / 1000).strftime("%Y-%m-%d %H:%M")
+
+
+def local_day(ms):
+    """
+    День для группировки в отчётах: "YYYY-MM-DD" по местному времени.
+    """
+    return datetime.fromtimestamp(ms / 1000).strftime("%Y-%m-%d")
@@ -3,6 +3,7 @@ import shutil
 import traceback
 from datetime import datetime
 from pathlib import Path
+from typing import Literal
 
 import yaml
 from pydantic import Field, BaseModel, ValidationError
@@ -40,11 +41,150 @@ class PingConfig(BaseModel):
     continious: ContiniousPingConfig = Field(default_factory=ContiniousPingConfig)
 
 
+class TcpProbeConfig(BaseModel):
+    timeout_secs: float = Field(default=3)
+    concurrency: int = Field(default=10)
+    interval_secs: float = Field(default=0.2)
+
+
+class StorageConfig(BaseModel):
+    dedup_raw: bool = Field(default=False)
+    trace_dedup: bool = Field(default=False)
+    stream_compression: bool = Field(default=False)
+    frame_records: int = Field(default=50)
+    frame_secs: int = Field(default=60)
+
+
+class RollupConfig(BaseModel):
+    level: Literal['off', 'anomalies', 'summary'] = Field(default='off')
+    spike_ms: float = Field(default=200)
+    anomaly_margin_minutes: int = Field(default=2)
+
+
+class SpoolConfig(BaseModel):
+    compact_threshold: int = Field(default=10)
+    bundle_max_bytes: int = Field(default=5 * 1024 * 1024)
+
+
+class MonitorConfig(BaseModel):
+    targets: list[str] = Field(default_factory=lambda: ['1.1.1.1'])
+    workers: int = Field(default=0)
+    restart_delay_secs: int = Field(default=10)
+
+
+class ExecutorConfig(BaseModel):
+    workers: int = Field(default=1)
+    queue_limit: int = Field(default=8)
+    policy: Literal['skip', 'coalesce', 'delay'] = Field(default='delay')
+
+
+class ExecutorsConfig(BaseModel):
+    ping: ExecutorConfig = Field(default_factory=lambda: ExecutorConfig(workers=4, queue_limit=16, policy='delay'))
+    trace: ExecutorConfig = Field(default_factory=lambda: ExecutorConfig(workers=2, queue_limit=4, policy='coalesce'))
+    disk: ExecutorConfig = Field(default_factory=lambda: ExecutorConfig(workers=1, queue_limit=8, policy='delay'))
+
+
+class RdnsConfig(BaseModel):
+    enabled: bool = Field(default=True)
+    nameserver: str | None = Field(default=None)
+    timeout_secs: float = Field(default=2.0)
+    cache_size: int = Field(default=1024)
+    ttl_secs: int = Field(default=3600)
+    negative_ttl_secs: int = Field(default=300)
+
+
+class MtrConfig(BaseModel):
+    enabled: bool = Field(default=False)
+    interval_secs: float = Field(default=5)
+    queries: int = Field(default=1)
+    wait_secs: float = Field(default=1)
+
+
+class LocalizeConfig(BaseModel):
+    enabled: bool = Field(default=True)
+    campus_host: str | None = Field(default=None)
+    packet_count: int = Field(default=3)
+
+
+class UplinksConfig(BaseModel):
+    enabled: bool = Field(default=False)
+    interfaces: list[str] = Field(default_factory=list)
+    refresh_secs: float = Field(default=60)
+
+
+# Тест выполняется в цикле мониторинга первой цели и блокирует его на idle_secs + duration_secs:
+# стандартных проверок этой цели и записей ping/losses за это время нет
+class LoadTestConfig(BaseModel):
+    enabled: bool = Field(default=False)
+    url: str | None = Field(default=None)
+    mode: Literal['download', 'upload'] = Field(default='download')
+    streams: int = Field(default=4)
+    idle_secs: float = Field(default=5)
+    duration_secs: float = Field(default=10)
+    probe_interval_secs: float = Field(default=0.2)
+    interval_secs: float = Field(default=3600)
+
+
+class UploadConfig(BaseModel):
+    rate_limit_bytes: int = Field(default=0)
+    chunk_bytes: int = Field(default=16 * 1024)
+    pause_during_probes: bool = Field(default=True)
+    max_pause_secs: float = Field(default=30)
+
+
+class PerfConfig(BaseModel):
+    lag_sample_secs: float = Field(default=0.25)
+    detect_blocking: bool = Field(default=False)
+    blocking_threshold_ms: float = Field(default=100)
+
+
+class HeartbeatConfig(BaseModel):
+    enabled: bool = Field(default=False)
+    flush_secs: float = Field(default=5)
+    max_pending_minutes: int = Field(default=1440)
+    max_batch: int = Field(default=120)
+    timeout_secs: float = Field(default=10)
+
+
+class RecentConfig(BaseModel):
+    capacity: int = Field(default=100000)
+    api_enabled: bool = Field(default=False)
+    api_host: str = Field(default='127.0.0.1')
+    api_port: int = Field(default=8765)
+
+
+class LoggingConfig(BaseModel):
+    level: Literal['DEBUG', 'INFO', 'WARNING', 'ERROR'] = Field(default='INFO')
+    levels: dict[str, Literal['DEBUG', 'INFO', 'WARNING', 'ERROR']] = Field(default_factory=dict)
+    queue_size: int = Field(default=10000)
+    max_bytes: int = Field(default=5 * 1024 * 1024)
+    backup_count: int = Field(default=5)
+    rotate_hours: int = Field(default=24)
+    rate_limit_burst: int = Field(default=20)
+    rate_limit_secs: int = Field(default=60)
+
+
 class AppConfig(BaseModel):
     room: str | int | None = Field(default=None)
     endpoint: str = Field(default="https://monitor.slavapmk.ru")
     timing: TimingConfig = Field(default_factory=TimingConfig)
     ping: PingConfig = Field(default_factory=PingConfig)
+    monitor: MonitorConfig = Field(default_factory=MonitorConfig)
+    tcp_probe: TcpProbeConfig = Field(default_factory=TcpProbeConfig)
+    storage: StorageConfig = Field(default_factory=StorageConfig)
+    rollup: RollupConfig = Field(default_factory=RollupConfig)
+    spool: SpoolConfig = Field(default_factory=SpoolConfig)
+    executors: ExecutorsConfig = Field(default_factory=ExecutorsConfig)
+    rdns: RdnsConfig = Field(default_factory=RdnsConfig)
+    mtr: MtrConfig = Field(default_factory=MtrConfig)
+    localize: LocalizeConfig = Field(default_factory=LocalizeConfig)
+    uplinks: UplinksConfig = Field(default_factory=UplinksConfig)
+    loadtest: LoadTestConfig = Field(default_factory=LoadTestConfig)
+    upload: UploadConfig = Field(default_factory=UploadConfig)
+    heartbeat: HeartbeatConfig = Field(default_factory=HeartbeatConfig)
+    recent: RecentConfig = Field(default_factory=RecentConfig)
+    logging: LoggingConfig = Field(default_factory=LoggingConfig)
+    perf: PerfConfig = Field(default_factory=PerfConfig)
 
 
 DEFAULT_CONFIG = AppConfig()
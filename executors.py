@@ -0,0 +1,167 @@
+import asyncio
+import copy
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Параметры по умолчанию для классов задач: (потоков, лимит очереди, политика перегрузки)
+DEFAULTS = {
+    'ping': (4, 16, 'delay'),
+    'trace': (2, 4, 'coalesce'),
+    'disk': (1, 8, 'delay'),
+}
+
+# Пулы по имени класса задач
+_executors = {}
+
+
+class Overloaded(Exception):
+    """
+    Класс задач перегружен, а политика 'skip' велит пропустить вызов.
+    """
+
+
+class ProbeExecutor:
+    """
+    Отдельный ограниченный пул потоков для одного класса блокирующих задач.
+
+    Не больше queue_limit вызовов одновременно ожидают или выполняются в пуле.
+    Если класс перегружен, применяется политика:
+      skip     - вызов сразу завершается исключением Overloaded
+      coalesce - вызов с теми же аргументами присоединяется к уже выполняемому
+      delay    - вызов ждёт освобождения места в очереди
+    Время ожидания от вызова до начала выполнения в потоке измеряется.
+    pending - вызовы, ожидающие места в очереди или выполняемые.
+    """
+
+    def __init__(self, name, workers, queue_limit, policy):
+        self.name = name
+        self.workers = workers
+        self.queue_limit = max(queue_limit, workers)
+        self.policy = policy
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'{name}-worker')
+        self.slots = None
+        self.pending = 0
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.counters = {"submitted": 0, "completed": 0, "skipped": 0, "coalesced": 0, "delayed": 0}
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def saturated(self):
+        return self.pending >= self.queue_limit
+
+    async def run(self, fn, *args):
+        """
+        Выполняет fn(*args) в пуле класса с учетом лимита очереди и политики перегрузки.
+        Присоединившийся вызов получает свою копию результата: записи дополняются на месте.
+        """
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.queue_limit)
+
+        key = _coalesce_key(fn, args)
+        if self.saturated():
+            if self.policy == 'skip':
+                self.counters["skipped"] += 1
+                raise Overloaded(self.name)
+            if self.policy == 'coalesce' and key is not None and key in self.inflight:
+                self.counters["coalesced"] += 1
+                return copy.deepcopy(await asyncio.shield(self.inflight[key]))
+            self.counters["delayed"] += 1
+
+        submitted_at = time.monotonic()
+        self.pending += 1
+        try:
+            async with self.slots:
+                self.counters["submitted"] += 1
+                future = asyncio.get_running_loop().run_in_executor(self.pool, self._call, submitted_at, fn, args)
+                if key is not None:
+                    self.inflight.setdefault(key, future)
+                try:
+                    return await future
+                finally:
+                    self.counters["completed"] += 1
+                    if key is not None and self.inflight.get(key) is future:
+                        del self.inflight[key]
+        finally:
+            self.pending -= 1
+
+    def _call(self, submitted_at, fn, args):
+        wait = time.monotonic() - submitted_at
+        with self.lock:
+            self.wait_count += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+        return fn(*args)
+
+    def snapshot(self, reset=True):
+        """
+        Состояние класса: счетчики с момента запуска и время ожидания в очереди за интервал.
+
+        :param reset: Сбросить интервальную статистику ожидания.
+        :return: dict для записи в метрики.
+        """
+        with self.lock:
+            wait_avg = self.wait_total / self.wait_count if self.wait_count else None
+            snapshot = {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "policy": self.policy,
+                "pending": self.pending,
+                **self.counters,
+                "wait_avg_ms": round(wait_avg * 1000, 2) if wait_avg is not None else None,
+                "wait_max_ms": round(self.wait_max * 1000, 2),
+            }
+            if reset:
+                self.wait_count = 0
+                self.wait_total = 0.0
+                self.wait_max = 0.0
+        return snapshot
+
+
+def _coalesce_key(fn, args):
+    # Объединять можно только вызовы с хешируемыми аргументами (хост, количество пакетов)
+    key = (fn, args)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def configure(executors_config):
+    """
+    Создаёт пулы по конфигурации (ExecutorsConfig). Вызывается один раз на процесс.
+    """
+    for name in DEFAULTS:
+        cfg = getattr(executors_config, name)
+        _executors[name] = ProbeExecutor(name, cfg.workers, cfg.queue_limit, cfg.policy)
+        logging.info(
+            "[EXECUTORS] %s: потоков %s, очередь %s, политика %s", name, cfg.workers, cfg.queue_limit, cfg.policy
+        )
+
+
+def get(name):
+    """
+    Пул класса задач; если configure не вызывался, создаётся с параметрами по умолчанию.
+    """
+    executor = _executors.get(name)
+    if executor is None:
+        executor = _executors[name] = ProbeExecutor(name, *DEFAULTS[name])
+    return executor
+
+
+async def run(name, fn, *args):
+    """
+    Выполняет блокирующую функцию в пуле класса name ('ping', 'trace' или 'disk').
+    """
+    return await get(name).run(fn, *args)
+
+
+def snapshot(reset=True):
+    """
+    Метрики всех созданных пулов.
+    """
+    return {name: executor.snapshot(reset) for name, executor in _executors.items()}
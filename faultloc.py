@@ -0,0 +1,61 @@
+import ipaddress
+
+
+def default_gateway(record):
+    """
+    Шлюз по умолчанию из network_info записи ping (первый интерфейс с IPv4-шлюзом).
+
+    :param record: Запись ping.
+    :return: Адрес шлюза или None.
+    """
+    interfaces = (record.get('network_info') or {}).get('interfaces') or []
+    for iface in interfaces:
+        gateway = (iface.get('gateway') or '').strip()
+        try:
+            if gateway and ipaddress.ip_address(gateway).version == 4:
+                return gateway
+        except ValueError:
+            continue
+    return None
+
+
+def probe_summary(host, record):
+    """
+    Краткий итог одной пробы для записи в losses.
+    """
+    if record is None:
+        return {"host": host, "sent": 0, "reached": 0, "avg_ms": None}
+    return {
+        "host": host,
+        "sent": record.get('sent', 0),
+        "reached": len(record.get('times_ms') or []),
+        "avg_ms": record.get('avg_ms')
+    }
+
+
+def classify(probes):
+    """
+    Определяет, где сбой, по одновременным пробам шлюза, хоста в кампусе и цели.
+
+      local    - не отвечает шлюз по умолчанию (Wi-Fi / кабель / коммутатор комнаты)
+      campus   - шлюз отвечает, хост в кампусе нет (сеть общежития)
+      upstream - локальная сеть отвечает, цель нет (провайдер и дальше)
+      None     - все пробы прошли без потерь (кратковременный сбой)
+
+    Если хост в кампусе не задан, сбой за шлюзом считается upstream.
+    Проба, которую не удалось выполнить (нет шлюза, пул перегружен), не учитывается.
+
+    :param probes: dict роль -> итог пробы (probe_summary) для 'gateway', 'campus', 'target'.
+    :return: Строка класса или None.
+    """
+    def lossy(role):
+        probe = probes.get(role)
+        return probe is not None and probe["sent"] > 0 and probe["reached"] < probe["sent"]
+
+    if lossy('gateway'):
+        return 'local'
+    if lossy('campus'):
+        return 'campus'
+    if lossy('target'):
+        return 'upstream'
+    return None
@@ -0,0 +1,233 @@
+import gzip
+import json
+import logging
+import os
+import time
+import zlib
+
+# Размер блока чтения сжатых потоков
+READ_CHUNK = 64 * 1024
+
+# Открытые писатели по пути файла
+_writers = {}
+
+
+class FrameWriter:
+    """
+    Пишет JSONL-поток в виде последовательности независимых gzip-кадров.
+    Записи копятся в памяти и сбрасываются на диск отдельным gzip-членом,
+    поэтому при аварийном завершении теряется не больше последнего кадра.
+    """
+
+    def __init__(self, path, frame_records=50, frame_secs=60):
+        self.path = path
+        self.frame_records = frame_records
+        self.frame_secs = frame_secs
+        self.buffer = []
+        self.opened_at = None
+
+    def append(self, record):
+        """
+        Добавляет запись в текущий кадр и сбрасывает кадр, если он заполнен.
+        """
+        if not self.buffer:
+            self.opened_at = time.monotonic()
+        self.buffer.append(json.dumps(record))
+        if len(self.buffer) >= self.frame_records:
+            self.flush()
+
+    def is_stale(self):
+        return bool(self.buffer) and time.monotonic() - self.opened_at >= self.frame_secs
+
+    def flush(self):
+        """
+        Сжимает накопленные записи в один кадр и дописывает его в файл.
+        """
+        if not self.buffer:
+            return
+        append_frame(self.path, self.buffer)
+        self.buffer = []
+        self.opened_at = None
+
+
+def append_frame(path, lines):
+    """
+    Дописывает в файл один gzip-кадр из готовых JSON-строк.
+
+    :param path: Путь к файлу потока.
+    :param lines: Список сериализованных записей.
+    """
+    payload = ('\n'.join(lines) + '\n').encode('utf-8')
+    with open(path, 'ab') as f:
+        f.write(gzip.compress(payload, compresslevel=6, mtime=0))
+        f.flush()
+
+
+def writer_for(path, frame_records=50, frame_secs=60):
+    """
+    Возвращает писатель для файла потока, создавая его при первом обращении.
+    """
+    writer = _writers.get(path)
+    if writer is None:
+        writer = _writers[path] = FrameWriter(path, frame_records, frame_secs)
+    return writer
+
+
+def close(path):
+    """
+    Сбрасывает последний кадр и закрывает писатель (при ротации).
+    """
+    writer = _writers.pop(path, None)
+    if writer is not None:
+        writer.flush()
+
+
+def flush_stale():
+    """
+    Сбрасывает кадры, которые копятся дольше frame_secs (для редких потоков вроде trace).
+    """
+    for writer in list(_writers.values()):
+        if writer.is_stale():
+            writer.flush()
+
+
+def flush_all():
+    """
+    Сбрасывает все незаписанные кадры (при штатном завершении).
+    """
+    for writer in list(_writers.values()):
+        writer.flush()
+
+
+def iter_frames(fileobj):
+    """
+    Последовательно распаковывает gzip-кадры из бинарного файлового объекта.
+    Обрывается на недописанном последнем кадре.
+
+    :param fileobj: Бинарный файловый объект (файл на диске или член ZIP).
+    :return: Генератор кортежей (распакованные байты кадра, смещение конца кадра).
+    """
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    frame = []
+    consumed = 0
+    partial = False
+    pending = b''
+    while True:
+        if not pending:
+            pending = fileobj.read(READ_CHUNK)
+            if not pending:
+                break
+        frame.append(decompressor.decompress(pending))
+        partial = True
+        if decompressor.eof:
+            tail = decompressor.unused_data
+            consumed += len(pending) - len(tail)
+            yield b''.join(frame), consumed
+            frame = []
+            partial = False
+            decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            pending = tail
+        else:
+            consumed += len(pending)
+            pending = b''
+
+    if partial:
+        logging.info("[STREAM] Отброшен недописанный кадр")
+
+
+def _frame_data(fileobj, name):
+    """
+    Данные кадров по порядку; на повреждённом кадре поток обрывается, как на недописанном.
+    """
+    try:
+        for data, _ in iter_frames(fileobj):
+            yield data
+    except zlib.error as e:
+        logging.info("[STREAM] Повреждённый кадр в %s, остаток потока пропущен: %s", name, e)
+
+
+def iter_records(fileobj, name):
+    """
+    Читает записи потока в любом формате, который пишет клиент:
+    обычный JSONL (*.jsonl) или gzip-кадры (*.jsonl.gz).
+    Записи сжатого потока читаются до первого повреждённого кадра.
+
+    :param fileobj: Бинарный файловый объект.
+    :param name: Имя файла, по расширению определяется формат.
+    :return: Генератор записей (dict).
+    """
+    if name.endswith('.gz'):
+        chunks = _frame_data(fileobj, name)
+    else:
+        chunks = iter(lambda: fileobj.read(READ_CHUNK), b'')
+
+    rest = b''
+    for chunk in chunks:
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        for line in lines:
+            record = _decode_line(line)
+            if record is not None:
+                yield record
+
+    record = _decode_line(rest)
+    if record is not None:
+        yield record
+
+
+def rewrite(path, records, frame_records=50):
+    """
+    Перезаписывает файл потока заданными записями в том же формате (через временный файл).
+
+    :param path: Путь к файлу *.jsonl или *.jsonl.gz.
+    :param records: Итерируемый набор записей.
+    :param frame_records: Количество записей в кадре для сжатого формата.
+    """
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    if path.endswith('.gz'):
+        writer = FrameWriter(tmp_path, frame_records=frame_records)
+        for record in records:
+            writer.append(record)
+        writer.flush()
+        if not os.path.exists(tmp_path):
+            open(tmp_path, 'ab').close()
+    else:
+        with open(tmp_path, 'w') as f:
+            for record in records:
+                json.dump(record, f)
+                f.write('\n')
+    os.replace(tmp_path, path)
+
+
+def salvage(path):
+    """
+    Обрезает файл потока по концу последнего целого кадра после аварийного завершения.
+
+    :param path: Путь к файлу *.jsonl.gz.
+    :return: Количество отброшенных байт.
+    """
+    end = 0
+    with open(path, 'rb') as f:
+        try:
+            for _, end in iter_frames(f):
+                pass
+        except zlib.error as e:
+            logging.info("[STREAM] Повреждённый кадр в %s: %s", path, e)
+    size = os.path.getsize(path)
+    if end < size:
+        with open(path, 'r+b') as f:
+            f.truncate(end)
+        logging.info("[STREAM] %s: отброшено %s байт недописанного кадра", path, size - end)
+    return size - end
+
+
+def _decode_line(line):
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+from collections import deque
+
+import aiohttp
+
+import clock
+from rollup import percentile
+
+# Накопители текущей минуты по хосту
+_minutes = {}
+
+# Канал отправки текущего процесса
+_channel = None
+
+
+class MinuteStats:
+    """
+    Задержки текущей минуты и состояние сбоя для одного хоста.
+    """
+
+    def __init__(self):
+        self.rtts = []
+        self.sent = 0
+        self.reached = 0
+        self.outage_since = None
+
+    def observe(self, record):
+        times = record.get('times_ms') or []
+        self.rtts.extend(times)
+        self.sent += record.get('sent', max(len(times), 1))
+        self.reached += len(times)
+        if times:
+            self.outage_since = None
+        elif self.outage_since is None:
+            self.outage_since = record['stamp']
+
+    def finish(self, host, minute, losses):
+        """
+        Итог минуты для отправки; накопитель начинает новую минуту, состояние сбоя сохраняется.
+
+        :param host: Хост.
+        :param minute: Начало минуты, мс эпохи.
+        :param losses: Запись lost_by_minute за эту минуту (packets/reached) или None.
+        :return: dict.
+        """
+        # Счетчики losses берутся, только если в них больше пакетов (накопитель сброшен перезапуском)
+        packets, reached = self.sent, self.reached
+        if losses and losses.get('packets', 0) > packets:
+            packets, reached = losses['packets'], losses.get('reached', 0)
+        rtts = sorted(self.rtts)
+        payload = {
+            "minute": minute,
+            "target": host,
+            "packets": packets,
+            "reached": reached,
+            "loss_pct": round(100 * (packets - reached) / packets, 2) if packets else None,
+            "rtt_avg": round(sum(rtts) / len(rtts), 2) if rtts else None,
+            "rtt_p50": percentile(rtts, 50),
+            "rtt_max": rtts[-1] if rtts else None,
+            "outage": self.outage_since is not None,
+            "outage_since": self.outage_since,
+            "fault": losses.get('fault') if losses else None
+        }
+        self.rtts = []
+        self.sent = 0
+        self.reached = 0
+        return payload
+
+
+def observe(record):
+    """
+    Учитывает запись ping в статистике минуты её хоста.
+    """
+    stats = _minutes.get(record['target'])
+    if stats is None:
+        stats = _minutes[record['target']] = MinuteStats()
+    stats.observe(record)
+
+
+def finish_minute(host, minute, losses):
+    """
+    Закрывает минуту хоста и ставит её в очередь канала (если канал запущен).
+    """
+    stats = _minutes.get(host) or MinuteStats()
+    payload = stats.finish(host, minute, losses)
+    if _channel is not None:
+        _channel.push(payload)
+    return payload
+
+
+class HeartbeatChannel:
+    """
+    Отправляет итоги минут небольшими пачками JSON через одно постоянное соединение.
+    Пока сервер недоступен, минуты копятся (не больше max_pending, старые вытесняются)
+    и уходят одной пачкой после восстановления связи.
+    """
+
+    def __init__(self, send_fn, flush_secs=5, max_pending=1440, max_batch=120, max_backoff_secs=300):
+        self.send_fn = send_fn
+        self.flush_secs = flush_secs
+        self.max_batch = max_batch
+        self.max_backoff_secs = max_backoff_secs
+        self.pending = deque(maxlen=max_pending)
+        self.wakeup = asyncio.Event()
+        self.sent = 0
+        self.failures = 0
+
+    def push(self, payload):
+        if len(self.pending) == self.pending.maxlen:
+            logging.info(
+                "[HEARTBEAT] Очередь заполнена, вытеснена минута %s", clock.format_minute(self.pending[0]['minute'])
+            )
+        self.pending.append(payload)
+        self.wakeup.set()
+
+    async def run(self, session_factory):
+        """
+        Цикл отправки. Сессия создаётся один раз, соединение переиспользуется между пачками.
+
+        :param session_factory: Функция без аргументов, возвращающая aiohttp.ClientSession.
+        """
+        backoff = self.flush_secs
+        async with session_factory() as session:
+            while True:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), self.flush_secs)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+
+                while self.pending:
+                    batch = [self.pending[i] for i in range(min(self.max_batch, len(self.pending)))]
+                    if not await self.send_fn(session, batch):
+                        self.failures += 1
+                        await asyncio.sleep(backoff)
+                        backoff = min(backoff * 2, self.max_backoff_secs)
+                        break
+                    for _ in batch:
+                        self.pending.popleft()
+                    self.sent += len(batch)
+                    backoff = self.flush_secs
+                    if len(batch) > 1:
+                        logging.info("[HEARTBEAT] Отправлено накопленных минут: %s", len(batch))
+
+
+def start(heartbeat_config, send_fn, session_factory):
+    """
+    Запускает канал процесса в текущем event loop.
+
+    :param heartbeat_config: HeartbeatConfig.
+    :param send_fn: Асинхронная функция (session, batch) -> bool.
+    :param session_factory: Фабрика aiohttp.ClientSession.
+    """
+    global _channel
+    _channel = HeartbeatChannel(
+        send_fn,
+        flush_secs=heartbeat_config.flush_secs,
+        max_pending=heartbeat_config.max_pending_minutes,
+        max_batch=heartbeat_config.max_batch
+    )
+    return asyncio.ensure_future(_channel.run(session_factory))
+
+
+def persistent_session(timeout_secs):
+    """
+    Сессия с одним долгоживущим соединением для heartbeat.
+    """
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=1, keepalive_timeout=300),
+        timeout=aiohttp.ClientTimeout(total=timeout_secs)
+    )
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+
+import clock
+from rollup import percentile
+
+
+class HopAggregator:
+    """
+    Накопитель поххоповой статистики за окно сбоя (в духе mtr):
+    по каждому номеру хопа считает отправленные/потерянные пробы и задержки.
+    """
+
+    def __init__(self, target):
+        self.target = target
+        self.started = clock.now_ms()
+        self.traces = 0
+        self.hops = {}
+
+    def add(self, hops):
+        """
+        Учитывает хопы одной трассировки.
+
+        :param hops: Список хопов с rtts_ms и lost (см. nettools.parse_trace_output).
+        """
+        self.traces += 1
+        for hop in hops:
+            stats = self.hops.setdefault(hop['hop'], {"ips": {}, "sent": 0, "lost": 0, "rtts": []})
+            rtts = hop.get('rtts_ms') or []
+            stats["sent"] += len(rtts) + hop.get('lost', 0)
+            stats["lost"] += hop.get('lost', 0)
+            stats["rtts"].extend(rtts)
+            if hop.get('ip'):
+                stats["ips"][hop['ip']] = stats["ips"].get(hop['ip'], 0) + 1
+
+    def summary(self):
+        """
+        Компактная сводка по хопам за окно.
+
+        :return: dict для потока hops.
+        """
+        hops = []
+        for number in sorted(self.hops):
+            stats = self.hops[number]
+            rtts = sorted(stats["rtts"])
+            hops.append({
+                "hop": number,
+                # Самый частый адрес хопа и все встреченные (балансировка)
+                "ip": max(stats["ips"], key=stats["ips"].get) if stats["ips"] else None,
+                "ips": sorted(stats["ips"]),
+                "sent": stats["sent"],
+                "lost": stats["lost"],
+                "loss_pct": round(100 * stats["lost"] / stats["sent"], 1) if stats["sent"] else None,
+                "rtt_min": rtts[0] if rtts else None,
+                "rtt_avg": round(sum(rtts) / len(rtts), 2) if rtts else None,
+                "rtt_p90": percentile(rtts, 90),
+                "rtt_max": rtts[-1] if rtts else None
+            })
+        return {
+            "stamp": self.started,
+            "stamp_end": clock.now_ms(),
+            "target": self.target,
+            "traces": self.traces,
+            "hops": hops
+        }
+
+
+async def probe_hops(host, aggregator, trace_fn, interval, queries, wait_secs):
+    """
+    Непрерывно трассирует хост и накапливает поххоповую статистику до отмены задачи.
+
+    :param host: Хост назначения.
+    :param aggregator: HopAggregator окна сбоя.
+    :param trace_fn: Асинхронная функция трассировки (nettools.async_trace).
+    :param interval: Пауза между трассировками, сек.
+    :param queries: Проб на хоп.
+    :param wait_secs: Ожидание ответа одной пробы, сек.
+    """
+    while True:
+        try:
+            result = await trace_fn(host, queries, wait_secs)
+            aggregator.add(result['hops'])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.info("[HOPS] Ошибка поххоповой трассировки %s: %s", host, e)
+        await asyncio.sleep(interval)
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+import clock
+import executors
+from rollup import percentile
+
+# Размер тела одного запроса потока отправки. Байты отправки засчитываются, когда сервер
+# ответил на запрос (пока данные лежат в буферах сокетов, они ещё не прошли канал)
+UPLOAD_REQUEST_BYTES = 512 * 1024
+
+CHUNK_BYTES = 64 * 1024
+
+# Доля нагрузки в начале теста, не входящая в расчёт скорости: разгон TCP и заполнение буферов сокетов
+WARMUP_SHARE = 0.25
+
+
+def rtt_summary(times, sent):
+    """
+    Итог фазы теста: количество проб, потери и перцентили RTT.
+    """
+    times = sorted(times)
+    return {
+        "sent": sent,
+        "reached": len(times),
+        "loss_pct": round(100 * (sent - len(times)) / sent, 2) if sent else None,
+        "rtt_avg": round(sum(times) / len(times), 2) if times else None,
+        "rtt_p50": percentile(times, 50),
+        "rtt_p90": percentile(times, 90),
+        "rtt_p99": percentile(times, 99),
+        "rtt_max": times[-1] if times else None
+    }
+
+
+async def sample_rtt(probe_fn, duration, interval):
+    """
+    Пробы задержки каждые interval секунд в течение duration секунд.
+
+    :param probe_fn: Асинхронная функция без аргументов, возвращающая запись ping.
+    :return: Кортеж (времена ответов, отправлено пакетов).
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    times = []
+    sent = 0
+    while loop.time() < deadline:
+        started = loop.time()
+        try:
+            record = await probe_fn()
+        except executors.Overloaded:
+            record = None
+        if record is not None:
+            probe_times = record.get('times_ms') or []
+            times.extend(probe_times)
+            sent += record.get('sent', max(len(probe_times), 1))
+        await asyncio.sleep(max(0.0, interval - (loop.time() - started)))
+    return times, sent
+
+
+class LoadGenerator:
+    """
+    Нагрузка на канал: streams параллельных потоков скачивания (GET, ответ читается до конца
+    и запрашивается снова) или отправки (POST по UPLOAD_REQUEST_BYTES) к url.
+    """
+
+    def __init__(self, url, streams, mode='download'):
+        self.url = url
+        self.streams = streams
+        self.mode = mode
+        self.bytes = 0
+        self.measured_bytes = 0
+        self.measured_secs = 0.0
+        self.errors = 0
+
+    async def download(self, session):
+        while True:
+            try:
+                async with session.get(self.url) as response:
+                    response.raise_for_status()
+                    async for chunk in response.content.iter_chunked(CHUNK_BYTES):
+                        self.bytes += len(chunk)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                self.errors += 1
+                await asyncio.sleep(0.5)
+
+    async def upload(self, session):
+        payload = bytes(UPLOAD_REQUEST_BYTES)
+        while True:
+            try:
+                async with session.post(self.url, data=payload) as response:
+                    response.raise_for_status()
+                    await response.read()
+                self.bytes += len(payload)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                self.errors += 1
+                await asyncio.sleep(0.5)
+
+    async def run(self, duration):
+        """
+        Держит нагрузку duration секунд. Скорость считается после разгона (WARMUP_SHARE).
+        """
+        stream = self.download if self.mode == 'download' else self.upload
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            tasks = [asyncio.ensure_future(stream(session)) for _ in range(self.streams)]
+            try:
+                await asyncio.sleep(duration * WARMUP_SHARE)
+                warm_bytes = self.bytes
+                started = time.monotonic()
+                await asyncio.sleep(duration * (1 - WARMUP_SHARE))
+                self.measured_bytes = self.bytes - warm_bytes
+                self.measured_secs = time.monotonic() - started
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def run(target, loadtest_config, probe_fn):
+    """
+    Тест задержки под нагрузкой: сначала задержка на свободном канале (idle_secs),
+    затем та же проба во время нагрузки канала (duration_secs).
+
+    :param target: Цель проб задержки.
+    :param loadtest_config: LoadTestConfig.
+    :param probe_fn: Асинхронная функция без аргументов - одна проба цели (запись ping).
+    :return: Запись load.
+    """
+    stamp = clock.now_ms()
+    idle_times, idle_sent = await sample_rtt(
+        probe_fn, loadtest_config.idle_secs, loadtest_config.probe_interval_secs
+    )
+
+    generator = LoadGenerator(loadtest_config.url, loadtest_config.streams, loadtest_config.mode)
+    started = time.monotonic()
+    load = asyncio.ensure_future(generator.run(loadtest_config.duration_secs))
+    try:
+        loaded_times, loaded_sent = await sample_rtt(
+            probe_fn, loadtest_config.duration_secs, loadtest_config.probe_interval_secs
+        )
+    finally:
+        await load
+    elapsed = time.monotonic() - started
+
+    idle = rtt_summary(idle_times, idle_sent)
+    loaded = rtt_summary(loaded_times, loaded_sent)
+    record = {
+        "stamp": stamp,
+        "target": target,
+        "url": loadtest_config.url,
+        "mode": loadtest_config.mode,
+        "streams": loadtest_config.streams,
+        "duration_secs": round(elapsed, 2),
+        "idle": idle,
+        "loaded": loaded,
+        "bytes": generator.bytes,
+        "throughput_mbps": (
+            round(generator.measured_bytes * 8 / generator.measured_secs / 1e6, 2)
+            if generator.measured_secs else None
+        ),
+        "load_errors": generator.errors,
+        "rtt_increase_ms": (
+            round(loaded["rtt_p50"] - idle["rtt_p50"], 2)
+            if loaded["rtt_p50"] is not None and idle["rtt_p50"] is not None else None
+        )
+    }
+    logging.info(
+        "[LOAD] %s: RTT p50 %s -> %s мс под нагрузкой, %s Мбит/с (%s, %s потоков)",
+        target, idle['rtt_p50'], loaded['rtt_p50'], record['throughput_mbps'],
+        loadtest_config.mode, loadtest_config.streams
+    )
+    return record
@@ -1,34 +1,247 @@
+import gzip
 import logging.handlers
+import multiprocessing
 import os
 import queue
+import re
+import shutil
+import threading
+import time
 
 # Абсолютный путь для лога
 script_dir = os.path.dirname(os.path.abspath(__file__))
 log_file = os.path.join(script_dir, 'app.log')
 
-# Создаём очередь без ограничения размера
-que = queue.Queue(-1)
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
 
-# Обработчик для очереди (прикрепляется к логгеру)
-queue_handler = logging.handlers.QueueHandler(que)
+# Подсистема сообщения - тег в начале: "[SENDER] ...", "[PING LOOP] ..."
+TAG_PATTERN = re.compile(r'\[([A-Z][A-Z _]*)]')
 
-# Обработчик для консоли
-stream_handler = logging.StreamHandler()
-stream_handler.setLevel(logging.DEBUG)
-stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+_exc_formatter = logging.Formatter()
 
-# Обработчик для файла (append mode)
-file_handler = logging.FileHandler(log_file, mode='a')
-file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 
-# Listener, который обрабатывает очередь в отдельном потоке
-listener = logging.handlers.QueueListener(que, stream_handler, file_handler)
+def message_tag(record):
+    """
+    Тег подсистемы сообщения или None, если сообщение без тега.
+    """
+    msg = record.msg
+    if isinstance(msg, str) and msg.startswith('['):
+        match = TAG_PATTERN.match(msg)
+        if match:
+            return match.group(1)
+    return None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Обработчик с ограниченной очередью: если поток записи не успевает,
+    сообщения отбрасываются и считаются, а не копятся в памяти.
+    Запись кладётся в очередь неотформатированной: msg и args собирает в строку
+    форматтер в потоке записи, поэтому отброшенные сообщения не форматируются вовсе.
+    """
+
+    def __init__(self, que):
+        super().__init__(que)
+        self.dropped = 0
+        self.reported = 0
+
+    def prepare(self, record):
+        if record.exc_info:
+            # Трейсбек держит кадры стека - переводим его в текст сразу, это редкий путь
+            if not record.exc_text:
+                record.exc_text = _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self.dropped > self.reported and self.queue.qsize() < self.queue.maxsize // 2:
+            # Очередь разгрузилась: один раз сообщаем, сколько сообщений потеряно
+            lost = self.dropped - self.reported
+            self.reported = self.dropped
+            warning = logging.LogRecord(
+                'logger', logging.WARNING, __file__, 0,
+                f"[LOG] Очередь логов была переполнена, пропущено сообщений: {lost}", None, None
+            )
+            try:
+                self.queue.put_nowait(warning)
+            except queue.Full:
+                pass
+
+
+class BoundedQueueListener(logging.handlers.QueueListener):
+    """
+    Listener для ограниченной очереди: при остановке ждёт места под сигнал завершения,
+    пока поток записи разбирает очередь.
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class SubsystemFilter(logging.Filter):
+    """
+    Уровни по подсистемам: levels = {"SENDER": logging.WARNING, ...}.
+    Сообщения без тега и с тегами не из списка проверяются по общему уровню.
+    """
+
+    def __init__(self, level, levels):
+        super().__init__()
+        self.level = level
+        self.levels = levels
+
+    def filter(self, record):
+        tag = message_tag(record)
+        return record.levelno >= self.levels.get(tag, self.level)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Ограничивает повторяющиеся сообщения: с одного места вызова проходит не больше burst
+    сообщений за interval секунд. Количество подавленных дописывается к первому
+    сообщению следующего интервала. Предупреждения и ошибки не ограничиваются.
+    """
+
+    def __init__(self, burst, interval):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.sites = {}
+        self.suppressed = 0
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if self.burst <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self.lock:
+            site = self.sites.get(key)
+            if site is None or now - site[0] >= self.interval:
+                skipped = site[2] if site is not None else 0
+                self.sites[key] = [now, 1, 0]
+                if skipped:
+                    record.msg = f"{record.getMessage()} (ещё {skipped} похожих сообщений подавлено)"
+                    record.args = None
+                return True
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            self.suppressed += 1
+            return False
+
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class CompressedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Лог с ротацией по размеру и по времени: app.log -> app.log.1.gz -> app.log.2.gz ...
+    Сжатие выполняется в потоке записи логов, не в event loop.
+    """
+
+    def __init__(self, filename, max_bytes, backup_count, rotate_secs):
+        super().__init__(filename, mode='a', maxBytes=max_bytes, backupCount=backup_count, delay=True)
+        self.rotate_secs = rotate_secs
+        self.rollover_at = time.time() + rotate_secs if rotate_secs else None
+        self.namer = lambda name: name + '.gz'
+        self.rotator = _gzip_rotator
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        if self.rotate_secs:
+            self.rollover_at = time.time() + self.rotate_secs
+
+
+def build_pipeline(path, level=logging.INFO, levels=None, queue_size=10000,
+                   max_bytes=5 * 1024 * 1024, backup_count=5, rotate_secs=86400,
+                   rate_burst=20, rate_interval=60, console=True):
+    """
+    Собирает конвейер логов: фильтры и ограниченная очередь в вызывающем потоке,
+    форматирование и запись на диск в отдельном потоке.
+
+    :return: Кортеж (обработчик для логгера, listener, фильтр частоты).
+    """
+    handlers = []
+    if console:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers.append(stream_handler)
+    file_handler = CompressedRotatingFileHandler(path, max_bytes, backup_count, rotate_secs)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers.append(file_handler)
+
+    handler = DroppingQueueHandler(queue.Queue(queue_size))
+    handler.addFilter(SubsystemFilter(level, levels or {}))
+    rate_filter = RateLimitFilter(rate_burst, rate_interval)
+    handler.addFilter(rate_filter)
+    return handler, BoundedQueueListener(handler.queue, *handlers), rate_filter
+
 
 # Настраиваем root-логгер
 root = logging.getLogger()
-root.setLevel(logging.DEBUG)  # Уровень DEBUG для всех логов
+queue_handler, listener, rate_filter = build_pipeline(log_file)
+root.setLevel(logging.INFO)
 root.addHandler(queue_handler)
+_listener_pid = os.getpid()
 
 # Запускаем listener
 listener.start()
+
+
+def configure(logging_config):
+    """
+    Перестраивает конвейер по конфигурации (LoggingConfig). В процессе-воркере,
+    созданном через fork, заодно запускает свой поток записи.
+    Воркеры пишут в собственный файл app_<имя воркера>.log, чтобы ротации
+    разных процессов не мешали друг другу.
+    """
+    global queue_handler, listener, rate_filter, _listener_pid
+    process_name = multiprocessing.current_process().name
+    path = log_file if process_name == 'MainProcess' else os.path.join(script_dir, f'app_{process_name}.log')
+    level = logging.getLevelName(logging_config.level)
+    levels = {tag: logging.getLevelName(name) for tag, name in logging_config.levels.items()}
+
+    if _listener_pid == os.getpid():
+        listener.stop()
+    root.removeHandler(queue_handler)
+    queue_handler, listener, rate_filter = build_pipeline(
+        path,
+        level=level,
+        levels=levels,
+        queue_size=logging_config.queue_size,
+        max_bytes=logging_config.max_bytes,
+        backup_count=logging_config.backup_count,
+        rotate_secs=logging_config.rotate_hours * 3600,
+        rate_burst=logging_config.rate_limit_burst,
+        rate_interval=logging_config.rate_limit_secs
+    )
+    # Логгер пропускает самый подробный из уровней, дальше решает фильтр подсистем
+    root.setLevel(min([level, *levels.values()]))
+    root.addHandler(queue_handler)
+    _listener_pid = os.getpid()
+    listener.start()
+
+
+def stats():
+    """
+    Счетчики конвейера для метрик: отброшенные при переполнении очереди и подавленные повторы.
+    """
+    return {
+        "queued": queue_handler.queue.qsize(),
+        "dropped": queue_handler.dropped,
+        "rate_limited": rate_filter.suppressed
+    }
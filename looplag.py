@@ -0,0 +1,162 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+import clock
+from rollup import percentile
+
+# Сколько последних событий блокировки хранить до записи в perf
+MAX_BLOCKED_EVENTS = 100
+
+# Сэмплер текущего процесса
+_sampler = None
+
+
+def format_stack(frame, limit=8):
+    """
+    Компактный стек: последние limit кадров в виде "файл:строка функция".
+    """
+    return [
+        f"{os.path.basename(entry.filename)}:{entry.lineno} {entry.name}"
+        for entry in traceback.extract_stack(frame, limit=limit)
+    ]
+
+
+class BlockingDetector(threading.Thread):
+    """
+    Сторожевой поток: если event loop долго не отмечается, снимает стек потока loop,
+    чтобы было видно, какой код его заблокировал.
+    """
+
+    def __init__(self, loop_thread_id, interval, threshold):
+        super().__init__(name='loop-watchdog', daemon=True)
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.threshold = threshold
+        self.last_beat = time.monotonic()
+        self.captured = None
+        self.captured_for = None
+        self.stopped = threading.Event()
+
+    def beat(self):
+        self.last_beat = time.monotonic()
+
+    def take_stack(self):
+        """
+        Стек, снятый во время последней блокировки (один раз на блокировку).
+        """
+        stack, self.captured = self.captured, None
+        return stack
+
+    def run(self):
+        while not self.stopped.wait(self.threshold / 2):
+            beat = self.last_beat
+            if beat == self.captured_for:
+                continue
+            if time.monotonic() - beat - self.interval > self.threshold:
+                frame = sys._current_frames().get(self.loop_thread_id)
+                if frame is not None:
+                    self.captured = format_stack(frame)
+                    self.captured_for = beat
+
+
+class LagSampler:
+    """
+    Измеряет задержку планирования event loop: раз в interval секунд засыпает
+    и смотрит, насколько позже срока проснулся. При включённом детекторе блокировок
+    задержки длиннее threshold записываются вместе со стеком кода, занимавшего loop.
+    """
+
+    def __init__(self, interval=0.25, threshold=0.1, detect_blocking=False):
+        self.interval = interval
+        self.threshold = threshold
+        self.detector = None
+        self.detect_blocking = detect_blocking
+        self.lags = []
+        self.total_blocked = 0
+        self.blocked_events = deque(maxlen=MAX_BLOCKED_EVENTS)
+        self.task = None
+
+    def start(self):
+        if self.detect_blocking:
+            self.detector = BlockingDetector(threading.get_ident(), self.interval, self.threshold)
+            self.detector.start()
+        self.task = asyncio.ensure_future(self.run())
+        return self.task
+
+    async def run(self):
+        try:
+            while True:
+                expected = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, time.monotonic() - expected)
+                self.observe(lag)
+        finally:
+            if self.detector is not None:
+                self.detector.stopped.set()
+
+    def observe(self, lag):
+        self.lags.append(lag)
+        if lag > self.threshold:
+            self.total_blocked += 1
+            if self.detector is not None:
+                self.blocked_events.append({
+                    "stamp": clock.now_ms(),
+                    "blocked_ms": round(lag * 1000, 1),
+                    "stack": self.detector.take_stack()
+                })
+        if self.detector is not None:
+            self.detector.beat()
+
+    def snapshot(self, reset=True):
+        """
+        Задержка loop за интервал с прошлого снимка.
+
+        :param reset: Начать новый интервал.
+        :return: dict для потока metrics.
+        """
+        lags = sorted(self.lags)
+        snapshot = {
+            "samples": len(lags),
+            "lag_avg_ms": round(1000 * sum(lags) / len(lags), 2) if lags else None,
+            "lag_p99_ms": round(1000 * percentile(lags, 99), 2) if lags else None,
+            "lag_max_ms": round(1000 * lags[-1], 2) if lags else None,
+            "blocked": sum(1 for lag in lags if lag > self.threshold),
+            "blocked_total": self.total_blocked
+        }
+        if reset:
+            self.lags = []
+        return snapshot
+
+    def drain_blocked(self):
+        """
+        Забирает накопленные события блокировок для потока perf.
+        """
+        events = list(self.blocked_events)
+        self.blocked_events.clear()
+        return events
+
+
+def start(perf_config):
+    """
+    Запускает сэмплер в текущем event loop по конфигурации (PerfConfig).
+    """
+    global _sampler
+    _sampler = LagSampler(
+        interval=perf_config.lag_sample_secs,
+        threshold=perf_config.blocking_threshold_ms / 1000,
+        detect_blocking=perf_config.detect_blocking
+    )
+    return _sampler.start()
+
+
+def snapshot(reset=True):
+    return _sampler.snapshot(reset) if _sampler is not None else None
+
+
+def drain_blocked():
+    return _sampler.drain_blocked() if _sampler is not None else []
@@ -1,73 +1,214 @@
 import asyncio
+import atexit
+import functools
 import json
 import logging
 import os
+import re
 import sys
 import time
 import zipfile
 from datetime import datetime
 
+import blobs
+import clock
 import config
+import executors
+import faultloc
+import framestream
+import heartbeat
+import hopstats
+import loadtest
 import logger
-from client import send_to_server
+import looplag
+import pathtrack
+import rdns
+import recent
+import rollup
+import spool
+import supervisor
+import tcpprobe
+import throttle
+import uplinks
+from client import send_heartbeats, send_to_server
 from nettools import async_ping, async_trace
 
 # Константы для имен директорий
 DATA_DIR = 'data'
 SENDING_DIR = 'sending'
 
+# Префиксы файлов, входящих в архив ротации
+STREAM_PREFIXES = (
+    'ping_', 'trace_', 'losses_', 'blobs_', 'rollup_', 'metrics_', 'paths_', 'hops_', 'perf_', 'uplinks_', 'load_'
+)
+
+# Дополнительные потоки архива, лежащие рядом с ping/trace с той же меткой и форматом
+SIBLING_STREAMS = ('blobs', 'metrics', 'paths', 'hops', 'perf', 'uplinks', 'load')
+
+
+def sibling_file(file_path, prefix):
+    """
+    Возвращает путь к потоку prefix того же архива и формата, что и файл ping/trace.
+
+    :param file_path: Путь вида data/ping_<stamp>.jsonl(.gz).
+    :param prefix: Префикс потока, например 'blobs'.
+    :return: Путь вида data/<prefix>_<stamp>.jsonl(.gz).
+    """
+    dirname, name = os.path.split(file_path)
+    stamp, extension = name.split('_', 1)[1].split('.', 1)
+    return os.path.join(dirname, f'{prefix}_{stamp}.{extension}')
+
+
+def blobs_file_for(file_path):
+    """
+    Возвращает путь к файлу блобов того же архива, что и файл ping/trace.
+    """
+    return sibling_file(file_path, 'blobs')
+
+
+def host_tag(host):
+    """
+    Часть имени файла, обозначающая цель мониторинга (точки и двоеточия заменяются на дефисы).
+    """
+    return re.sub(r'[^0-9A-Za-z-]', '-', host)
+
+
+def make_stamp(host):
+    """
+    Временная метка для имён файлов ротации.
+    При нескольких целях к ней добавляется тег хоста, чтобы файлы разных целей не пересекались.
+
+    :param host: Хост, для которого создаются файлы.
+    :return: Строка вида 2025-11-24_23-28 или 2025-11-24_23-28_1-1-1-1.
+    """
+    stamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
+    if len(config.config.monitor.targets) > 1:
+        stamp += f'_{host_tag(host)}'
+    return stamp
+
+
+def stream_extension():
+    """
+    Расширение файлов потоков ping/trace: сжатые кадры или обычный JSONL.
+    """
+    return 'jsonl.gz' if config.config.storage.stream_compression else 'jsonl'
+
 
 def append_to_log(data, file_path):
     """
     Добавляет заданные данные в виде JSON-объекта в указанный файл, за которым следует новая строка.
     Обеспечивает немедленную запись данных на диск.
+    Для файлов *.jsonl.gz запись попадает в текущий сжатый кадр, который сбрасывается на диск целиком.
 
     :param data: Данные для добавления в формате JSON (dict).
     :param file_path: Путь к файлу журнала.
     """
     try:
-        with open(file_path, 'a') as f:
-            json.dump(data, f)
-            f.write('\n')
-            f.flush()  # Принудительная запись на диск
-        logging.info(f"[LOG] Добавлены данные в {file_path}, размер теперь: {os.stat(file_path).st_size} байт")
+        if config.config.storage.dedup_raw:
+            data = blobs.dedup_record(data, blobs.store_for(blobs_file_for(file_path)))
+        if file_path.endswith('.gz'):
+            framestream.writer_for(
+                file_path,
+                config.config.storage.frame_records,
+                config.config.storage.frame_secs
+            ).append(data)
+        else:
+            with open(file_path, 'a') as f:
+                json.dump(data, f)
+                f.write('\n')
+                f.flush()  # Принудительная запись на диск
+        logging.debug("[LOG] Добавлены данные в %s", file_path)
     except Exception as e:
-        logging.info(f"[ERROR] Не удалось добавить в журнал: {e}")
+        logging.info("[ERROR] Не удалось добавить в журнал: %s", e)
+
+
+def record_trace(host, trace_result, trace_file):
+    """
+    Записывает трассировку с учетом предыдущего маршрута до хоста:
+    - подставляет имена хопов из кеша обратного DNS (без ожидания сети);
+    - при смене маршрута пишет событие в поток paths;
+    - при storage.trace_dedup вместо неизменившегося маршрута пишет компактную отметку,
+      полная запись остаётся при смене маршрута и первой трассировке в архиве.
+
+    :param host: Хост назначения.
+    :param trace_result: Результат async_trace.
+    :param trace_file: Путь к файлу журнала trace.
+    """
+    if config.config.rdns.enabled:
+        rdns.get_resolver().annotate(trace_result['hops'])
+
+    tracker = pathtrack.tracker_for(host)
+    signature, previous, changed = tracker.observe(trace_result['hops'])
+    if changed:
+        logging.info("[TRACE] Маршрут до %s изменился", host)
+        append_to_log(
+            pathtrack.change_event(host, trace_result, previous, signature),
+            sibling_file(trace_file, 'paths')
+        )
+
+    if not config.config.storage.trace_dedup:
+        append_to_log(trace_result, trace_file)
+    elif tracker.needs_full(trace_file, changed, signature):
+        append_to_log({**trace_result, "signature": pathtrack.signature_id(signature)}, trace_file)
+    else:
+        # Отметка ссылается на последний полностью записанный маршрут
+        append_to_log(pathtrack.unchanged_marker(trace_result, tracker.signature), trace_file)
 
 
 def zip_files(zip_path, files):
     """
     Создает ZIP-архив по указанному пути, содержащий заданные файлы.
+    Уже сжатые потоки (*.gz) складываются без повторного сжатия.
+    Архив пишется во временный файл и переименовывается целиком, чтобы отправка
+    из другого процесса не подхватила недописанный ZIP.
 
     :param zip_path: Путь, где будет создан ZIP-файл.
     :param files: Список кортежей (путь_к_исходному_файлу, имя_в_архиве).
     :return: True, если создание ZIP удалось, иначе False.
     """
+    tmp_path = zip_path + '.tmp'
     try:
-        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_LZMA) as zipf:
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_LZMA) as zipf:
             for src, arcname in files:
                 if os.path.exists(src):
-                    zipf.write(src, arcname)
-        logging.info(f"[ZIP] Создан zip {zip_path}")
+                    compression = zipfile.ZIP_STORED if src.endswith('.gz') else zipfile.ZIP_LZMA
+                    zipf.write(src, arcname, compress_type=compression)
+        os.replace(tmp_path, zip_path)
+        logging.info("[ZIP] Создан zip %s", zip_path)
         return True
     except Exception as e:
-        logging.info(f"[ERROR] Не удалось заархивировать файлы: {e}")
+        logging.info("[ERROR] Не удалось заархивировать файлы: %s", e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
         return False
 
 
-def recover():
+def recover(hosts=None):
     """
-    Восстанавливает и архивирует оставшиеся файлы ping, trace и losses из DATA_DIR и SENDING_DIR.
+    Восстанавливает и архивирует оставшиеся файлы ping, trace, losses и blobs из DATA_DIR и SENDING_DIR.
     Группирует файлы по временной метке, создает ZIP-архивы для каждой группы в SENDING_DIR
     и удаляет оригинальные файлы после архивирования.
+    Сжатые потоки обрезаются по последнему целому кадру, затем применяется свёртка.
+
+    :param hosts: Если задан, восстанавливаются только файлы этих целей (после падения одного воркера).
     """
     os.makedirs(SENDING_DIR, exist_ok=True)
 
+    def owned(stamp):
+        if hosts is None or len(config.config.monitor.targets) <= 1:
+            return True
+        return stamp.endswith(tuple(f'_{host_tag(host)}' for host in hosts))
+
+    # Недописанные архивы: исходные файлы ещё не удалены, архив будет создан заново
+    for f in os.listdir(SENDING_DIR):
+        if f.startswith('archive_') and f.endswith('.zip.tmp') and owned(f[len('archive_'):-len('.zip.tmp')]):
+            os.remove(os.path.join(SENDING_DIR, f))
+
     # Собираем все релевантные файлы из обеих директорий
     for dirpath in [DATA_DIR, SENDING_DIR]:
         if not os.path.exists(dirpath):
             continue
-        files = [f for f in os.listdir(dirpath) if f.startswith(('ping_', 'trace_', 'losses_'))]
+        files = [f for f in os.listdir(dirpath) if f.startswith(STREAM_PREFIXES)]
 
         # Группируем файлы по временной метке (все после префикса до расширения)
         stamps = {}
@@ -75,7 +216,9 @@ def recover():
             parts = f.split('_', 1)
             if len(parts) < 2:
                 continue
-            stamp = parts[1].rsplit('.', 1)[0]
+            stamp = parts[1].split('.', 1)[0]
+            if not owned(stamp):
+                continue
             stamps.setdefault(stamp, []).append((dirpath, f))
 
         # Создаем архивы для каждой группы временных меток
@@ -83,12 +226,28 @@ def recover():
             zip_path = os.path.join(SENDING_DIR, f'archive_{stamp}.zip')
             if not os.path.exists(zip_path):
                 files_to_zip = [(os.path.join(dp, f), f) for dp, f in file_list]
+                for src, _ in files_to_zip:
+                    if src.endswith('.gz'):
+                        framestream.salvage(src)
+
+                paths = {f.split('_', 1)[0]: os.path.join(dp, f) for dp, f in file_list}
+                if 'ping' in paths and 'rollup' not in paths:
+                    rollup_name = f'rollup_{stamp}.json'
+                    rollup.apply_rollup(
+                        paths['ping'], paths.get('trace'), paths.get('losses'), paths.get('blobs'),
+                        os.path.join(dirpath, rollup_name), config.config.rollup,
+                        [path for prefix, path in paths.items() if prefix in SIBLING_STREAMS and prefix != 'blobs']
+                    )
+                    if os.path.exists(os.path.join(dirpath, rollup_name)):
+                        file_list.append((dirpath, rollup_name))
+                        files_to_zip.append((os.path.join(dirpath, rollup_name), rollup_name))
+
                 if zip_files(zip_path, files_to_zip):
                     for dp, f in file_list:
                         src_path = os.path.join(dp, f)
                         if os.path.exists(src_path):
                             os.remove(src_path)
-                    logging.info(f"[RECOVER] Создан архив {zip_path}")
+                    logging.info("[RECOVER] Создан архив %s", zip_path)
 
 
 async def initialize_monitor_files(current_stamp):
@@ -98,8 +257,9 @@ async def initialize_monitor_files(current_stamp):
     :param current_stamp: Строка временной метки для именования файлов.
     :return: Кортеж путей к файлам ping_file, trace_file, losses_file.
     """
-    current_ping_file = os.path.join(DATA_DIR, f'ping_{current_stamp}.jsonl')
-    current_trace_file = os.path.join(DATA_DIR, f'trace_{current_stamp}.jsonl')
+    extension = stream_extension()
+    current_ping_file = os.path.join(DATA_DIR, f'ping_{current_stamp}.{extension}')
+    current_trace_file = os.path.join(DATA_DIR, f'trace_{current_stamp}.{extension}')
     current_losses_file = os.path.join(DATA_DIR, f'losses_{current_stamp}.json')
 
     os.makedirs(DATA_DIR, exist_ok=True)
@@ -107,11 +267,11 @@ async def initialize_monitor_files(current_stamp):
 
     if not os.path.exists(current_ping_file):
         open(current_ping_file, 'a').close()
-        logging.info(f"[INFO] Создан файл ping {current_ping_file}")
+        logging.info("[INFO] Создан файл ping %s", current_ping_file)
 
     if not os.path.exists(current_trace_file):
         open(current_trace_file, 'a').close()
-        logging.info(f"[INFO] Создан файл trace {current_trace_file}")
+        logging.info("[INFO] Создан файл trace %s", current_trace_file)
 
     return current_ping_file, current_trace_file, current_losses_file
 
@@ -122,42 +282,179 @@ def load_losses(current_losses_file):
     или инициализирует пустой словарь, если файл некорректен.
 
     :param current_losses_file: Путь к JSON-файлу losses.
-    :return: Загруженные данные о потерях по минутам (dict).
+    :return: Загруженные данные о потерях по минутам (dict, ключ - начало минуты в мс эпохи).
     """
     lost_by_minute = {}
     if os.path.exists(current_losses_file):
         with open(current_losses_file, 'r') as f:
             try:
-                lost_by_minute = json.load(f)
-                logging.info(f"[INFO] Загружены существующие потери из {current_losses_file}")
+                lost_by_minute = {
+                    clock.parse_minute_key(minute): counters for minute, counters in json.load(f).items()
+                }
+                logging.info("[INFO] Загружены существующие потери из %s", current_losses_file)
             except json.JSONDecodeError:
                 lost_by_minute = {}
     return lost_by_minute
 
 
+def count_minute(lost_by_minute, minute, sent, reached):
+    """
+    Добавляет пакеты пробы к счетчикам минуты. Дополнительные поля минуты (fault, probes) сохраняются.
+
+    :param lost_by_minute: Словарь данных о потерях (обновляется на месте).
+    :param minute: Минута (начало минуты, мс эпохи).
+    :param sent: Отправлено пакетов.
+    :param reached: Дошло пакетов.
+    """
+    counters = lost_by_minute.setdefault(minute, {})
+    counters["packets"] = counters.get("packets", 0) + sent
+    counters["reached"] = counters.get("reached", 0) + reached
+
+
+def finish_minute(host, minute, lost_by_minute):
+    """
+    Отдаёт итог закончившейся минуты в heartbeat (если он включён).
+    """
+    if config.config.heartbeat.enabled:
+        heartbeat.finish_minute(host, minute, lost_by_minute.get(minute))
+
+
+async def run_probe(host, count, interface=None):
+    """
+    Проба цели своего типа: ICMP ping для адреса, TCP/HTTP-проба для tcp:// и http(s)://.
+    Формат записи одинаковый.
+
+    :param host: Цель мониторинга.
+    :param count: Количество пакетов (попыток соединения).
+    :param interface: Интерфейс, к которому привязывается проба (uplinks), или None - маршрут по умолчанию.
+    :return: Запись ping.
+    """
+    if tcpprobe.parse_target(host) is None:
+        source = uplinks.ping_source(interface) if interface is not None else None
+        return await async_ping(host, count=count, source=source)
+    return await tcpprobe.probe(
+        host, count,
+        timeout=config.config.tcp_probe.timeout_secs,
+        concurrency=config.config.tcp_probe.concurrency,
+        interval=config.config.tcp_probe.interval_secs,
+        interface=interface
+    )
+
+
+async def probe_ping(host, count):
+    """
+    Проба с отметкой окна: отправка архивов на это время приостанавливается,
+    а в запись добавляется, шла ли во время пробы отправка (upload_in_flight, upload_bytes).
+
+    :param host: Цель мониторинга.
+    :param count: Количество пакетов.
+    :return: Запись ping.
+    """
+    with throttle.probing() as window:
+        result = await run_probe(host, count)
+    result.update(window.flags())
+    # Накопитель минуты сбрасывает только finish_minute, который работает при включённом heartbeat
+    if config.config.heartbeat.enabled:
+        heartbeat.observe(result)
+    recent.observe(result)
+    return result
+
+
+async def probe_uplinks(host, count):
+    """
+    Одновременные пробы цели через каждый канал (uplinks), с привязкой к интерфейсу.
+    Записи помечаются интерфейсом и не попадают в счетчики потерь основной пробы.
+
+    :param host: Цель мониторинга.
+    :param count: Количество пакетов.
+    :return: Список записей ping с полями interface, source, inferred_type.
+    """
+    try:
+        interfaces = await uplinks.current(config.config.uplinks)
+    except Exception as e:
+        logging.info("[UPLINK] Не удалось получить список интерфейсов: %r", e)
+        return []
+    with throttle.probing():
+        results = await asyncio.gather(
+            *(run_probe(host, count, interface) for interface in interfaces), return_exceptions=True
+        )
+    records = []
+    for interface, result in zip(interfaces, results):
+        if isinstance(result, Exception):
+            logging.info("[UPLINK] Проба %s через %s не выполнена: %r", host, interface['name'], result)
+            continue
+        result.update({
+            "interface": interface['name'],
+            "source": interface['ipv4'],
+            "inferred_type": interface['inferred_type']
+        })
+        records.append(result)
+    return records
+
+
 async def perform_default_ping(host, ping_file, lost_by_minute, current_minute):
     """
     Выполняет стандартный ping и обновляет журналы и счетчики потерь.
+    Если включены uplinks, одновременно проверяется каждый канал, записи идут в поток uplinks.
 
     :param host: Хост для ping.
     :param ping_file: Путь к файлу журнала ping.
     :param lost_by_minute: Словарь данных о потерях.
-    :param current_minute: Текущая минута в формате строки.
-    :return: Обновленные minute_sent, minute_reached.
+    :param current_minute: Текущая минута (начало минуты, мс эпохи).
+    :return: Количество дошедших пакетов стандартного ping.
     """
-    default_ping = await async_ping(host, count=config.config.ping.standart.packet_count)
+    count = config.config.ping.standart.packet_count
+    if config.config.uplinks.enabled:
+        default_ping, uplink_records = await asyncio.gather(probe_ping(host, count), probe_uplinks(host, count))
+        for record in uplink_records:
+            append_to_log(record, sibling_file(ping_file, 'uplinks'))
+    else:
+        default_ping = await probe_ping(host, count)
     append_to_log(default_ping, ping_file)
-    minute_sent = config.config.ping.standart.packet_count
-    minute_reached = len(default_ping['times_ms'])
+    reached = len(default_ping['times_ms'])
+    count_minute(lost_by_minute, current_minute, count, reached)
+    return reached
+
+
+async def localize_fault(host, check_record):
+    """
+    Одновременно пингует шлюз по умолчанию, хост в кампусе (localize.campus_host) и цель,
+    чтобы за один проход понять, где сбой.
 
-    lost_by_minute[current_minute] = {
-        "packets": minute_sent,
-        "reached": minute_reached
+    :param host: Цель мониторинга.
+    :param check_record: Запись контрольного ping (из неё берётся шлюз).
+    :return: dict {"fault": класс или None, "probes": {роль: итог пробы}}.
+    """
+    count = config.config.localize.packet_count
+    addresses = {
+        "gateway": faultloc.default_gateway(check_record),
+        "campus": config.config.localize.campus_host,
+        "target": host
     }
-    return minute_sent, minute_reached
+    addresses = {role: address for role, address in addresses.items() if address}
+
+    with throttle.probing():
+        results = await asyncio.gather(
+            *(
+                run_probe(address, count) if role == 'target' else async_ping(address, count=count)
+                for role, address in addresses.items()
+            ),
+            return_exceptions=True
+        )
+
+    probes = {}
+    for (role, address), result in zip(addresses.items(), results):
+        if isinstance(result, Exception):
+            logging.info("[LOCALIZE] Проба %s (%s) не выполнена: %r", role, address, result)
+            continue
+        probes[role] = faultloc.probe_summary(address, result)
+
+    fault = faultloc.classify(probes)
+    logging.info("[LOCALIZE] Потери до %s: %s", host, fault or 'не подтвердились')
+    return {"fault": fault, "probes": probes}
 
 
-async def handle_packet_loss(host, ping_file, trace_file, lost_by_minute, current_minute, minute_sent, minute_reached):
+async def handle_packet_loss(host, ping_file, trace_file, lost_by_minute, current_minute):
     """
     Обрабатывает обнаруженные потери пакетов, выполняя полный ping, обновляя журналы,
     и, при необходимости, трассировку и непрерывный ping до восстановления соединения.
@@ -166,45 +463,77 @@ async def handle_packet_loss(host, ping_file, trace_file, lost_by_minute, curren
     :param ping_file: Путь к файлу журнала ping.
     :param trace_file: Путь к файлу журнала trace.
     :param lost_by_minute: Словарь данных о потерях.
-    :param current_minute: Текущая минута в формате строки.
-    :param minute_sent: Текущее количество отправленных пакетов за минуту.
-    :param minute_reached: Текущее количество дошедших пакетов за минуту.
-    :return: Обновленные minute_sent, minute_reached.
+    :param current_minute: Текущая минута (начало минуты, мс эпохи).
+    :return: Обновленная current_minute (сбой мог перейти в следующие минуты).
     """
-    full_ping = await async_ping(host, count=config.config.ping.check.packet_count)
+    full_ping = await probe_ping(host, config.config.ping.check.packet_count)
     append_to_log(full_ping, ping_file)
     sent = config.config.ping.check.packet_count
     reached = len(full_ping['times_ms'])
-    minute_sent += sent
-    minute_reached += reached
-
-    lost_by_minute[current_minute] = {
-        "packets": minute_sent,
-        "reached": minute_reached
-    }
+    count_minute(lost_by_minute, current_minute, sent, reached)
 
     if reached < config.config.ping.check.packet_count:
-        trace_result = await async_trace(host)
-        append_to_log(trace_result, trace_file)
+        if config.config.localize.enabled:
+            lost_by_minute[current_minute].update(await localize_fault(host, full_ping))
+
+        try:
+            trace_result = await async_trace(tcpprobe.probe_host(host))
+            record_trace(host, trace_result, trace_file)
+        except executors.Overloaded:
+            logging.info("[TRACE] Пул trace перегружен, трассировка пропущена")
 
         logging.info("[PING LOOP] Запуск непрерывного ping до восстановления соединения")
-        while True:
-            ping_res = await async_ping(host, count=config.config.ping.continious.packet_count)
-            append_to_log(ping_res, ping_file)
-            minute_sent += config.config.ping.continious.packet_count
-            minute_reached += len(ping_res['times_ms'])
 
-            lost_by_minute[current_minute] = {
-                "packets": minute_sent,
-                "reached": minute_reached
-            }
+        # Поххоповые трассировки параллельно с непрерывным ping на время сбоя
+        hop_task = None
+        if config.config.mtr.enabled:
+            aggregator = hopstats.HopAggregator(host)
+            hop_task = asyncio.ensure_future(hopstats.probe_hops(
+                tcpprobe.probe_host(host), aggregator, async_trace,
+                config.config.mtr.interval_secs, config.config.mtr.queries, config.config.mtr.wait_secs
+            ))
+
+        try:
+            current_minute = await continuous_ping(host, ping_file, lost_by_minute, current_minute)
+        finally:
+            if hop_task is not None:
+                hop_task.cancel()
+                await asyncio.gather(hop_task, return_exceptions=True)
+                if aggregator.traces:
+                    append_to_log(aggregator.summary(), sibling_file(trace_file, 'hops'))
+
+    return current_minute
 
-            if ping_res['avg_ms'] is not None:
-                logging.info("[PING LOOP] Соединение восстановлено!")
-                break
-            await asyncio.sleep(config.config.ping.continious.delay)
 
-    return minute_sent, minute_reached
+async def continuous_ping(host, ping_file, lost_by_minute, current_minute):
+    """
+    Непрерывный ping до восстановления соединения.
+    Если сбой переходит в следующую минуту, итог закончившейся минуты сразу уходит в heartbeat.
+
+    :param host: Хост для ping.
+    :param ping_file: Путь к файлу журнала ping.
+    :param lost_by_minute: Словарь данных о потерях (обновляется на месте).
+    :param current_minute: Текущая минута (начало минуты, мс эпохи).
+    :return: Обновленная current_minute.
+    """
+    while True:
+        ping_res = await probe_ping(host, config.config.ping.continious.packet_count)
+        append_to_log(ping_res, ping_file)
+        count_minute(
+            lost_by_minute, current_minute, config.config.ping.continious.packet_count, len(ping_res['times_ms'])
+        )
+
+        new_minute = clock.minute_of(clock.now_ms())
+        if new_minute != current_minute:
+            finish_minute(host, current_minute, lost_by_minute)
+            current_minute = new_minute
+
+        if ping_res['avg_ms'] is not None:
+            logging.info("[PING LOOP] Соединение восстановлено!")
+            break
+        await asyncio.sleep(config.config.ping.continious.delay)
+
+    return current_minute
 
 
 async def perform_periodic_trace(host, trace_file, last_trace_time):
@@ -213,35 +542,46 @@ async def perform_periodic_trace(host, trace_file, last_trace_time):
 
     :param host: Хост для трассировки.
     :param trace_file: Путь к файлу журнала trace.
-    :param last_trace_time: Временная метка последней трассировки.
+    :param last_trace_time: Момент последней трассировки по time.monotonic() (None - ещё не было).
     :return: Обновленная last_trace_time.
     """
-    if time.time() - last_trace_time >= config.config.timing.trace_check_secs:
-        trace_result = await async_trace(host)
-        append_to_log(trace_result, trace_file)
-        last_trace_time = time.time()
+    if last_trace_time is None or time.monotonic() - last_trace_time >= config.config.timing.trace_check_secs:
+        try:
+            trace_result = await async_trace(tcpprobe.probe_host(host))
+            record_trace(host, trace_result, trace_file)
+        except executors.Overloaded:
+            logging.info("[TRACE] Пул trace перегружен, трассировка пропущена")
+        last_trace_time = time.monotonic()
     return last_trace_time
 
 
-def update_minute(current_minute, minute_sent, minute_reached):
+async def perform_periodic_load_test(host, ping_file, last_load_time):
     """
-    Проверяет смену минуты, очищает данные о потерях (удаляет минуты без потерь)
-    и сбрасывает счетчики при начале новой минуты.
-
-    :param current_minute: Текущая минута в формате строки.
-    :param minute_sent: Текущее количество отправленных пакетов за минуту.
-    :param minute_reached: Текущее количество дошедших пакетов за минуту.
-    :return: Новая current_minute, minute_sent, minute_reached.
+    Выполняет тест задержки под нагрузкой, если истек его интервал. Тест выполняется только
+    для первой цели мониторинга, чтобы канал нагружал один тест на клиент. Пока он идёт,
+    стандартные проверки этой цели приостановлены, а отправка архивов ждёт.
+
+    :param host: Хост цикла мониторинга.
+    :param ping_file: Путь к текущему файлу ping, рядом с ним пишется поток load.
+    :param last_load_time: Момент последнего теста по time.monotonic().
+    :return: Обновленная last_load_time.
     """
-    new_minute = datetime.now().strftime("%Y-%m-%d %H:%M")
-    if new_minute != current_minute:
-        current_minute = new_minute
-        minute_sent = 0
-        minute_reached = 0
-    return current_minute, minute_sent, minute_reached
+    load_config = config.config.loadtest
+    if not load_config.enabled or host != config.config.monitor.targets[0]:
+        return last_load_time
+    if time.monotonic() - last_load_time >= load_config.interval_secs:
+        last_load_time = time.monotonic()
+        if not load_config.url:
+            logging.info("[LOAD] Не задан loadtest.url, тест под нагрузкой пропущен")
+            return last_load_time
+        with throttle.probing():
+            record = await loadtest.run(host, load_config, lambda: run_probe(host, 1))
+        append_to_log(record, sibling_file(ping_file, 'load'))
+    return last_load_time
 
 
 async def rotate_files(
+        host,
         current_stamp,
         current_ping_file,
         current_trace_file,
@@ -255,7 +595,7 @@ async def rotate_files(
     new_lost_by_minute = lost_by_minute  # значение по умолчанию, если ротации нет
 
     # Проверка наступления времени ротации
-    if (datetime.now() - last_rotation_time).total_seconds() >= config.config.timing.rotation_secs:
+    if time.monotonic() - last_rotation_time >= config.config.timing.rotation_secs:
 
         zip_name = f'archive_{current_stamp}.zip'
         zip_path = os.path.join(SENDING_DIR, zip_name)
@@ -265,20 +605,39 @@ async def rotate_files(
             (current_trace_file, os.path.basename(current_trace_file)),
             (current_losses_file, os.path.basename(current_losses_file))
         ]
+        blobs_file = blobs_file_for(current_ping_file)
+        for prefix in SIBLING_STREAMS:
+            stream_file = sibling_file(current_ping_file, prefix)
+            files_to_zip.append((stream_file, os.path.basename(stream_file)))
+
+        # Запечатывание сжатых потоков: дописываем последние кадры
+        for stream_file, _ in files_to_zip:
+            framestream.close(stream_file)
+
+        # Свёртка и прореживание записей перед архивированием
+        rollup_file = os.path.join(DATA_DIR, f'rollup_{current_stamp}.json')
+        await executors.run(
+            'disk', rollup.apply_rollup,
+            current_ping_file, current_trace_file, current_losses_file, blobs_file,
+            rollup_file, config.config.rollup,
+            [sibling_file(current_ping_file, prefix) for prefix in SIBLING_STREAMS if prefix != 'blobs']
+        )
+        files_to_zip.append((rollup_file, os.path.basename(rollup_file)))
 
         # Архивирование
-        if zip_files(zip_path, files_to_zip):
+        if await executors.run('disk', zip_files, zip_path, files_to_zip):
             for f, _ in files_to_zip:
                 if os.path.exists(f):
                     os.remove(f)
+        blobs.release(blobs_file)
 
         # Подготовка новых файлов
-        current_stamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
+        current_stamp = make_stamp(host)
         current_ping_file, current_trace_file, current_losses_file = await initialize_monitor_files(current_stamp)
 
         # Сброс данных о потерях
         new_lost_by_minute = {}
-        last_rotation_time = datetime.now()
+        last_rotation_time = time.monotonic()
 
     return (
         current_stamp, current_ping_file, current_trace_file,
@@ -286,58 +645,92 @@ async def rotate_files(
     )
 
 
-async def monitor_host(host):
+def write_metrics(ping_file):
+    """
+    Дописывает снимок метрик процесса (состояние пулов задач, конвейера логов, задержка event loop)
+    в поток metrics того же архива, а найденные блокировки loop - в поток perf.
+
+    :param ping_file: Путь к текущему файлу ping, рядом с ним пишутся metrics и perf.
+    """
+    append_to_log({
+        "stamp": clock.now_ms(),
+        "pid": os.getpid(),
+        "executors": executors.snapshot(),
+        "logging": logger.stats(),
+        "loop": looplag.snapshot()
+    }, sibling_file(ping_file, 'metrics'))
+    for event in looplag.drain_blocked():
+        append_to_log(event, sibling_file(ping_file, 'perf'))
+
+
+async def monitor_host(host, report_metrics=False):
     """
     Основной цикл мониторинга хоста:
     - Инициализирует файлы и данные о потерях.
     - Выполняет регулярные ping, обрабатывает потери с трассировками и непрерывными ping.
-    - Периодически выполняет трассировки.
+    - Периодически выполняет трассировки и тест задержки под нагрузкой.
     - Обновляет отслеживание потерь по минутам.
     - Ротирует файлы по интервалам.
     - Сохраняет данные о потерях после обновлений.
+    - Раз в минуту пишет метрики процесса (если report_metrics) и отдаёт итог минуты в heartbeat.
+
+    Если пул ping перегружен и его политика 'skip', проверка пропускается до следующего интервала.
 
     :param host: Хост для мониторинга (например, '1.1.1.1').
+    :param report_metrics: Писать ли метрики процесса (достаточно одного хоста на процесс).
     """
-    current_stamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
+    current_stamp = make_stamp(host)
     current_ping_file, current_trace_file, current_losses_file = await initialize_monitor_files(current_stamp)
     lost_by_minute = load_losses(current_losses_file)
 
-    current_minute = datetime.now().strftime("%Y-%m-%d %H:%M")
-    last_trace_time = 0
-    last_rotation_time = datetime.now()
+    current_minute = clock.minute_of(clock.now_ms())
+    last_trace_time = None
+    # Первый тест под нагрузкой - через loadtest.interval_secs после запуска
+    last_load_time = time.monotonic()
+    last_rotation_time = time.monotonic()
 
     while True:
-        start_time = time.time()
-
-        # Стандартный ping и начальное обновление
-        minute_sent, minute_reached = await perform_default_ping(
-            host, current_ping_file, lost_by_minute, current_minute
-        )
-
-        # Сохранение потерь после стандартного ping
-        with open(current_losses_file, 'w') as f:
-            json.dump(lost_by_minute, f, indent=2)
+        start_time = time.monotonic()
 
-        # Проверка на потери и обработка, если есть
-        # Примечание: default_ping из perform_default_ping, но не возвращается;
-        # предполагается доступность или рефакторинг при необходимости
-        if minute_reached < config.config.ping.standart.packet_count:
-            minute_sent, minute_reached = await handle_packet_loss(
-                host, current_ping_file, current_trace_file, lost_by_minute,
-                current_minute, minute_sent, minute_reached
+        try:
+            # Стандартный ping и начальное обновление
+            reached = await perform_default_ping(
+                host, current_ping_file, lost_by_minute, current_minute
             )
 
-            # Сохранение потерь после обработки потерь
+            # Сохранение потерь после стандартного ping
             with open(current_losses_file, 'w') as f:
                 json.dump(lost_by_minute, f, indent=2)
 
+            # Проверка на потери и обработка, если есть
+            if reached < config.config.ping.standart.packet_count:
+                current_minute = await handle_packet_loss(
+                    host, current_ping_file, current_trace_file, lost_by_minute, current_minute
+                )
+
+                # Сохранение потерь после обработки потерь
+                with open(current_losses_file, 'w') as f:
+                    json.dump(lost_by_minute, f, indent=2)
+
+        except executors.Overloaded as e:
+            logging.info("[MONITOR] Пул %s перегружен, проверка %s пропущена", e, host)
+
         # Периодическая трассировка
         last_trace_time = await perform_periodic_trace(host, current_trace_file, last_trace_time)
 
+        # Периодический тест задержки под нагрузкой
+        last_load_time = await perform_periodic_load_test(host, current_ping_file, last_load_time)
+
+        # Сброс давно накопленных кадров сжатых потоков
+        framestream.flush_stale()
+
         # Обновление минуты
-        current_minute, minute_sent, minute_reached = update_minute(
-            current_minute, minute_sent, minute_reached
-        )
+        previous_minute = current_minute
+        current_minute = clock.minute_of(clock.now_ms())
+        if current_minute != previous_minute:
+            finish_minute(host, previous_minute, lost_by_minute)
+            if report_metrics:
+                write_metrics(current_ping_file)
 
         # Сохранение потерь после обновления минуты
         with open(current_losses_file, 'w') as f:
@@ -346,6 +739,7 @@ async def monitor_host(host):
         # Ротация файлов
         (current_stamp, current_ping_file, current_trace_file,
          current_losses_file, last_rotation_time, lost_by_minute) = await rotate_files(
+            host,
             current_stamp,
             current_ping_file,
             current_trace_file,
@@ -355,7 +749,7 @@ async def monitor_host(host):
         )
 
         # Сон для поддержания интервала ping
-        elapsed = time.time() - start_time
+        elapsed = time.monotonic() - start_time
         await asyncio.sleep(max(0.0, config.config.ping.standart.delay - elapsed))
 
 
@@ -363,49 +757,120 @@ async def periodic_sender():
     """
     Периодически проверяет директорию SENDING_DIR на наличие ZIP-архивов и пытается отправить их на сервер.
     Удаляет успешно отправленные файлы; оставляет остальные для повторной попытки.
+    При большой очереди архивы предварительно объединяются в пачки.
     """
     while True:
         await asyncio.sleep(config.config.timing.sender_check_secs)
 
-        zip_files_list = [f for f in os.listdir(SENDING_DIR) if f.endswith('.zip')]
+        await executors.run(
+            'disk', spool.compact,
+            SENDING_DIR, config.config.spool.compact_threshold, config.config.spool.bundle_max_bytes
+        )
+
+        # От старых к новым: пачки встают на место своего первого архива
+        zip_files_list = sorted(
+            (f for f in os.listdir(SENDING_DIR) if f.endswith('.zip')), key=spool.queue_stamp
+        )
         if zip_files_list:
-            logging.info(f"[SENDER] Найдено {len(zip_files_list)} архив(ов) для отправки")
+            logging.info("[SENDER] Найдено %s архив(ов) для отправки", len(zip_files_list))
 
         for f in zip_files_list:
             zip_path = os.path.join(SENDING_DIR, f)
-            logging.info(f"[SENDER] Обработка {f}")
+            logging.info("[SENDER] Обработка %s", f)
 
             if await send_to_server(zip_path):
                 os.remove(zip_path)
-                logging.info(f"[SENDER] Удален отправленный файл {f}")
+                logging.info("[SENDER] Удален отправленный файл %s", f)
             else:
-                logging.info(f"[SENDER] {f} оставлен в директории sending для повторной попытки")
+                logging.info("[SENDER] %s оставлен в директории sending для повторной попытки", f)
 
 
-async def main(host):
+async def monitor_hosts(hosts):
+    """
+    Запускает циклы мониторинга для нескольких хостов в одном event loop.
+    Метрики процесса пишет цикл первого хоста. Если включён heartbeat, здесь же
+    запускается канал отправки итогов минут.
+
+    :param hosts: Список хостов.
+    """
+    looplag.start(config.config.perf)
+    if config.config.heartbeat.enabled:
+        heartbeat.start(
+            config.config.heartbeat, send_heartbeats,
+            lambda: heartbeat.persistent_session(config.config.heartbeat.timeout_secs)
+        )
+    await asyncio.gather(*(monitor_host(host, report_metrics=(i == 0)) for i, host in enumerate(hosts)))
+
+
+def run_worker(hosts, upload_state=None, recent_buffer=None):
+    """
+    Точка входа процесса-воркера: свой event loop, свои циклы мониторинга и писатели.
+    Готовые архивы попадают в общую директорию SENDING_DIR.
+
+    :param hosts: Шард целей мониторинга.
+    :param upload_state: Общее с главным процессом состояние отправки (throttle.shared_state).
+    :param recent_buffer: Общий с главным процессом буфер последних проб (recent.create).
+    """
+    if upload_state is not None:
+        throttle.attach(upload_state)
+    recent.attach(recent_buffer)
+    logger.configure(config.config.logging)
+    atexit.register(framestream.flush_all)
+    executors.configure(config.config.executors)
+    rdns.configure(config.config.rdns)
+    try:
+        asyncio.run(monitor_hosts(hosts))
+    except Exception as e:
+        logging.error("Критическая ошибка воркера %s: %s", hosts, e, exc_info=True)
+        raise
+
+
+async def main(hosts):
     """
     Основная точка входа скрипта:
     - Обеспечивает существование директорий.
     - Выполняет восстановление старых файлов.
     - Запускает задачи мониторинга и отправки параллельно.
+    - При monitor.workers > 0 цели распределяются по процессам-воркерам,
+      а этот процесс только следит за ними и отправляет архивы.
 
-    :param host: Хост для мониторинга.
+    :param hosts: Список хостов для мониторинга.
     """
     os.makedirs(DATA_DIR, exist_ok=True)
     os.makedirs(SENDING_DIR, exist_ok=True)
 
+    logger.configure(config.config.logging)
     recover()
-    await asyncio.gather(
-        monitor_host(host),
-        periodic_sender()
-    )
+    executors.configure(config.config.executors)
+    rdns.configure(config.config.rdns)
+    recent_buffer = recent.create(config.config.recent, hosts)
+    await recent.start_server(config.config.recent)
+    workers = config.config.monitor.workers
+    if workers > 0:
+        shards = supervisor.shard_targets(hosts, workers)
+        await asyncio.gather(
+            supervisor.supervise(
+                shards, functools.partial(
+                    run_worker, upload_state=throttle.shared_state(), recent_buffer=recent_buffer
+                ),
+                on_restart=recover,
+                restart_delay_secs=config.config.monitor.restart_delay_secs
+            ),
+            periodic_sender()
+        )
+    else:
+        atexit.register(framestream.flush_all)
+        await asyncio.gather(
+            monitor_hosts(hosts),
+            periodic_sender()
+        )
 
 
 if __name__ == "__main__":
     print("Starting")
     try:
         logging.info("Скрипт запущен. Директория: %s", logger.script_dir)
-        asyncio.run(main('1.1.1.1'))
+        asyncio.run(main(config.config.monitor.targets))
     except Exception as e:
         logging.error("Критическая ошибка: %s", e, exc_info=True)
         # Опционально: вывод в консоль для тестирования
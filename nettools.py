@@ -1,24 +1,23 @@
-import asyncio
 import ipaddress
 import logging
-from datetime import datetime
 import platform
 import re
 import subprocess
 
+import clock
+import executors
+
 # Для Windows: импортируем CREATE_NO_WINDOW только если на Windows
 if platform.system().lower() == "windows":
     from subprocess import CREATE_NO_WINDOW
 
 
-async def async_ping(host, count=4):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, ping, host, count)
+async def async_ping(host, count=4, source=None):
+    return await executors.run('ping', ping, host, count, source)
 
 
-async def async_trace(host):
-    loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, trace, host)
+async def async_trace(host, queries=None, wait_secs=None):
+    return await executors.run('trace', trace, host, queries, wait_secs)
 
 
 def parse_windows_ipconfig(output):
@@ -284,32 +283,14 @@ def parse_macos_ifconfig(output):
     return working_interfaces
 
 
-def ping(host, count=4):
-    """
-    Универсальный ping для любой локализации Windows и Linux/macOS.
+def parse_ping_output(output, system):
     """
-    system = platform.system().lower()
-    param = "-n" if system == "windows" else "-c"
-    cmd = ["ping", param, str(count), host]
-
-    # Кодировка для Windows — cp866 (даже если система русская)
-    encoding = "cp866" if system == "windows" else "utf-8"
-
-    # Добавляем флаг для скрытия окна на Windows
-    kwargs = {}
-    if system == "windows":
-        kwargs['creationflags'] = CREATE_NO_WINDOW
-
-    proc = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        encoding=encoding,
-        errors="replace",
-        **kwargs
-    )
-    output = proc.stdout
+    Извлекает времена ответов (мс) из вывода ping.
 
+    :param output: Текст консоли ping.
+    :param system: platform.system().lower().
+    :return: Список времён в миллисекундах.
+    """
     if system == "windows":
         # Универсальный паттерн: ловим "время=40мс", "время<1мс", "time=40ms", "time<1ms"
         pattern = r'время[=<]?\s*(\d+(?:\.\d+)?)\s*м[сc]'  # "время=40мс", "время<1мс"
@@ -318,14 +299,36 @@ def ping(host, count=4):
         matches = re.findall(pattern, output, re.IGNORECASE)
         if not matches:
             matches = re.findall(pattern_en, output, re.IGNORECASE)
-
-        times = [float(t) for t in matches]
     else:
         # Linux/macOS — стандартный вывод
         matches = re.findall(r'time[=<]\s*([\d.]+)\s*ms', output)
-        times = [float(t) for t in matches]
+    return [float(t) for t in matches]
 
-    avg_ms = sum(times) / len(times) if times else None
+
+def parse_packet_times(output):
+    """
+    Время отправки и получения каждого ответа из вывода ping -D (Linux): строка ответа
+    начинается с "[<секунды эпохи>.<мкс>]" - момента получения, отправка = получение - RTT.
+
+    :param output: Текст консоли ping -D.
+    :return: Список [отправка, получение] в мс эпохи.
+    """
+    packet_times = []
+    for received, rtt in re.findall(r'^\[(\d+\.\d+)\].*?time[=<]\s*([\d.]+)\s*ms', output, re.MULTILINE):
+        received_ms = round(float(received) * 1000, 3)
+        packet_times.append([round(received_ms - float(rtt), 3), received_ms])
+    return packet_times
+
+
+def network_info():
+    """
+    Информация о текущем подключении: вывод ipconfig / ifconfig / ip addr и разобранные интерфейсы.
+    """
+    system = platform.system().lower()
+    encoding = "cp866" if system == "windows" else "utf-8"
+    kwargs = {}
+    if system == "windows":
+        kwargs['creationflags'] = CREATE_NO_WINDOW
 
     # Получаем информацию о сети
     if system == "windows":
@@ -354,44 +357,38 @@ def ping(host, count=4):
         interfaces = parse_linux_ip_addr(network_output)
 
     return {
-        "stamp": datetime.now().isoformat(),
-        "raw": output,
-        "times_ms": times,
-        "avg_ms": round(avg_ms, 2) if avg_ms is not None else None,
-        "network_info": {
-            "raw": network_output,
-            "interfaces": interfaces
-        }
+        "raw": network_output,
+        "interfaces": interfaces
     }
 
 
-def trace(host):
+def ping(host, count=4, source=None):
     """
-    Выполняет traceroute/tracert до хоста.
-    Возвращает dict:
-    {
-        "stamp": "...",
-        "raw": "<текст консоли traceroute>",
-        "hops": [{"hop": int, "ip": str|None, "host": str|None}, ...],
-        "network_info": {
-            "raw": "<вывод ipconfig/ifconfig/ip addr>",
-            "interfaces": [структурированные интерфейсы]
-        }
-    }
+    Универсальный ping для любой локализации Windows и Linux/macOS.
+    На Linux ping запускается с -D, и в запись попадают время отправки и получения
+    каждого ответа (packet_times); ping Windows и macOS такой отметки не выводит.
+
+    :param source: Привязка к интерфейсу: имя интерфейса (Linux, ping -I) или адрес источника
+                   (Windows/macOS, ping -S). Запись такой пробы не содержит network_info.
     """
     system = platform.system().lower()
-    if system == "windows":
-        cmd = ["tracert", host]
-        encoding = "cp866"
-    else:
-        cmd = ["traceroute", host]
-        encoding = "utf-8"
+    param = "-n" if system == "windows" else "-c"
+    cmd = ["ping", param, str(count)]
+    if source is not None:
+        cmd += ["-I" if system == "linux" else "-S", source]
+    if system == "linux":
+        cmd.append("-D")
+    cmd.append(host)
+
+    # Кодировка для Windows — cp866 (даже если система русская)
+    encoding = "cp866" if system == "windows" else "utf-8"
 
     # Добавляем флаг для скрытия окна на Windows
     kwargs = {}
     if system == "windows":
         kwargs['creationflags'] = CREATE_NO_WINDOW
 
+    stamp = clock.now_ms()
     proc = subprocess.run(
         cmd,
         capture_output=True,
@@ -401,23 +398,47 @@ def trace(host):
         **kwargs
     )
     output = proc.stdout
+    times = parse_ping_output(output, system)
+
+    avg_ms = sum(times) / len(times) if times else None
+
+    record = {
+        "stamp": stamp,
+        "target": host,
+        "raw": output,
+        "sent": count,
+        "times_ms": times,
+        "avg_ms": round(avg_ms, 2) if avg_ms is not None else None
+    }
+    if system == "linux":
+        record["packet_times"] = parse_packet_times(output)
+    if source is None:
+        record["network_info"] = network_info()
+    return record
+
+
+def parse_trace_output(output, system):
+    """
+    Разбирает вывод traceroute/tracert в список хопов.
+
+    :param output: Текст консоли.
+    :param system: platform.system().lower().
+    :return: Список {"hop": int, "ip": str|None, "host": str|None, "rtts_ms": [float], "lost": int}.
+             rtts_ms - времена ответивших проб, lost - количество проб без ответа ('*').
+    """
     hops = []
 
     if system == "windows":
         # Windows (RU/EN)
-        pattern = (
-            r"^\s*(\d+)\s+"
-            r"(?:<\d+\s*(?:мс|ms)|\d+\s*(?:мс|ms)|\*)\s+"
-            r"(?:<\d+\s*(?:мс|ms)|\d+\s*(?:мс|ms)|\*)\s+"
-            r"(?:<\d+\s*(?:мс|ms)|\d+\s*(?:мс|ms)|\*)\s+"
-            r"(.+?)$"
-        )
+        probe = r"(<?\d+\s*(?:мс|ms)|\*)"
+        pattern = rf"^\s*(\d+)\s+{probe}\s+{probe}\s+{probe}\s+(.+?)$"
         for line in output.splitlines():
             m = re.search(pattern, line, re.IGNORECASE)
             if not m:
                 continue
             hop_num = int(m.group(1))
-            tail = m.group(2).strip()
+            probes = [m.group(2), m.group(3), m.group(4)]
+            tail = m.group(5).strip()
 
             ip_match = re.search(r"\[?(\d+\.\d+\.\d+\.\d+)\]?", tail)
             ip = ip_match.group(1) if ip_match else None
@@ -425,7 +446,12 @@ def trace(host):
             host_match = re.search(r"([a-zA-Z0-9\.-]+?)(?:\s+\[|$)", tail)
             hostname = host_match.group(1) if host_match else None
 
-            hops.append({"hop": hop_num, "ip": ip, "host": hostname})
+            # "<1 мс" записывается как 1.0 - верхняя граница
+            rtts = [float(re.search(r"\d+", p).group(0)) for p in probes if p != '*']
+            hops.append({
+                "hop": hop_num, "ip": ip, "host": hostname,
+                "rtts_ms": rtts, "lost": probes.count('*')
+            })
 
     else:
         # Linux / macOS
@@ -447,43 +473,71 @@ def trace(host):
                     hostname = None
                 else:
                     ip = None
-                    hostname = host_or_ip
-            hops.append({"hop": hop_num, "ip": ip, "host": hostname})
+                    hostname = host_or_ip if host_or_ip != '*' else None
+
+            rest = line[m.end(1):]
+            rtts = [float(t) for t in re.findall(r"([\d.]+)\s*ms", rest)]
+            hops.append({
+                "hop": hop_num, "ip": ip, "host": hostname,
+                "rtts_ms": rtts, "lost": rest.split().count('*')
+            })
 
-    # ==================== СЕТЕВАЯ ИНФОРМАЦИЯ ====================
+    return hops
+
+
+def trace(host, queries=None, wait_secs=None):
+    """
+    Выполняет traceroute/tracert до хоста.
+    queries и wait_secs позволяют сделать быструю трассировку (1 проба на хоп, короткое ожидание)
+    для непрерывного поххопового режима; tracert не умеет менять количество проб.
+    Возвращает dict:
+    {
+        "stamp": <время запуска, мс эпохи>,
+        "raw": "<текст консоли traceroute>",
+        "hops": [{"hop": int, "ip": str|None, "host": str|None, "rtts_ms": [float], "lost": int}, ...],
+        "network_info": {
+            "raw": "<вывод ipconfig/ifconfig/ip addr>",
+            "interfaces": [структурированные интерфейсы]
+        }
+    }
+    """
+    system = platform.system().lower()
+    # Только числовые адреса: обратный DNS для хопов выполняется отдельно (см. rdns)
     if system == "windows":
-        network_cmd = ["ipconfig"]
-    elif system == "darwin":
-        network_cmd = ["ifconfig"]
-    else:  # linux
-        network_cmd = ["ip", "addr", "show"]
+        cmd = ["tracert", "-d"]
+        if wait_secs is not None:
+            cmd += ["-w", str(int(wait_secs * 1000))]
+        encoding = "cp866"
+    else:
+        cmd = ["traceroute", "-n"]
+        if queries is not None:
+            cmd += ["-q", str(queries)]
+        if wait_secs is not None:
+            cmd += ["-w", str(wait_secs)]
+        encoding = "utf-8"
+    cmd.append(host)
 
-    network_proc = subprocess.run(
-        network_cmd,
+    # Добавляем флаг для скрытия окна на Windows
+    kwargs = {}
+    if system == "windows":
+        kwargs['creationflags'] = CREATE_NO_WINDOW
+
+    stamp = clock.now_ms()
+    proc = subprocess.run(
+        cmd,
         capture_output=True,
         text=True,
         encoding=encoding,
         errors="replace",
         **kwargs
     )
-    network_output = network_proc.stdout
-
-    # Парсим в структурированные интерфейсы
-    if system == "windows":
-        interfaces = parse_windows_ipconfig(network_output)
-    elif system == "darwin":
-        interfaces = parse_macos_ifconfig(network_output)
-    else:
-        interfaces = parse_linux_ip_addr(network_output)
-
-    # ============================================================
+    output = proc.stdout
+    hops = parse_trace_output(output, system)
 
     return {
-        "stamp": datetime.now().isoformat(),
+        "stamp": stamp,
+        "target": host,
         "raw": output,
         "hops": hops,
-        "network_info": {
-            "raw": network_output,
-            "interfaces": interfaces
-        }
+        "network_info": network_info()
     }
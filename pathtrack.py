@@ -0,0 +1,136 @@
+import hashlib
+
+# Трекеры маршрутов по хосту назначения
+_trackers = {}
+
+
+def hop_signature(hops):
+    """
+    Нормализованная сигнатура маршрута: адреса хопов по порядку,
+    '*' для хопов без ответа, хвостовые '*' отбрасываются.
+
+    :param hops: Список хопов записи trace.
+    :return: Кортеж строк.
+    """
+    signature = [hop.get('ip') or '*' for hop in hops]
+    while signature and signature[-1] == '*':
+        signature.pop()
+    return tuple(signature)
+
+
+def is_truncated(hops):
+    """
+    Трассировка не дошла до конца: хопов нет или последний хоп без ответа
+    (обрыв связи, недоступный хост). Такая трассировка знает только начало маршрута.
+    """
+    return not hops or not hops[-1].get('ip')
+
+
+def paths_differ(a, b, partial=False):
+    """
+    Сравнивает две сигнатуры. Хоп без ответа ('*') совпадает с любым адресом,
+    чтобы единичный таймаут на промежуточном узле не считался сменой маршрута.
+    При partial (одна из трассировок оборвана) сравнивается только общее начало:
+    разная длина сама по себе сменой не считается.
+    """
+    if len(a) != len(b) and not partial:
+        return True
+    return any(x != y and x != '*' and y != '*' for x, y in zip(a, b))
+
+
+def signature_id(signature):
+    """
+    Короткий идентификатор сигнатуры для ссылок из компактных записей.
+    """
+    return hashlib.blake2b('|'.join(signature).encode(), digest_size=8).hexdigest()
+
+
+class PathTracker:
+    """
+    Хранит последний известный маршрут до одного хоста и номер архива,
+    в который он последний раз записан полностью.
+
+    Оборванная трассировка (см. is_truncated) сравнивается с опорной только по отвеченному
+    началу и опорную не заменяет: обрыв связи - не смена маршрута.
+    """
+
+    def __init__(self):
+        self.signature = None
+        self.truncated = False
+        self.last_truncated = False
+        self.full_written_to = None
+
+    def observe(self, hops):
+        """
+        Сравнивает новый маршрут с предыдущим.
+
+        :param hops: Хопы новой трассировки.
+        :return: Кортеж (сигнатура, предыдущая сигнатура, изменился ли маршрут).
+        """
+        signature = hop_signature(hops)
+        truncated = is_truncated(hops)
+        previous = self.signature
+        changed = previous is not None and paths_differ(previous, signature, truncated or self.truncated)
+        # Оборванная опорная сигнатура уступает полной или более длинной
+        if previous is None or changed or (self.truncated and (not truncated or len(signature) > len(previous))):
+            self.signature = signature
+            self.truncated = truncated
+        self.last_truncated = truncated
+        return signature, previous, changed
+
+    def needs_full(self, archive_file, changed, signature):
+        """
+        Нужна ли полная запись: при смене маршрута и при первой трассировке в каждом архиве,
+        чтобы архив можно было разобрать без предыдущих. Сигнатура полной записи становится
+        опорной для следующих отметок, даже если она совпала с прежней только с точностью до '*'.
+        Оборванная трассировка без смены маршрута пишется полностью, но опорной не становится:
+        полной останется и следующая трассировка этого архива.
+        """
+        if changed or self.full_written_to != archive_file:
+            if changed or not self.last_truncated:
+                self.full_written_to = archive_file
+                self.signature = signature
+                self.truncated = self.last_truncated
+            return True
+        return False
+
+
+def tracker_for(host):
+    """
+    Трекер маршрута до хоста, создаётся при первом обращении.
+    """
+    tracker = _trackers.get(host)
+    if tracker is None:
+        tracker = _trackers[host] = PathTracker()
+    return tracker
+
+
+def unchanged_marker(record, signature):
+    """
+    Компактная запись "маршрут не изменился" вместо полной трассировки.
+
+    :param record: Полная запись trace.
+    :param signature: Сигнатура маршрута.
+    :return: dict с меткой времени и идентификатором сигнатуры.
+    """
+    return {
+        "stamp": record["stamp"],
+        "path_unchanged": True,
+        "signature": signature_id(signature)
+    }
+
+
+def change_event(host, record, previous, signature):
+    """
+    Событие смены маршрута для потока paths.
+    """
+    return {
+        "stamp": record["stamp"],
+        "target": host,
+        "previous": list(previous),
+        "current": list(signature),
+        "changed_hops": [
+            i + 1 for i, (x, y) in enumerate(zip(previous, signature))
+            if x != y and x != '*' and y != '*'
+        ]
+    }
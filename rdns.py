@@ -0,0 +1,267 @@
+import asyncio
+import ipaddress
+import logging
+import os
+import random
+import socket
+import struct
+import time
+from collections import OrderedDict
+
+# Тип записи PTR и класс IN
+QTYPE_PTR = 12
+QCLASS_IN = 1
+
+_resolver = None
+
+
+def reverse_name(ip):
+    """
+    Имя для PTR-запроса: 1.0.8.10.in-addr.arpa / ...ip6.arpa.
+    """
+    return ipaddress.ip_address(ip).reverse_pointer
+
+
+def build_ptr_query(ip, query_id):
+    """
+    Собирает DNS-запрос PTR для адреса.
+
+    :param ip: IPv4/IPv6 адрес.
+    :param query_id: Идентификатор запроса (0..65535).
+    :return: Байты UDP-пакета.
+    """
+    header = struct.pack('!HHHHHH', query_id, 0x0100, 1, 0, 0, 0)
+    qname = b''.join(
+        bytes([len(label)]) + label.encode('ascii')
+        for label in reverse_name(ip).split('.')
+    ) + b'\x00'
+    return header + qname + struct.pack('!HH', QTYPE_PTR, QCLASS_IN)
+
+
+def _read_name(data, offset):
+    labels = []
+    jumped_to = None
+    for _ in range(128):
+        length = data[offset]
+        if length == 0:
+            offset += 1
+            break
+        if length & 0xC0 == 0xC0:
+            pointer = struct.unpack_from('!H', data, offset)[0] & 0x3FFF
+            if jumped_to is None:
+                jumped_to = offset + 2
+            offset = pointer
+            continue
+        labels.append(data[offset + 1:offset + 1 + length].decode('ascii', errors='replace'))
+        offset += 1 + length
+    return '.'.join(labels), (jumped_to if jumped_to is not None else offset)
+
+
+def parse_ptr_response(data, query_id):
+    """
+    Разбирает ответ на PTR-запрос.
+
+    :param data: Байты UDP-ответа.
+    :param query_id: Ожидаемый идентификатор.
+    :return: Имя хоста, None если записи нет.
+    :raises ValueError: Ответ не соответствует запросу или повреждён.
+    """
+    if len(data) < 12:
+        raise ValueError("short DNS response")
+    rid, flags, qdcount, ancount, _, _ = struct.unpack_from('!HHHHHH', data, 0)
+    if rid != query_id:
+        raise ValueError("DNS id mismatch")
+    if flags & 0x000F not in (0, 3):  # NOERROR или NXDOMAIN
+        raise ValueError(f"DNS rcode {flags & 0x000F}")
+
+    offset = 12
+    for _ in range(qdcount):
+        _, offset = _read_name(data, offset)
+        offset += 4
+    for _ in range(ancount):
+        _, offset = _read_name(data, offset)
+        rtype, _, _, rdlength = struct.unpack_from('!HHIH', data, offset)
+        offset += 10
+        if rtype == QTYPE_PTR:
+            name, _ = _read_name(data, offset)
+            return name
+        offset += rdlength
+    return None
+
+
+def system_nameserver():
+    """
+    Первый nameserver из /etc/resolv.conf (Linux/macOS). На Windows возвращает None.
+    """
+    try:
+        with open('/etc/resolv.conf', 'r') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] == 'nameserver':
+                    return parts[1], 53
+    except OSError:
+        pass
+    return None
+
+
+def parse_nameserver(value, default_port=53):
+    """
+    Адрес DNS-сервера из конфигурации: "адрес", "адрес:порт", IPv6 "::1" или "[::1]:53".
+    Порт отделяется двоеточием, только если оно в строке одно или адрес в квадратных скобках.
+
+    :return: Кортеж (адрес, порт).
+    :raises ValueError: Порт не число или нет закрывающей скобки.
+    """
+    if value.startswith('['):
+        host, bracket, rest = value[1:].partition(']')
+        if not bracket:
+            raise ValueError(f"nameserver {value!r}: нет закрывающей ']'")
+        return host, int(rest[1:]) if rest.startswith(':') else default_port
+    if value.count(':') == 1:
+        host, _, port = value.partition(':')
+        return host, int(port)
+    return value, default_port
+
+
+class _QueryProtocol(asyncio.DatagramProtocol):
+    def __init__(self, future):
+        self.future = future
+
+    def datagram_received(self, data, addr):
+        if not self.future.done():
+            self.future.set_result(data)
+
+    def error_received(self, exc):
+        if not self.future.done():
+            self.future.set_exception(exc)
+
+
+class PTRResolver:
+    """
+    Асинхронный резолвер обратных имён с LRU-кешем и сроком жизни записей.
+    Запросы идут напрямую по UDP на nameserver, без блокирующего системного резолвера;
+    если nameserver неизвестен (Windows), используется loop.getnameinfo.
+    """
+
+    def __init__(self, nameserver=None, timeout=2.0, cache_size=1024, ttl=3600, negative_ttl=300):
+        self.nameserver = nameserver
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.cache = OrderedDict()
+        self.inflight = {}
+        self.tasks = set()
+
+    def cached(self, ip):
+        """
+        Имя из кеша без обращения к сети.
+
+        :return: Кортеж (найдено ли, имя или None).
+        """
+        entry = self.cache.get(ip)
+        if entry is None:
+            return False, None
+        expires, name = entry
+        if expires < time.monotonic():
+            del self.cache[ip]
+            return False, None
+        self.cache.move_to_end(ip)
+        return True, name
+
+    def _store(self, ip, name):
+        ttl = self.ttl if name else self.negative_ttl
+        self.cache[ip] = (time.monotonic() + ttl, name)
+        self.cache.move_to_end(ip)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    async def resolve(self, ip):
+        """
+        Обратное имя адреса с учетом кеша и таймаута. Ошибки и таймауты дают None.
+        """
+        found, name = self.cached(ip)
+        if found:
+            return name
+        future = self.inflight.get(ip)
+        if future is None:
+            future = self.inflight[ip] = asyncio.ensure_future(self._lookup(ip))
+            future.add_done_callback(lambda _: self.inflight.pop(ip, None))
+        return await asyncio.shield(future)
+
+    async def _lookup(self, ip):
+        try:
+            name = await asyncio.wait_for(self._query(ip), self.timeout)
+        except (asyncio.TimeoutError, OSError, ValueError, IndexError, struct.error) as e:
+            logging.debug("PTR %s не получен: %s", ip, e)
+            name = None
+        self._store(ip, name)
+        return name
+
+    async def _query(self, ip):
+        loop = asyncio.get_running_loop()
+        if self.nameserver is None:
+            host, _ = await loop.getnameinfo((ip, 0), socket.NI_NAMEREQD)
+            return host
+
+        query_id = random.randrange(0x10000)
+        future = loop.create_future()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _QueryProtocol(future),
+            remote_addr=self.nameserver
+        )
+        try:
+            transport.sendto(build_ptr_query(ip, query_id))
+            return parse_ptr_response(await future, query_id)
+        finally:
+            transport.close()
+
+    def annotate(self, hops):
+        """
+        Заполняет host у хопов из кеша, не дожидаясь сети; для адресов без записи
+        в кеше запускает фоновое разрешение, результат попадёт в следующие трассировки.
+
+        :param hops: Список хопов записи trace (изменяется на месте).
+        """
+        for hop in hops:
+            ip = hop.get('ip')
+            if not ip:
+                continue
+            found, name = self.cached(ip)
+            if found:
+                if name:
+                    hop['host'] = name
+            elif ip not in self.inflight:
+                task = asyncio.ensure_future(self.resolve(ip))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+
+def configure(rdns_config):
+    """
+    Создаёт резолвер процесса по конфигурации (RdnsConfig).
+    """
+    global _resolver
+    nameserver = None
+    if rdns_config.nameserver:
+        nameserver = parse_nameserver(rdns_config.nameserver)
+    elif os.name != 'nt':
+        nameserver = system_nameserver()
+    _resolver = PTRResolver(
+        nameserver=nameserver,
+        timeout=rdns_config.timeout_secs,
+        cache_size=rdns_config.cache_size,
+        ttl=rdns_config.ttl_secs,
+        negative_ttl=rdns_config.negative_ttl_secs
+    )
+    return _resolver
+
+
+def get_resolver():
+    """
+    Резолвер процесса (с параметрами по умолчанию, если configure не вызывался).
+    """
+    global _resolver
+    if _resolver is None:
+        _resolver = PTRResolver(nameserver=system_nameserver() if os.name != 'nt' else None)
+    return _resolver
@@ -0,0 +1,253 @@
+import logging
+import multiprocessing
+from array import array
+from multiprocessing import sharedctypes
+
+from aiohttp import web
+
+import clock
+import executors
+from rollup import percentile
+
+# Буфер текущего процесса (у воркеров - общий с главным процессом)
+_buffer = None
+
+
+def _copy(raw, typecode, start, count, capacity):
+    """
+    Копирует count элементов кольца начиная с физической позиции start в локальный array.
+    """
+    out = array(typecode)
+    view = memoryview(raw).cast('B')
+    size = out.itemsize
+    first = min(count, capacity - start)
+    out.frombytes(view[start * size:(start + first) * size])
+    if count > first:
+        out.frombytes(view[:(count - first) * size])
+    return out
+
+
+def _minute_stats(total):
+    """
+    Поминутная разбивка итогов цели: метки минут хранят значения счетчиков и длину массива RTT
+    на начало минуты, так что RTT минуты - срез общего массива цели.
+    """
+    samples, lost, rtts, marks = total
+    ends = [mark[1:] for mark in marks[1:]] + [(samples, lost, len(rtts))]
+    return [
+        dict(
+            minute=clock.format_minute(minute),
+            **_stats(end_samples - start_samples, end_lost - start_lost, sorted(rtts[start_rtt:end_rtt]))
+        )
+        for (minute, start_samples, start_lost, start_rtt), (end_samples, end_lost, end_rtt) in zip(marks, ends)
+    ]
+
+
+def _stats(samples, lost, rtts):
+    return {
+        "samples": samples,
+        "lost": lost,
+        "loss_pct": round(100 * lost / samples, 2) if samples else None,
+        "rtt_avg": round(sum(rtts) / len(rtts), 2) if rtts else None,
+        "rtt_p50": round(percentile(rtts, 50), 2) if rtts else None,
+        "rtt_p90": round(percentile(rtts, 90), 2) if rtts else None,
+        "rtt_p99": round(percentile(rtts, 99), 2) if rtts else None,
+        "rtt_max": round(rtts[-1], 2) if rtts else None
+    }
+
+
+class RecentBuffer:
+    """
+    Кольцевой буфер последних проб в общей памяти процессов. Пробы хранятся в четырёх
+    массивах фиксированного размера: время (мс эпохи), номер цели, RTT и признак потери,
+    поэтому объём памяти задаётся ёмкостью и не растёт - старые пробы перезаписываются новыми.
+    Время проб в буфере не убывает, так что начало окна ищется двоичным поиском.
+    """
+
+    SAMPLE_BYTES = 8 + 2 + 4 + 1
+
+    def __init__(self, capacity, targets):
+        self.capacity = capacity
+        self.targets = list(targets)
+        self.index = {target: i for i, target in enumerate(self.targets)}
+        self.stamps = sharedctypes.RawArray('q', capacity)
+        self.target_ids = sharedctypes.RawArray('H', capacity)
+        self.rtts = sharedctypes.RawArray('f', capacity)
+        self.lost = sharedctypes.RawArray('B', capacity)
+        # Всего записано проб; позиция следующей записи - head % capacity
+        self.head = sharedctypes.RawValue('q', 0)
+        self.lock = multiprocessing.Lock()
+
+    def add(self, target, times, sent, stamp_ms=None):
+        """
+        Добавляет пробы одной записи ping: по одной на каждый ответ и на каждый потерянный пакет.
+
+        :param target: Цель мониторинга (пробы неизвестных целей не сохраняются).
+        :param times: RTT ответов, мс.
+        :param sent: Отправлено пакетов.
+        :param stamp_ms: Время записи, мс эпохи (по умолчанию - текущее).
+        :return: Количество добавленных проб.
+        """
+        target_id = self.index.get(target)
+        if target_id is None:
+            return 0
+        stamp = clock.now_ms() if stamp_ms is None else stamp_ms
+        lost = max(sent - len(times), 0)
+        with self.lock:
+            head = self.head.value
+            if head:
+                stamp = max(stamp, self.stamps[(head - 1) % self.capacity])
+            reached = len(times)
+            for i in range(reached + lost):
+                position = (head + i) % self.capacity
+                self.stamps[position] = stamp
+                self.target_ids[position] = target_id
+                self.rtts[position] = times[i] if i < reached else 0.0
+                self.lost[position] = i >= reached
+            self.head.value = head + reached + lost
+        return reached + lost
+
+    def window(self, since_ms):
+        """
+        Копия проб не старше since_ms: кортеж локальных массивов (stamps, target_ids, rtts, lost).
+        Под блокировкой выполняются только двоичный поиск и копирование блоков памяти.
+        """
+        with self.lock:
+            head = self.head.value
+            low = max(0, head - self.capacity)
+            high = head
+            while low < high:
+                middle = (low + high) // 2
+                if self.stamps[middle % self.capacity] < since_ms:
+                    low = middle + 1
+                else:
+                    high = middle
+            start = low % self.capacity
+            count = head - low
+            return (
+                _copy(self.stamps, 'q', start, count, self.capacity),
+                _copy(self.target_ids, 'H', start, count, self.capacity),
+                _copy(self.rtts, 'f', start, count, self.capacity),
+                _copy(self.lost, 'B', start, count, self.capacity)
+            )
+
+    def summary(self, minutes, target=None, by_minute=False, now_ms=None):
+        """
+        Итоги последних minutes минут по целям: пробы, потери, перцентили RTT.
+
+        :param minutes: Длина окна, минут.
+        :param target: Только эта цель.
+        :param by_minute: Добавить поминутную разбивку.
+        :param now_ms: Конец окна, мс эпохи (по умолчанию - текущее время).
+        :return: dict для ответа API.
+        """
+        now = clock.now_ms() if now_ms is None else now_ms
+        stamps, target_ids, rtts, lost = self.window(now - int(minutes * clock.MINUTE_MS))
+        only = self.index.get(target, -1) if target is not None else None
+
+        # Цель -> [проб, потерь, RTT ответов по времени, метки начала минут]
+        totals = {}
+        for i in range(len(stamps)):
+            target_id = target_ids[i]
+            if only is not None and target_id != only:
+                continue
+            if target_id not in totals:
+                totals[target_id] = [0, 0, array('f'), []]
+            total = totals[target_id]
+            if by_minute:
+                minute = stamps[i] - stamps[i] % clock.MINUTE_MS
+                marks = total[3]
+                if not marks or marks[-1][0] != minute:
+                    marks.append((minute, total[0], total[1], len(total[2])))
+            total[0] += 1
+            if lost[i]:
+                total[1] += 1
+            else:
+                total[2].append(rtts[i])
+
+        result = {"minutes": minutes, "targets": {}}
+        for target_id, total in sorted(totals.items()):
+            entry = _stats(total[0], total[1], sorted(total[2]))
+            if by_minute:
+                entry["by_minute"] = _minute_stats(total)
+            result["targets"][self.targets[target_id]] = entry
+        return result
+
+    def stats(self):
+        head = self.head.value
+        return {
+            "capacity": self.capacity,
+            "samples": min(head, self.capacity),
+            "written": head,
+            "memory_bytes": self.capacity * self.SAMPLE_BYTES
+        }
+
+
+def create(recent_config, targets):
+    """
+    Создаёт буфер главного процесса. Воркеры получают его через attach.
+
+    :param recent_config: RecentConfig.
+    :param targets: Все цели мониторинга.
+    :return: RecentBuffer или None, если буфер выключен (capacity = 0).
+    """
+    global _buffer
+    _buffer = RecentBuffer(recent_config.capacity, targets) if recent_config.capacity > 0 else None
+    return _buffer
+
+
+def attach(buffer):
+    """
+    Подключает процесс-воркер к буферу главного процесса.
+    """
+    global _buffer
+    _buffer = buffer
+
+
+def observe(record):
+    """
+    Добавляет пробы записи ping в буфер (если он создан).
+    """
+    if _buffer is not None:
+        times = record.get('times_ms') or []
+        _buffer.add(record['target'], times, record.get('sent', max(len(times), 1)), record.get('stamp'))
+
+
+async def handle_recent(request):
+    try:
+        minutes = float(request.query.get('minutes', 5))
+    except ValueError:
+        raise web.HTTPBadRequest(text="minutes должно быть числом")
+    if minutes <= 0:
+        raise web.HTTPBadRequest(text="minutes должно быть больше 0")
+    # Разбор большого окна занимает десятки миллисекунд - не в event loop
+    return web.json_response(await executors.run(
+        'disk', _buffer.summary,
+        minutes, request.query.get('target'), request.query.get('by_minute') in ('1', 'true')
+    ))
+
+
+async def handle_stats(request):
+    return web.json_response(_buffer.stats())
+
+
+async def start_server(recent_config):
+    """
+    Запускает локальный HTTP API буфера в текущем event loop:
+
+      GET /recent?minutes=N[&target=X][&by_minute=1] - итоги последних N минут
+      GET /recent/stats                              - заполнение буфера
+
+    :param recent_config: RecentConfig.
+    :return: web.AppRunner или None, если API выключен или буфера нет.
+    """
+    if not recent_config.api_enabled or _buffer is None:
+        return None
+    app = web.Application()
+    app.router.add_get('/recent', handle_recent)
+    app.router.add_get('/recent/stats', handle_stats)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, recent_config.api_host, recent_config.api_port).start()
+    logging.info("[RECENT] API последних проб: http://%s:%s/recent", recent_config.api_host, recent_config.api_port)
+    return runner
@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+
+import clock
+import framestream
+import pathtrack
+
+
+def percentile(sorted_values, pct):
+    """
+    Перцентиль методом ближайшего ранга.
+
+    :param sorted_values: Отсортированный список значений.
+    :param pct: Перцентиль от 0 до 100.
+    :return: Значение или None для пустого списка.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def minute_of(stamp):
+    """
+    Ключ минуты (начало минуты, мс эпохи) из метки записи - мс эпохи или ISO-строки прежних версий.
+    """
+    return clock.minute_of(clock.to_ms(stamp))
+
+
+def summarize(samples, packets, reached, path_changes):
+    """
+    Сводка одного интервала (минуты или часа).
+
+    :param samples: Список RTT (мс).
+    :param packets: Отправлено пакетов.
+    :param reached: Дошло пакетов.
+    :param path_changes: Количество смен маршрута.
+    :return: dict со статистикой.
+    """
+    samples = sorted(samples)
+    return {
+        "packets": packets,
+        "reached": reached,
+        "loss_pct": round(100 * (packets - reached) / packets, 2) if packets else None,
+        "rtt_min": samples[0] if samples else None,
+        "rtt_p50": percentile(samples, 50),
+        "rtt_p90": percentile(samples, 90),
+        "rtt_p99": percentile(samples, 99),
+        "rtt_max": samples[-1] if samples else None,
+        "path_changes": path_changes
+    }
+
+
+def build_rollup(ping_records, trace_records, losses, spike_ms):
+    """
+    Считает поминутные и почасовые агрегаты и находит аномальные минуты.
+    Минуты и часы - начала интервалов в мс эпохи.
+
+    :param ping_records: Итерируемый набор записей ping.
+    :param trace_records: Итерируемый набор записей trace.
+    :param losses: Данные losses (минута -> packets/reached), ключи как в файле losses.
+    :param spike_ms: Порог RTT, выше которого минута считается аномальной.
+    :return: Кортеж (rollup dict, множество аномальных минут).
+    """
+    losses = {clock.parse_minute_key(minute): counters for minute, counters in losses.items()}
+    samples = {}
+    sent = {}
+    received = {}
+    for record in ping_records:
+        minute = minute_of(record['stamp'])
+        times = record.get('times_ms') or []
+        samples.setdefault(minute, []).extend(times)
+        sent[minute] = sent.get(minute, 0) + record.get('sent', len(times))
+        received[minute] = received.get(minute, 0) + len(times)
+
+    path_changes = {}
+    tracker = pathtrack.PathTracker()
+    for record in trace_records:
+        if record.get('path_unchanged'):
+            continue
+        _, _, changed = tracker.observe(record.get('hops') or [])
+        if changed:
+            minute = minute_of(record['stamp'])
+            path_changes[minute] = path_changes.get(minute, 0) + 1
+
+    minutes = {}
+    anomalies = set()
+    for minute in sorted(set(samples) | set(losses) | set(path_changes)):
+        counters = losses.get(minute) or {}
+        # Записи ping - полный счёт минуты; счетчики losses берутся, только если пакетов в них больше
+        # (часть записей минуты осталась в другом файле или не записалась)
+        packets, reached = sent.get(minute, 0), received.get(minute, 0)
+        if counters.get('packets', 0) > packets:
+            packets, reached = counters['packets'], counters.get('reached', 0)
+        stats = summarize(samples.get(minute, []), packets, reached, path_changes.get(minute, 0))
+        if counters.get('fault'):
+            stats['fault'] = counters['fault']
+        minutes[minute] = stats
+        if (
+                reached < packets
+                or (stats['rtt_max'] is not None and stats['rtt_max'] >= spike_ms)
+                or stats['path_changes']
+        ):
+            anomalies.add(minute)
+
+    by_hour = {}
+    for minute in minutes:
+        by_hour.setdefault(clock.hour_of(minute), []).append(minute)
+    hours = {}
+    for hour, hour_minutes in sorted(by_hour.items()):
+        hours[hour] = summarize(
+            [t for m in hour_minutes for t in samples.get(m, [])],
+            sum(minutes[m]['packets'] for m in hour_minutes),
+            sum(minutes[m]['reached'] for m in hour_minutes),
+            sum(minutes[m]['path_changes'] for m in hour_minutes)
+        )
+
+    rollup = {
+        "minutes": minutes,
+        "hours": hours,
+        "anomaly_minutes": sorted(anomalies)
+    }
+    return rollup, anomalies
+
+
+def anomaly_window(anomalies, margin):
+    """
+    Раскрывает аномальные минуты в окна +-margin минут.
+
+    :param anomalies: Множество ключей минут (мс эпохи).
+    :param margin: Ширина окна в минутах в каждую сторону.
+    :return: Множество ключей минут, для которых сохраняются полные записи.
+    """
+    window = set()
+    for minute in anomalies:
+        for offset in range(-margin, margin + 1):
+            window.add(minute + offset * clock.MINUTE_MS)
+    return window
+
+
+def read_stream(path):
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        return list(framestream.iter_records(f, path))
+
+
+def referenced_blobs(records):
+    refs = set()
+    for record in records:
+        if 'raw_ref' in record:
+            refs.add(record['raw_ref'])
+        network_info = record.get('network_info') or {}
+        if 'raw_ref' in network_info:
+            refs.add(network_info['raw_ref'])
+    return refs
+
+
+def stream_refs(path):
+    """
+    Ссылки на блобы из записей потока, который свёртка не прореживает (uplinks, hops, ...).
+    """
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, 'rb') as f:
+        return referenced_blobs(framestream.iter_records(f, path))
+
+
+def apply_rollup(ping_file, trace_file, losses_file, blobs_file, rollup_file, rollup_config, stream_files=()):
+    """
+    Этап свёртки при ротации: пишет rollup_<stamp>.json и, в зависимости от уровня,
+    прореживает потоки ping/trace до окон вокруг аномалий или удаляет их.
+
+    Уровни свёртки:
+      off       - архив содержит все записи, свёртка не создаётся
+      anomalies - свёртка + полные записи только в окнах вокруг аномалий
+      summary   - только свёртка и losses, без записей ping/trace
+
+    :param ping_file: Путь к потоку ping.
+    :param trace_file: Путь к потоку trace.
+    :param losses_file: Путь к losses.
+    :param blobs_file: Путь к файлу блобов (может отсутствовать).
+    :param rollup_file: Путь, куда записать свёртку.
+    :param rollup_config: RollupConfig.
+    :param stream_files: Пути остальных потоков архива: блобы, на которые они ссылаются, сохраняются.
+    """
+    level = rollup_config.level
+    if level == 'off':
+        return
+
+    ping_records = read_stream(ping_file)
+    trace_records = read_stream(trace_file)
+    losses = {}
+    if losses_file and os.path.exists(losses_file):
+        with open(losses_file, 'r') as f:
+            try:
+                losses = json.load(f)
+            except json.JSONDecodeError:
+                losses = {}
+
+    rollup, anomalies = build_rollup(ping_records, trace_records, losses, rollup_config.spike_ms)
+    rollup["level"] = level
+    if ping_records and ping_records[0].get('target'):
+        rollup["target"] = ping_records[0]['target']
+
+    if level == 'summary':
+        kept_ping, kept_trace = [], []
+    else:
+        window = anomaly_window(anomalies, rollup_config.anomaly_margin_minutes)
+        kept_ping = [r for r in ping_records if minute_of(r['stamp']) in window]
+        # Первый trace оставляется всегда как опорный маршрут для сравнения
+        kept_trace = [
+            r for i, r in enumerate(trace_records)
+            if i == 0 or minute_of(r['stamp']) in window
+        ]
+
+    rollup["kept_records"] = {"ping": len(kept_ping), "trace": len(kept_trace)}
+    with open(rollup_file, 'w') as f:
+        json.dump(rollup, f)
+
+    for path, kept in ((ping_file, kept_ping), (trace_file, kept_trace)):
+        if path and os.path.exists(path):
+            framestream.rewrite(path, kept)
+
+    if blobs_file and os.path.exists(blobs_file):
+        refs = referenced_blobs(kept_ping + kept_trace)
+        for path in stream_files:
+            refs |= stream_refs(path)
+        framestream.rewrite(blobs_file, [b for b in read_stream(blobs_file) if b['hash'] in refs])
+
+    logging.info(
+        "[ROLLUP] %s: уровень %s, аномальных минут %s, оставлено ping %s/%s, trace %s/%s",
+        rollup_file, level, len(anomalies), len(kept_ping), len(ping_records), len(kept_trace), len(trace_records)
+    )
@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import shutil
+import struct
+import zipfile
+
+MANIFEST_NAME = 'manifest.json'
+
+COPY_CHUNK_BYTES = 64 * 1024
+
+
+def archive_stamp(name):
+    """
+    Временная метка архива из имени archive_<stamp>.zip.
+    """
+    return name[len('archive_'):-len('.zip')]
+
+
+def queue_stamp(name):
+    """
+    Метка начала для порядка отправки: archive_<stamp>.zip -> <stamp>,
+    bundle_<first>--<last>.zip -> <first>.
+    """
+    return name[:-len('.zip')].split('_', 1)[-1].split('--', 1)[0]
+
+
+def list_archives(sending_dir):
+    """
+    Список архивов ротации в очереди на отправку, от старых к новым.
+    """
+    return sorted(
+        f for f in os.listdir(sending_dir)
+        if f.startswith('archive_') and f.endswith('.zip')
+    )
+
+
+def plan_bundles(archives, sizes, max_bytes):
+    """
+    Жадно группирует подряд идущие архивы в пачки суммарным размером не больше max_bytes.
+
+    :param archives: Имена архивов в порядке отправки.
+    :param sizes: Словарь имя -> размер в байтах.
+    :param max_bytes: Максимальный размер пачки.
+    :return: Список групп, в каждой больше одного архива.
+    """
+    groups = []
+    current = []
+    current_size = 0
+    for name in archives:
+        size = sizes[name]
+        if current and current_size + size > max_bytes:
+            groups.append(current)
+            current = []
+            current_size = 0
+        current.append(name)
+        current_size += size
+    if current:
+        groups.append(current)
+    return [group for group in groups if len(group) > 1]
+
+
+def merge_archives(sending_dir, group):
+    """
+    Объединяет архивы в одну пачку bundle_<first>--<last>.zip.
+    Члены исходных архивов переносятся с теми же именами без распаковки: сжатые данные
+    копируются блоками как есть, поэтому память не зависит от метода сжатия (LZMA) и размера архивов.
+    Если в zipfile нет нужных для этого внутренностей (см. _raw_copy_supported), члены
+    перепаковываются потоково - медленнее, но с той же ограниченной памятью.
+    Дополнительно кладётся manifest.json со списком исходных меток.
+
+    :param sending_dir: Директория очереди.
+    :param group: Имена архивов для объединения.
+    :return: Путь к созданной пачке.
+    """
+    stamps = [archive_stamp(name) for name in group]
+    bundle_name = f'bundle_{stamps[0]}--{stamps[-1]}.zip'
+    bundle_path = os.path.join(sending_dir, bundle_name)
+    tmp_path = bundle_path + '.tmp'
+
+    with zipfile.ZipFile(tmp_path, 'w') as bundle:
+        for name in group:
+            path = os.path.join(sending_dir, name)
+            with zipfile.ZipFile(path) as archive, open(path, 'rb') as src:
+                for info in archive.infolist():
+                    if _raw_copy_supported(bundle):
+                        _copy_raw(src, info, bundle)
+                    else:
+                        _copy_stream(archive, info, bundle)
+        manifest = {"stamps": stamps, "archives": group}
+        bundle.writestr(MANIFEST_NAME, json.dumps(manifest), compress_type=zipfile.ZIP_DEFLATED)
+
+    # Сначала появляется пачка, потом удаляются исходники: при сбое возможен повтор, но не потеря
+    os.replace(tmp_path, bundle_path)
+    for name in group:
+        os.remove(os.path.join(sending_dir, name))
+    return bundle_path
+
+
+def compact(sending_dir, threshold, max_bytes):
+    """
+    Уплотняет очередь отправки, если в ней накопилось больше threshold архивов.
+
+    :param sending_dir: Директория очереди.
+    :param threshold: Глубина очереди, начиная с которой выполняется уплотнение.
+    :param max_bytes: Максимальный размер одной пачки.
+    :return: Список созданных пачек.
+    """
+    # Недописанные пачки после аварийного завершения: исходники ещё на месте
+    for name in os.listdir(sending_dir):
+        if name.startswith('bundle_') and name.endswith('.zip.tmp'):
+            os.remove(os.path.join(sending_dir, name))
+
+    archives = list_archives(sending_dir)
+    if len(archives) <= threshold:
+        return []
+
+    sizes = {name: os.path.getsize(os.path.join(sending_dir, name)) for name in archives}
+    bundles = []
+    for group in plan_bundles(archives, sizes, max_bytes):
+        try:
+            bundles.append(merge_archives(sending_dir, group))
+        except (OSError, zipfile.BadZipFile) as e:
+            logging.info("[SPOOL] Не удалось объединить %s..%s: %s", group[0], group[-1], e)
+    if bundles:
+        logging.info("[SPOOL] %s архив(ов) в очереди, создано пачек: %s", len(archives), len(bundles))
+    return bundles
+
+
+def _copy_info(info):
+    copy = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    copy.compress_type = info.compress_type
+    copy.external_attr = info.external_attr
+    copy.file_size = info.file_size
+    return copy
+
+
+def _raw_copy_supported(bundle):
+    """
+    Есть ли у zipfile внутренности, на которые опирается _copy_raw: запись заголовка
+    (ZipInfo.FileHeader) и учёт членов открытого на запись архива (start_dir, NameToInfo,
+    _didModify). Они не входят в публичный API и могут измениться в новых версиях Python.
+    """
+    return (
+        hasattr(zipfile.ZipInfo, 'FileHeader')
+        and hasattr(zipfile, 'sizeFileHeader')
+        and hasattr(zipfile, 'stringFileHeader')
+        and all(hasattr(bundle, name) for name in ('start_dir', 'filelist', 'NameToInfo', '_didModify'))
+    )
+
+
+def _copy_stream(archive, info, bundle):
+    """
+    Переносит член архива в пачку через распаковку и повторное сжатие тем же методом,
+    блоками по COPY_CHUNK_BYTES.
+    """
+    copy = _copy_info(info)
+    with archive.open(info) as src, bundle.open(copy, 'w', force_zip64=copy.file_size > zipfile.ZIP64_LIMIT) as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK_BYTES)
+
+
+def _copy_raw(src, info, bundle):
+    """
+    Дописывает член архива в пачку без распаковки: новый локальный заголовок и исходные сжатые данные.
+
+    :param src: Файл исходного архива, открытый на чтение в двоичном режиме.
+    :param info: ZipInfo члена исходного архива.
+    :param bundle: zipfile.ZipFile пачки, открытый на запись.
+    """
+    src.seek(info.header_offset)
+    header = src.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader or header[:4] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile(f"Повреждён локальный заголовок {info.filename}")
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    src.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+
+    copy = _copy_info(info)
+    copy.CRC = info.CRC
+    copy.compress_size = info.compress_size
+    # Размеры известны заранее и пишутся в заголовок, дескриптор данных после них не нужен
+    copy.flag_bits = info.flag_bits & ~0x08
+    zip64 = info.file_size > zipfile.ZIP64_LIMIT or info.compress_size > zipfile.ZIP64_LIMIT
+
+    bundle.fp.seek(bundle.start_dir)
+    copy.header_offset = bundle.fp.tell()
+    bundle.fp.write(copy.FileHeader(zip64))
+    remaining = info.compress_size
+    while remaining:
+        chunk = src.read(min(COPY_CHUNK_BYTES, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Обрезаны данные {info.filename}")
+        bundle.fp.write(chunk)
+        remaining -= len(chunk)
+
+    # Регистрация члена так же, как после bundle.open(..., 'w'): попадёт в центральный каталог
+    bundle.start_dir = bundle.fp.tell()
+    bundle.filelist.append(copy)
+    bundle.NameToInfo[copy.filename] = copy
+    bundle._didModify = True
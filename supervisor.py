@@ -0,0 +1,62 @@
+import asyncio
+import logging
+import multiprocessing
+
+import executors
+
+
+def shard_targets(targets, workers):
+    """
+    Распределяет цели мониторинга по процессам-воркерам по кругу.
+
+    :param targets: Список хостов.
+    :param workers: Количество воркеров.
+    :return: Список непустых шардов (списков хостов).
+    """
+    shards = [targets[i::workers] for i in range(max(1, workers))]
+    return [shard for shard in shards if shard]
+
+
+def start_worker(index, shard, worker_fn):
+    """
+    Запускает процесс-воркер для шарда.
+    """
+    process = multiprocessing.Process(
+        target=worker_fn,
+        args=(shard,),
+        name=f'monitor-worker-{index}',
+        daemon=True
+    )
+    process.start()
+    logging.info("[SUPERVISOR] Воркер %s (pid %s) запущен для %s", index, process.pid, ', '.join(shard))
+    return process
+
+
+async def supervise(shards, worker_fn, on_restart=None, check_secs=5, restart_delay_secs=10):
+    """
+    Держит по одному процессу на шард и перезапускает упавшие.
+
+    :param shards: Список шардов целей.
+    :param worker_fn: Функция уровня модуля, принимающая список хостов (запускается в отдельном процессе).
+    :param on_restart: Необязательный колбэк (shard) перед перезапуском, например для архивации файлов упавшего воркера.
+                       Выполняется в пуле 'disk', чтобы не останавливать отправку и heartbeat в этом процессе.
+    :param check_secs: Период проверки состояния воркеров.
+    :param restart_delay_secs: Задержка перед перезапуском упавшего воркера.
+    """
+    processes = {i: start_worker(i, shard, worker_fn) for i, shard in enumerate(shards)}
+    try:
+        while True:
+            await asyncio.sleep(check_secs)
+            for i, process in list(processes.items()):
+                if process.is_alive():
+                    continue
+                logging.info("[SUPERVISOR] Воркер %s завершился с кодом %s, перезапуск", i, process.exitcode)
+                process.close()
+                await asyncio.sleep(restart_delay_secs)
+                if on_restart is not None:
+                    await executors.run('disk', on_restart, shards[i])
+                processes[i] = start_worker(i, shards[i], worker_fn)
+    finally:
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
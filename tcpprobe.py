@@ -0,0 +1,184 @@
+import asyncio
+import socket
+import ssl
+import time
+from urllib.parse import urlsplit
+
+import clock
+import executors
+import nettools
+import uplinks
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def parse_target(target):
+    """
+    Разбирает цель TCP/HTTP-пробы.
+
+      tcp://host:port        - время TCP-рукопожатия
+      http://host[:port]/path - рукопожатие и время до первого байта ответа на HEAD
+      https://host[:port]/path
+
+    :param target: Строка цели из monitor.targets.
+    :return: dict {"scheme", "host", "port", "path"} или None для обычной ICMP-цели.
+    """
+    if '://' not in target:
+        return None
+    parts = urlsplit(target)
+    if parts.scheme not in ('tcp', 'http', 'https') or not parts.hostname:
+        raise ValueError(f"Неподдерживаемая цель пробы: {target}")
+    port = parts.port or DEFAULT_PORTS.get(parts.scheme)
+    if port is None:
+        raise ValueError(f"Для {target} не указан порт")
+    return {
+        "scheme": parts.scheme,
+        "host": parts.hostname,
+        "port": port,
+        "path": (parts.path or '/') if parts.scheme != 'tcp' else None
+    }
+
+
+def probe_host(target):
+    """
+    Хост цели для трассировки и ICMP-проб: адрес без схемы и порта.
+    """
+    parsed = parse_target(target)
+    return parsed["host"] if parsed else target
+
+
+async def connect_once(address, spec, timeout, interface=None):
+    """
+    Одна попытка: TCP-рукопожатие и, для http(s), время до первого байта ответа.
+
+    :param address: Кортеж sockaddr из getaddrinfo.
+    :param spec: Разобранная цель (parse_target).
+    :param timeout: Таймаут всей попытки, сек.
+    :param interface: Интерфейс для привязки сокета (uplinks) или None.
+    :return: Кортеж (connect_ms, ttfb_ms или None, время начала рукопожатия в мс эпохи).
+    """
+    loop = asyncio.get_running_loop()
+    family = socket.AF_INET6 if ':' in address[0] else socket.AF_INET
+    deadline = loop.time() + timeout
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    try:
+        if interface is not None:
+            uplinks.bind_socket(sock, interface)
+        sent_ms = time.time_ns() / 1e6
+        started = time.perf_counter()
+        await asyncio.wait_for(loop.sock_connect(sock, address), timeout)
+        connect_ms = (time.perf_counter() - started) * 1000
+        if spec["path"] is None:
+            return connect_ms, None, sent_ms
+
+        context = ssl.create_default_context() if spec["scheme"] == 'https' else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(sock=sock, ssl=context, server_hostname=spec["host"] if context else None),
+            max(0.0, deadline - loop.time())
+        )
+        sock = None
+        try:
+            request_started = time.perf_counter()
+            writer.write(
+                f"HEAD {spec['path']} HTTP/1.1\r\nHost: {spec['host']}\r\nConnection: close\r\n\r\n".encode()
+            )
+            await writer.drain()
+            first = await asyncio.wait_for(reader.read(1), max(0.0, deadline - loop.time()))
+            if not first:
+                raise ConnectionError("connection closed before response")
+            return connect_ms, (time.perf_counter() - request_started) * 1000, sent_ms
+        finally:
+            writer.close()
+    finally:
+        if sock is not None:
+            sock.close()
+
+
+def error_kind(error):
+    if isinstance(error, asyncio.TimeoutError):
+        return 'timeout'
+    if isinstance(error, ConnectionRefusedError):
+        return 'refused'
+    if isinstance(error, ssl.SSLError):
+        return 'tls'
+    return 'error'
+
+
+async def probe(target, count, timeout=3.0, concurrency=10, interval=0.0, interface=None):
+    """
+    TCP/HTTP-проба цели: count попыток (не больше concurrency одновременно).
+    Запись имеет тот же формат, что и ping: sent, times_ms (время рукопожатия), avg_ms,
+    плюс probe, ttfb_ms, ошибки по видам и packet_times - начало и конец каждого удачного рукопожатия.
+
+    :param target: Цель (tcp://, http://, https://).
+    :param count: Количество попыток (аналог пакетов ping).
+    :param timeout: Таймаут одной попытки, сек.
+    :param concurrency: Максимум одновременных соединений.
+    :param interval: Пауза между запусками попыток, сек.
+    :param interface: Привязать попытки к интерфейсу (uplinks); запись тогда не содержит network_info.
+    :return: dict записи.
+    """
+    spec = parse_target(target)
+    stamp = clock.now_ms()
+    loop = asyncio.get_running_loop()
+    errors = {}
+    times = []
+    ttfb = []
+    packet_times = []
+
+    try:
+        # Имя разрешается один раз, чтобы DNS не попадал во время рукопожатия
+        infos = await asyncio.wait_for(
+            loop.getaddrinfo(
+                spec["host"], spec["port"], type=socket.SOCK_STREAM,
+                # Привязка к интерфейсу идёт по IPv4-адресу
+                family=socket.AF_INET if interface is not None else socket.AF_UNSPEC
+            ),
+            timeout
+        )
+        address = infos[0][4]
+    except (OSError, asyncio.TimeoutError) as e:
+        address = None
+        errors['resolve'] = count
+        resolve_error = repr(e)
+
+    if address is not None:
+        slots = asyncio.Semaphore(concurrency)
+
+        async def attempt(index):
+            await asyncio.sleep(index * interval)
+            async with slots:
+                return await connect_once(address, spec, timeout, interface)
+
+        results = await asyncio.gather(*(attempt(i) for i in range(count)), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                kind = error_kind(result)
+                errors[kind] = errors.get(kind, 0) + 1
+                continue
+            connect_ms, ttfb_ms, sent_ms = result
+            times.append(round(connect_ms, 2))
+            packet_times.append([round(sent_ms, 3), round(sent_ms + connect_ms, 3)])
+            if ttfb_ms is not None:
+                ttfb.append(round(ttfb_ms, 2))
+
+    record = {
+        "stamp": stamp,
+        "target": target,
+        "probe": spec["scheme"],
+        "raw": (
+            f"{spec['scheme']} {spec['host']}:{spec['port']} -> {address[0] if address else resolve_error}: "
+            f"{len(times)}/{count} ok" + (f", errors {errors}" if errors else "")
+        ),
+        "sent": count,
+        "times_ms": times,
+        "avg_ms": round(sum(times) / len(times), 2) if times else None,
+        "packet_times": packet_times,
+        "errors": errors
+    }
+    if interface is None:
+        record["network_info"] = await executors.run('ping', nettools.network_info)
+    if spec["path"] is not None:
+        record["ttfb_ms"] = ttfb
+    return record
@@ -0,0 +1,117 @@
+import json
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analyzer  # noqa: E402
+import clock  # noqa: E402
+import framestream  # noqa: E402
+
+START = 1_760_000_040_000
+SECOND = 1000
+NETWORK_INFO = {"raw": "ip addr", "interfaces": [{"name": "eth0", "gateway": "192.168.1.1"}]}
+
+
+def ping(offset_secs, times, sent=4, target='example.net'):
+    return {
+        "stamp": START + offset_secs * SECOND, "target": target, "raw": "ping", "sent": sent,
+        "times_ms": times, "network_info": NETWORK_INFO
+    }
+
+
+def stream_bytes(tmp_path, name, records):
+    path = tmp_path / name
+    framestream.append_frame(str(path), [json.dumps(record) for record in records])
+    return path.read_bytes()
+
+
+def write_archive(tmp_path, name, members):
+    with zipfile.ZipFile(tmp_path / 'data' / name, 'w') as archive:
+        for member, data in members.items():
+            archive.writestr(member, data)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """
+    Два последовательных архива одной цели: сбой начинается в конце первого и продолжается
+    в начале второго. В первом архиве есть смена маршрута, локализация потерь и проба uplink.
+    Третий архив - метка со свёрткой (rollup), четвёртый повреждён.
+    """
+    (tmp_path / 'data').mkdir()
+    first_stamp = '2025-10-09_12-00'
+    second_stamp = '2025-10-09_12-01'
+    write_archive(tmp_path, f'archive_{first_stamp}.zip', {
+        f'ping_{first_stamp}.jsonl.gz': stream_bytes(tmp_path, 'a', [
+            ping(0, [10.0, 12.0, 14.0, 16.0]),
+            ping(10, [20.0, 22.0], sent=4),
+            ping(20, []),
+            ping(30, []),
+        ]),
+        f'paths_{first_stamp}.jsonl.gz': stream_bytes(tmp_path, 'b', [
+            {"stamp": START + 5 * SECOND, "target": 'example.net', "previous": ['a'], "current": ['b']}
+        ]),
+        f'losses_{first_stamp}.json': json.dumps({
+            str(START): {"packets": 16, "reached": 6, "fault": "isp"}
+        }),
+        f'uplinks_{first_stamp}.jsonl.gz': stream_bytes(tmp_path, 'c', [
+            {"stamp": START, "target": 'example.net', "interface": 'wwan0', "sent": 2, "times_ms": [50.0]}
+        ]),
+    })
+    write_archive(tmp_path, f'archive_{second_stamp}.zip', {
+        f'ping_{second_stamp}.jsonl.gz': stream_bytes(tmp_path, 'd', [
+            ping(60, []),
+            ping(70, [30.0, 30.0, 30.0, 30.0]),
+        ]),
+    })
+    rolled_stamp = '2025-10-09_12-02'
+    write_archive(tmp_path, f'archive_{rolled_stamp}.zip', {
+        f'ping_{rolled_stamp}.jsonl.gz': stream_bytes(tmp_path, 'e', [ping(120, [40.0] * 4)]),
+        f'rollup_{rolled_stamp}.json': json.dumps({"minutes": {
+            str(START + 2 * clock.MINUTE_MS): {"packets": 100, "reached": 90, "rtt_p50": 40.0}
+        }}),
+    })
+    (tmp_path / 'data' / 'archive_broken.zip').write_bytes(b'not a zip')
+    return str(tmp_path / 'data')
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_per_stream_summaries(data_dir, workers):
+    report = analyzer.analyze([data_dir], workers=workers)
+    day = clock.local_day(START)
+
+    assert report["archives"] == 4
+    assert [e["archive"] for e in report["errors"]] == [os.path.join(data_dir, 'archive_broken.zip')]
+
+    groups = {(g["target"], g["interface"]): g for g in report["groups"]}
+    assert set(groups) == {('example.net', 'eth0'), ('example.net', 'uplink:wwan0'), ('example.net', 'unknown')}
+
+    # ping двух архивов без свёртки: 6 проб, 24 пакета, 10 дошли
+    main = groups[('example.net', 'eth0')]
+    assert main["day"] == day
+    assert (main["probes"], main["failed_probes"], main["sent"], main["reached"]) == (6, 3, 24, 10)
+    assert main["loss_pct"] == round(100 * 14 / 24, 2)
+    assert main["rtt_p50"] == 20
+    assert main["rtt_p99"] == 30
+    assert main["path_changes"] == 1
+    assert main["faults"] == {"isp": 1}
+
+    uplink = groups[('example.net', 'uplink:wwan0')]
+    assert (uplink["sent"], uplink["reached"], uplink["rtt_p50"]) == (2, 1, 50)
+
+    # Метка со свёрткой: потери и задержки из поминутных агрегатов, ping - только для сбоев
+    rolled = groups[('example.net', 'unknown')]
+    assert (rolled["sent"], rolled["reached"], rolled["rtt_p50"]) == (100, 90, 40)
+
+    # Сбой с 20-й по 70-ю секунду склеен через границу архивов
+    assert report["outages"] == [{
+        "target": 'example.net',
+        "start": clock.to_iso(START + 20 * SECOND),
+        "end": clock.to_iso(START + 70 * SECOND),
+        "failed_probes": 3,
+        "duration_secs": 50.0
+    }]
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hopstats  # noqa: E402
+
+
+def trace(*hops):
+    return [
+        {"hop": number, "ip": ip, "rtts_ms": rtts, "lost": lost}
+        for number, (ip, rtts, lost) in enumerate(hops, start=1)
+    ]
+
+
+def test_aggregates_hops_over_window():
+    """
+    Сводка по хопам за несколько трассировок: отправлено/потеряно, задержки, адреса балансировки.
+    """
+    aggregator = hopstats.HopAggregator('example.net')
+    aggregator.add(trace(('10.0.0.1', [1.0, 2.0, 3.0], 0), ('192.0.2.1', [10.0], 2)))
+    aggregator.add(trace(('10.0.0.1', [4.0, 5.0, 6.0], 0), ('192.0.2.2', [20.0, 30.0], 1)))
+    aggregator.add(trace(('10.0.0.1', [7.0, 8.0, 9.0], 0), (None, [], 3), ('203.0.113.5', [40.0], 2)))
+
+    summary = aggregator.summary()
+    assert summary["target"] == 'example.net'
+    assert summary["traces"] == 3
+    assert summary["stamp_end"] >= summary["stamp"]
+
+    first, second, third = summary["hops"]
+    assert first == {
+        "hop": 1, "ip": '10.0.0.1', "ips": ['10.0.0.1'], "sent": 9, "lost": 0, "loss_pct": 0.0,
+        "rtt_min": 1.0, "rtt_avg": 5.0, "rtt_p90": 9.0, "rtt_max": 9.0
+    }
+    assert second["ips"] == ['192.0.2.1', '192.0.2.2']
+    assert (second["sent"], second["lost"], second["loss_pct"]) == (9, 6, 66.7)
+    assert (second["rtt_min"], second["rtt_max"]) == (10.0, 30.0)
+    assert third["hop"] == 3
+    assert (third["sent"], third["lost"], third["ip"]) == (3, 2, '203.0.113.5')
+
+
+def test_hop_without_answers():
+    """
+    Хоп без единого ответа: адреса и задержек нет, потери 100%.
+    """
+    aggregator = hopstats.HopAggregator('example.net')
+    aggregator.add(trace((None, [], 3)))
+    hop = aggregator.summary()["hops"][0]
+    assert (hop["ip"], hop["ips"], hop["loss_pct"], hop["rtt_avg"], hop["rtt_p90"]) == (None, [], 100.0, None, None)
+
+
+def test_probe_hops_survives_trace_errors():
+    """
+    Цикл трассировок накапливает хопы, переживает ошибку трассировки и завершается отменой.
+    """
+    calls = []
+
+    async def trace_fn(host, queries, wait_secs):
+        calls.append((host, queries, wait_secs))
+        if len(calls) == 2:
+            raise OSError("traceroute failed")
+        return {"hops": trace(('10.0.0.1', [1.0] * queries, 0))}
+
+    async def scenario():
+        aggregator = hopstats.HopAggregator('example.net')
+        task = asyncio.ensure_future(hopstats.probe_hops('example.net', aggregator, trace_fn, 0, 2, 0.5))
+        while len(calls) < 4:
+            await asyncio.sleep(0)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        return aggregator
+
+    aggregator = asyncio.run(scenario())
+    assert calls[0] == ('example.net', 2, 0.5)
+    assert aggregator.traces == len(calls) - 1
+    assert aggregator.summary()["hops"][0]["sent"] == 2 * aggregator.traces
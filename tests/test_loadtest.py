@@ -0,0 +1,117 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import loadtest  # noqa: E402
+
+IDLE_RTT = 10.0
+LOADED_RTT = 50.0
+
+
+class LoadServer:
+    """
+    Сервер нагрузки в процессе теста: отдаёт большой ответ на GET, принимает POST,
+    на /fail отвечает 500. По счетчику запросов заглушка пробы "видит", что нагрузка началась.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+
+    async def download(self, request):
+        self.requests += 1
+        response = web.StreamResponse()
+        await response.prepare(request)
+        chunk = bytes(64 * 1024)
+        for _ in range(16):
+            await response.write(chunk)
+        await response.write_eof()
+        return response
+
+    async def upload(self, request):
+        self.requests += 1
+        await request.read()
+        return web.Response(text='ok')
+
+    async def fail(self, request):
+        self.requests += 1
+        self.failures += 1
+        return web.Response(status=500)
+
+
+async def start(server):
+    app = web.Application(client_max_size=1 << 24)
+    app.router.add_get('/download', server.download)
+    app.router.add_post('/upload', server.upload)
+    app.router.add_get('/fail', server.fail)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    return runner, f'http://127.0.0.1:{runner.addresses[0][1]}'
+
+
+def run_loadtest(path, mode):
+    async def scenario():
+        server = LoadServer()
+        runner, base = await start(server)
+        probes = []
+
+        async def probe_fn():
+            # Каждая пятая проба теряется, задержка растёт, как только пошла нагрузка
+            probes.append(server.requests)
+            if len(probes) % 5 == 0:
+                return {"sent": 1, "times_ms": []}
+            return {"sent": 1, "times_ms": [LOADED_RTT if server.requests else IDLE_RTT]}
+
+        loadtest_config = SimpleNamespace(
+            url=base + path, mode=mode, streams=2, idle_secs=0.3, duration_secs=0.8, probe_interval_secs=0.02
+        )
+        try:
+            record = await loadtest.run('example.net', loadtest_config, probe_fn)
+        finally:
+            await runner.cleanup()
+        return record, server
+
+    return asyncio.run(scenario())
+
+
+@pytest.mark.parametrize('path, mode', [('/download', 'download'), ('/upload', 'upload')])
+def test_idle_and_loaded_summaries(path, mode):
+    """
+    Задержка свободного канала и под нагрузкой, скорость нагрузки без ошибок.
+    """
+    record, server = run_loadtest(path, mode)
+
+    assert record["target"] == 'example.net'
+    assert record["mode"] == mode
+    assert record["duration_secs"] >= 0.8
+    idle, loaded = record["idle"], record["loaded"]
+    assert idle["sent"] > 0 and loaded["sent"] > 0
+    assert idle["rtt_p50"] == IDLE_RTT
+    assert loaded["rtt_p50"] == LOADED_RTT
+    assert record["rtt_increase_ms"] == LOADED_RTT - IDLE_RTT
+    assert 0 < loaded["loss_pct"] < 50
+
+    assert record["load_errors"] == 0
+    assert record["bytes"] > 0
+    assert record["throughput_mbps"] > 0
+    # Скорость считается только по байтам после разгона
+    assert record["throughput_mbps"] <= record["bytes"] * 8 / (0.8 * (1 - loadtest.WARMUP_SHARE)) / 1e6 * 1.1
+
+
+def test_server_failures_count_as_load_errors():
+    """
+    Ответы 500 не дают нагрузки: они считаются в load_errors, скорость нулевая.
+    """
+    record, server = run_loadtest('/fail', 'download')
+    assert server.failures >= 2
+    assert record["load_errors"] == server.failures
+    assert record["bytes"] == 0
+    assert record["throughput_mbps"] == 0.0
+    assert record["idle"]["rtt_p50"] == IDLE_RTT
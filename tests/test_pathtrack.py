@@ -0,0 +1,73 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pathtrack  # noqa: E402
+import rollup  # noqa: E402
+
+FULL = ['10.0.0.1', '192.0.2.1', '198.51.100.1', '203.0.113.5']
+
+
+def hops(ips):
+    return [{"hop": i + 1, "ip": ip} for i, ip in enumerate(ips)]
+
+
+def test_truncated_trace_is_not_a_path_change():
+    """
+    Трассировка, оборванная звёздочками во время потерь, не считается сменой маршрута
+    и не заменяет опорную сигнатуру.
+    """
+    tracker = pathtrack.PathTracker()
+    tracker.observe(hops(FULL))
+    assert tracker.needs_full('trace_a', False, tracker.signature)
+
+    for outage in (FULL[:2] + [None, None], [None, None, None], []):
+        _, _, changed = tracker.observe(hops(outage))
+        assert not changed
+        assert not tracker.needs_full('trace_a', changed, pathtrack.hop_signature(hops(outage)))
+        assert tracker.signature == tuple(FULL)
+
+    _, _, changed = tracker.observe(hops(FULL))
+    assert not changed
+
+
+def test_truncated_trace_with_other_prefix_is_a_change():
+    """
+    Если отвеченное начало оборванной трассировки расходится с опорным, маршрут сменился.
+    """
+    tracker = pathtrack.PathTracker()
+    tracker.observe(hops(FULL))
+    _, _, changed = tracker.observe(hops(['10.0.0.1', '192.0.2.99', None]))
+    assert changed
+
+
+def test_truncated_trace_at_archive_start_does_not_become_reference():
+    """
+    Первая в архиве оборванная трассировка пишется полностью, но полной остаётся и следующая:
+    отметки архива должны ссылаться на полный маршрут, записанный в нём же.
+    """
+    tracker = pathtrack.PathTracker()
+    tracker.observe(hops(FULL))
+    tracker.needs_full('trace_a', False, tracker.signature)
+
+    signature, _, changed = tracker.observe(hops(FULL[:1] + [None]))
+    assert tracker.needs_full('trace_b', changed, signature)
+    signature, _, changed = tracker.observe(hops(FULL))
+    assert tracker.needs_full('trace_b', changed, signature)
+    signature, _, changed = tracker.observe(hops(FULL))
+    assert not tracker.needs_full('trace_b', changed, signature)
+
+
+def test_rollup_counts_no_path_changes_for_outage():
+    """
+    Сводка rollup не насчитывает смен маршрута за оборванные трассировки.
+    """
+    minute = 1_760_000_040_000
+    traces = [
+        {"stamp": minute + i * 1000, "hops": hops(ips)}
+        for i, ips in enumerate([FULL, FULL[:2] + [None], [None], FULL])
+    ]
+    summary, anomalies = rollup.build_rollup([], traces, {}, spike_ms=500)
+    assert summary['minutes'] == {}
+    assert anomalies == set()
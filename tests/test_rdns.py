@@ -0,0 +1,159 @@
+import asyncio
+import os
+import socket
+import struct
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rdns  # noqa: E402
+
+NAMES = {
+    '192.0.2.1': 'gw.example.net',
+    '192.0.2.4': 'core.example.net',
+    '2001:db8::1': 'v6.example.net',
+}
+SILENT = '192.0.2.3'
+
+
+def encode_name(name):
+    return b''.join(bytes([len(label)]) + label.encode() for label in name.split('.')) + b'\x00'
+
+
+class StubNameserver(asyncio.DatagramProtocol):
+    """
+    DNS-сервер для тестов: отвечает на PTR по таблице NAMES, на неизвестные адреса - NXDOMAIN,
+    на SILENT не отвечает. Считает запросы по адресам.
+    """
+
+    def __init__(self):
+        self.transport = None
+        self.queries = {}
+        self.by_name = {rdns.reverse_name(ip): ip for ip in [*NAMES, SILENT, '192.0.2.2']}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        query_id = struct.unpack_from('!H', data)[0]
+        qname, offset = rdns._read_name(data, 12)
+        question = data[12:offset + 4]
+        ip = self.by_name.get(qname)
+        self.queries[ip] = self.queries.get(ip, 0) + 1
+        if ip == SILENT:
+            return
+        if ip in NAMES:
+            rdata = encode_name(NAMES[ip])
+            answer = b'\xc0\x0c' + struct.pack('!HHIH', rdns.QTYPE_PTR, rdns.QCLASS_IN, 60, len(rdata)) + rdata
+            header = struct.pack('!HHHHHH', query_id, 0x8180, 1, 1, 0, 0)
+        else:
+            answer = b''
+            header = struct.pack('!HHHHHH', query_id, 0x8183, 1, 0, 0, 0)
+        self.transport.sendto(header + question + answer, addr)
+
+
+async def start_stub(host='127.0.0.1'):
+    loop = asyncio.get_running_loop()
+    transport, stub = await loop.create_datagram_endpoint(StubNameserver, local_addr=(host, 0))
+    return transport, stub, transport.get_extra_info('sockname')[:2]
+
+
+def test_resolve_ptr_and_timeout():
+    """
+    Имя по PTR, NXDOMAIN и молчащий сервер: ошибки и таймаут дают None, повторно не запрашиваются.
+    """
+    async def scenario():
+        transport, stub, address = await start_stub()
+        try:
+            resolver = rdns.PTRResolver(nameserver=address, timeout=0.2)
+            assert await resolver.resolve('192.0.2.1') == 'gw.example.net'
+            assert await resolver.resolve('2001:db8::1') == 'v6.example.net'
+            assert await resolver.resolve('192.0.2.2') is None
+            assert await resolver.resolve(SILENT) is None
+            assert await resolver.resolve(SILENT) is None
+            assert stub.queries[SILENT] == 1
+            assert resolver.cached(SILENT) == (True, None)
+        finally:
+            transport.close()
+
+    asyncio.run(scenario())
+
+
+def test_lru_cache_evicts_least_recent():
+    """
+    Кеш на две записи: обращение освежает запись, вытесняется самая давняя.
+    """
+    async def scenario():
+        transport, stub, address = await start_stub()
+        try:
+            resolver = rdns.PTRResolver(nameserver=address, timeout=0.5, cache_size=2)
+            await resolver.resolve('192.0.2.1')
+            await resolver.resolve('2001:db8::1')
+            await resolver.resolve('192.0.2.1')
+            await resolver.resolve('192.0.2.4')
+            assert list(resolver.cache) == ['192.0.2.1', '192.0.2.4']
+            assert await resolver.resolve('192.0.2.1') == 'gw.example.net'
+            assert stub.queries['192.0.2.1'] == 1
+            await resolver.resolve('2001:db8::1')
+            assert stub.queries['2001:db8::1'] == 2
+        finally:
+            transport.close()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_lookups_share_one_query():
+    """
+    Одновременные запросы одного адреса ждут один запрос к серверу.
+    """
+    async def scenario():
+        transport, stub, address = await start_stub()
+        try:
+            resolver = rdns.PTRResolver(nameserver=address, timeout=0.5)
+            names = await asyncio.gather(*(resolver.resolve('192.0.2.4') for _ in range(5)))
+            assert names == ['core.example.net'] * 5
+            assert stub.queries['192.0.2.4'] == 1
+        finally:
+            transport.close()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('192.0.2.53', ('192.0.2.53', 53)),
+    ('192.0.2.53:5353', ('192.0.2.53', 5353)),
+    ('dns.example.net:53', ('dns.example.net', 53)),
+    ('::1', ('::1', 53)),
+    ('2001:db8::53', ('2001:db8::53', 53)),
+    ('[::1]', ('::1', 53)),
+    ('[::1]:5353', ('::1', 5353)),
+])
+def test_parse_nameserver(value, expected):
+    assert rdns.parse_nameserver(value) == expected
+
+
+def test_configure_ipv6_nameserver():
+    """
+    Резолвер, настроенный на IPv6-адрес в скобках, ходит на этот адрес и порт.
+    """
+    if not socket.has_ipv6:
+        pytest.skip("IPv6 недоступен")
+
+    async def scenario():
+        try:
+            transport, stub, (_, port) = await start_stub('::1')
+        except OSError:
+            pytest.skip("нет адреса ::1")
+        try:
+            resolver = rdns.configure(SimpleNamespace(
+                nameserver=f'[::1]:{port}', timeout_secs=0.5, cache_size=16, ttl_secs=60, negative_ttl_secs=60
+            ))
+            assert resolver.nameserver == ('::1', port)
+            assert await resolver.resolve('192.0.2.1') == 'gw.example.net'
+        finally:
+            transport.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import clock  # noqa: E402
+import recent  # noqa: E402
+
+MINUTE = 1_760_000_040_000
+
+
+def test_summary_by_target_and_minute():
+    """
+    Итоги окна по целям и поминутная разбивка для перемешанных проб нескольких целей.
+    """
+    buffer = recent.RecentBuffer(64, ['a', 'b'])
+    buffer.add('a', [10.0, 20.0], 3, MINUTE)
+    buffer.add('b', [5.0], 1, MINUTE + 1000)
+    buffer.add('a', [30.0], 1, MINUTE + clock.MINUTE_MS)
+    buffer.add('b', [], 2, MINUTE + clock.MINUTE_MS + 1000)
+    buffer.add('unknown', [1.0], 1, MINUTE + clock.MINUTE_MS + 2000)
+
+    summary = buffer.summary(5, by_minute=True, now_ms=MINUTE + 2 * clock.MINUTE_MS)
+    a, b = summary['targets']['a'], summary['targets']['b']
+    assert (a['samples'], a['lost'], a['rtt_p50'], a['rtt_max']) == (4, 1, 20.0, 30.0)
+    assert (b['samples'], b['lost'], b['loss_pct']) == (3, 2, 66.67)
+    assert [(m['samples'], m['lost'], m['rtt_max']) for m in a['by_minute']] == [(3, 1, 20.0), (1, 0, 30.0)]
+    assert [m['minute'] for m in b['by_minute']] == [
+        clock.format_minute(MINUTE), clock.format_minute(MINUTE + clock.MINUTE_MS)
+    ]
+    assert b['by_minute'][1]['rtt_avg'] is None
+
+    only = buffer.summary(5, target='b', now_ms=MINUTE + 2 * clock.MINUTE_MS)
+    assert list(only['targets']) == ['b']
+    assert buffer.summary(5, target='unknown', now_ms=MINUTE)['targets'] == {}
+
+
+def test_summary_window_after_wraparound():
+    """
+    После переполнения кольца в окно попадают только последние пробы.
+    """
+    buffer = recent.RecentBuffer(4, ['a'])
+    for i in range(6):
+        buffer.add('a', [float(i)], 1, MINUTE + i * 1000)
+    summary = buffer.summary(1, now_ms=MINUTE + 6000)
+    assert summary['targets']['a']['samples'] == 4
+    assert summary['targets']['a']['rtt_p50'] == 3.0
@@ -0,0 +1,67 @@
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import blobs  # noqa: E402
+import framestream  # noqa: E402
+import rollup  # noqa: E402
+
+MINUTE = 1_760_000_040_000
+
+
+def write_stream(path, records, store):
+    for record in records:
+        record = blobs.dedup_record(record, store)
+        if path.endswith('.gz'):
+            framestream.append_frame(path, [json.dumps(record)])
+        else:
+            with open(path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return list(framestream.iter_records(f, path))
+
+
+@pytest.mark.parametrize('extension', ['jsonl', 'jsonl.gz'])
+def test_rollup_keeps_blobs_of_uplinks_records(tmp_path, extension):
+    """
+    storage.dedup_raw + rollup anomalies + uplinks: после прореживания ping блобы,
+    на которые ссылаются записи uplinks, остаются в архиве.
+    """
+    ping_file = str(tmp_path / f'ping_s.{extension}')
+    uplinks_file = str(tmp_path / f'uplinks_s.{extension}')
+    blobs_file = str(tmp_path / f'blobs_s.{extension}')
+    store = blobs.BlobStore(blobs_file)
+
+    # Ровная минута без потерь: её записи ping при уровне anomalies удаляются
+    write_stream(ping_file, [
+        {"stamp": MINUTE + i * 1000, "target": "x", "raw": f"ping {i}", "sent": 1, "times_ms": [10.0],
+         "network_info": {"raw": "ip addr", "interfaces": []}}
+        for i in range(3)
+    ], store)
+    write_stream(uplinks_file, [
+        {"stamp": MINUTE + i * 1000, "target": "x", "raw": f"uplink {i}", "sent": 1, "times_ms": [12.0],
+         "interface": "wlan0"}
+        for i in range(3)
+    ], store)
+
+    rollup_config = SimpleNamespace(level='anomalies', spike_ms=500, anomaly_margin_minutes=1)
+    rollup.apply_rollup(
+        ping_file, None, None, blobs_file, str(tmp_path / 'rollup_s.json'), rollup_config, [uplinks_file]
+    )
+
+    assert read(ping_file) == []
+    hashes = {blob['hash'] for blob in read(blobs_file)}
+    refs = rollup.referenced_blobs(read(uplinks_file))
+    assert len(refs) == 3
+    assert refs <= hashes
+    # Блоб ping, на который больше никто не ссылается, удалён
+    assert blobs.blob_hash("ip addr") not in hashes
+
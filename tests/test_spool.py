@@ -0,0 +1,77 @@
+import io
+import json
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spool  # noqa: E402
+
+STAMPS = ['2025-10-09_12-00', '2025-10-09_12-10', '2025-10-09_12-20']
+COMPRESSIONS = [zipfile.ZIP_LZMA, zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED]
+
+RAW_COPY = spool._raw_copy_supported(zipfile.ZipFile(io.BytesIO(), 'w'))
+
+
+def members(stamp):
+    lines = ''.join(json.dumps({"stamp": i, "target": stamp, "times_ms": [10.0 + i]}) + '\n' for i in range(2000))
+    return {
+        f'ping_{stamp}.jsonl': lines.encode(),
+        f'trace_{stamp}.jsonl': b'',
+        f'losses_{stamp}.json': b'{}',
+    }
+
+
+@pytest.fixture
+def sending_dir(tmp_path):
+    for stamp, compression in zip(STAMPS, COMPRESSIONS):
+        with zipfile.ZipFile(tmp_path / f'archive_{stamp}.zip', 'w', compression=compression) as archive:
+            for name, data in members(stamp).items():
+                archive.writestr(name, data)
+    return str(tmp_path)
+
+
+def check_bundle(sending_dir, bundles):
+    assert [os.path.basename(b) for b in bundles] == [f'bundle_{STAMPS[0]}--{STAMPS[-1]}.zip']
+    assert spool.list_archives(sending_dir) == []
+    with zipfile.ZipFile(bundles[0]) as bundle:
+        assert bundle.testzip() is None
+        manifest = json.loads(bundle.read(spool.MANIFEST_NAME))
+        assert manifest["stamps"] == STAMPS
+        for stamp, compression in zip(STAMPS, COMPRESSIONS):
+            for name, data in members(stamp).items():
+                assert bundle.read(name) == data
+                assert bundle.getinfo(name).compress_type == compression
+
+
+@pytest.mark.skipif(not RAW_COPY, reason="в этой версии zipfile нет внутренностей для копирования без распаковки")
+def test_compact_copies_members_raw(sending_dir):
+    """
+    Пачка из архивов с разными методами сжатия: члены перенесены без распаковки и читаются.
+    """
+    sizes = {}
+    for stamp in STAMPS:
+        with zipfile.ZipFile(os.path.join(sending_dir, f'archive_{stamp}.zip')) as archive:
+            sizes.update((info.filename, info.compress_size) for info in archive.infolist())
+
+    bundles = spool.compact(sending_dir, 1, 1 << 30)
+    check_bundle(sending_dir, bundles)
+    with zipfile.ZipFile(bundles[0]) as bundle:
+        for name, size in sizes.items():
+            assert bundle.getinfo(name).compress_size == size
+
+
+def test_compact_streams_members_without_zipfile_internals(sending_dir, monkeypatch):
+    """
+    Без внутренностей zipfile члены перепаковываются потоково, результат тот же.
+    """
+    monkeypatch.setattr(spool, '_raw_copy_supported', lambda bundle: False)
+    check_bundle(sending_dir, spool.compact(sending_dir, 1, 1 << 30))
+
+
+def test_compact_below_threshold(sending_dir):
+    assert spool.compact(sending_dir, len(STAMPS), 1 << 30) == []
+    assert len(spool.list_archives(sending_dir)) == len(STAMPS)
@@ -0,0 +1,118 @@
+import asyncio
+import os
+import socket
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nettools  # noqa: E402
+import tcpprobe  # noqa: E402
+
+NETWORK_INFO = {"raw": "stub", "interfaces": []}
+
+
+@pytest.fixture(autouse=True)
+def stub_network_info(monkeypatch):
+    # network_info вызывает ip/ipconfig - в тестах проверяется только то, что она попала в запись
+    monkeypatch.setattr(nettools, 'network_info', lambda: NETWORK_INFO)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def serve(handler):
+    server = await asyncio.start_server(handler, '127.0.0.1', 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def test_tcp_connect_rtt():
+    """
+    Запись tcp-пробы до локального listener: время рукопожатия по каждой попытке, без ошибок.
+    """
+    async def scenario():
+        async def accept(reader, writer):
+            writer.close()
+
+        server, port = await serve(accept)
+        async with server:
+            return await tcpprobe.probe(f'tcp://127.0.0.1:{port}', 4, timeout=2.0)
+
+    record = asyncio.run(scenario())
+    assert record["probe"] == 'tcp'
+    assert record["sent"] == 4
+    assert len(record["times_ms"]) == 4
+    assert all(0 <= t < 1000 for t in record["times_ms"])
+    assert record["avg_ms"] == round(sum(record["times_ms"]) / 4, 2)
+    assert all(end >= start for start, end in record["packet_times"])
+    assert record["errors"] == {}
+    assert record["network_info"] == NETWORK_INFO
+    assert "ttfb_ms" not in record
+
+
+def test_http_ttfb():
+    """
+    http-проба: рукопожатие и время до первого байта ответа на HEAD.
+    """
+    async def scenario():
+        async def respond(reader, writer):
+            await reader.readuntil(b'\r\n\r\n')
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n')
+            await writer.drain()
+            writer.close()
+
+        server, port = await serve(respond)
+        async with server:
+            return await tcpprobe.probe(f'http://127.0.0.1:{port}/health', 2, timeout=2.0)
+
+    record = asyncio.run(scenario())
+    assert record["probe"] == 'http'
+    assert len(record["times_ms"]) == 2
+    assert len(record["ttfb_ms"]) == 2
+    assert record["errors"] == {}
+
+
+def test_refused():
+    """
+    Порт без listener: все попытки - refused, RTT нет.
+    """
+    record = asyncio.run(tcpprobe.probe(f'tcp://127.0.0.1:{free_port()}', 3, timeout=2.0))
+    assert record["times_ms"] == []
+    assert record["avg_ms"] is None
+    assert record["errors"] == {'refused': 3}
+
+
+def test_timeout():
+    """
+    Сервер принимает соединение, но не отвечает: http-попытки завершаются по таймауту.
+    """
+    async def scenario():
+        connections = []
+
+        async def silent(reader, writer):
+            connections.append(writer)
+
+        server, port = await serve(silent)
+        async with server:
+            record = await tcpprobe.probe(f'http://127.0.0.1:{port}/', 2, timeout=0.3)
+            for writer in connections:
+                writer.close()
+            return record
+
+    record = asyncio.run(scenario())
+    assert record["times_ms"] == []
+    assert record["ttfb_ms"] == []
+    assert record["errors"] == {'timeout': 2}
+
+
+def test_resolve_error():
+    """
+    Имя не разрешается: ошибка resolve на все попытки.
+    """
+    record = asyncio.run(tcpprobe.probe('tcp://nonexistent.invalid:80', 2, timeout=2.0))
+    assert record["errors"] == {'resolve': 2}
+    assert record["times_ms"] == []
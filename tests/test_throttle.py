@@ -0,0 +1,105 @@
+import asyncio
+import io
+import os
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import throttle  # noqa: E402
+
+PAYLOAD = os.urandom(256 * 1024)
+
+
+class StandInServer:
+    """
+    Заглушка сервера приёма архивов: считает принятые байты и время приёма.
+    """
+
+    def __init__(self):
+        self.received = 0
+        self.first_byte = None
+        self.last_byte = None
+
+    async def upload(self, request):
+        async for chunk in request.content.iter_chunked(16 * 1024):
+            now = time.monotonic()
+            self.first_byte = self.first_byte or now
+            self.last_byte = now
+            self.received += len(chunk)
+        return web.Response(text='ok')
+
+    def throughput(self):
+        return self.received / (self.last_byte - self.first_byte)
+
+
+async def upload(stats, rate_limit, pause_during_probes=True, max_pause_secs=5.0):
+    server = StandInServer()
+    app = web.Application(client_max_size=1 << 24)
+    app.router.add_post('/upload/test/', server.upload)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    port = runner.addresses[0][1]
+
+    async def read_fn(fileobj, size):
+        return fileobj.read(size)
+
+    data = aiohttp.FormData()
+    data.add_field(
+        'file',
+        throttle.throttled_chunks(
+            io.BytesIO(PAYLOAD), read_fn, 16 * 1024, rate_limit, pause_during_probes, max_pause_secs, stats
+        ),
+        filename='archive.zip', content_type='application/zip'
+    )
+    try:
+        with throttle.uploading():
+            async with aiohttp.ClientSession() as session:
+                async with session.post(f'http://127.0.0.1:{port}/upload/test/', data=data) as resp:
+                    assert resp.status == 200
+    finally:
+        await runner.cleanup()
+    return server
+
+
+def test_rate_limit_measured_at_server():
+    """
+    Пропускная способность, измеренная сервером, не превышает ограничения (с учётом запаса ведра).
+    """
+    rate = 512 * 1024
+    stats = throttle.UploadStats()
+    started = time.monotonic()
+    server = asyncio.run(upload(stats, rate))
+    elapsed = time.monotonic() - started
+
+    assert server.received > len(PAYLOAD)
+    assert stats.bytes == len(PAYLOAD)
+    # Первые rate / 10 байт уходят без ожидания, остальное - со скоростью rate
+    assert elapsed >= (len(PAYLOAD) - rate // 10) / rate * 0.9
+    assert server.throughput() < rate * 1.5
+
+
+def test_upload_pauses_while_probe_runs():
+    """
+    Пока идёт проба, отправка стоит; окно пробы видит открытую отправку.
+    """
+    async def scenario():
+        stats = throttle.UploadStats()
+        bytes_before = throttle.shared_state()[throttle.UPLOAD_BYTES]
+        with throttle.probing() as window:
+            task = asyncio.ensure_future(upload(stats, 0))
+            await asyncio.sleep(0.3)
+            sent_during_probe = stats.bytes
+        await task
+        return stats, window, sent_during_probe, throttle.shared_state()[throttle.UPLOAD_BYTES] - bytes_before
+
+    stats, window, sent_during_probe, counted = asyncio.run(scenario())
+    assert sent_during_probe == 0
+    assert stats.pauses == 1
+    assert stats.paused_secs >= 0.2
+    assert stats.bytes == counted == len(PAYLOAD)
+    assert window.flags()["upload_in_flight"] is True
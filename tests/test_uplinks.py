@@ -0,0 +1,45 @@
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uplinks  # noqa: E402
+
+INTERFACES = [
+    {"name": "lo", "ipv4": "127.0.0.1", "inferred_type": "loopback"},
+    {"name": "eth0", "ipv4": "192.168.1.10", "gateway": "192.168.1.1", "inferred_type": "ethernet"},
+    {"name": "wwan0", "ipv4": "10.64.0.2", "inferred_type": "cellular"},
+    {"name": "docker0", "ipv4": "172.17.0.1", "inferred_type": "ethernet"},
+    {"name": "wlan0", "ipv4": "192.168.2.10", "gateway": "192.168.2.1", "status": "down"},
+    {"name": "tun0", "ipv4": "10.8.0.2", "gateway": "10.8.0.1", "inferred_type": "vpn"},
+]
+
+
+def names(selected):
+    return [iface["name"] for iface in selected]
+
+
+def test_auto_discovery_requires_gateway():
+    """
+    Без списка имён берутся только интерфейсы со шлюзом по умолчанию.
+    """
+    assert names(uplinks.select(INTERFACES)) == ['eth0']
+
+
+def test_configured_interface_without_gateway_is_kept(caplog):
+    """
+    Явно заданный интерфейс без шлюза (резервный канал) проверяется; о заданных, но
+    непригодных интерфейсах пишется предупреждение.
+    """
+    with caplog.at_level(logging.WARNING):
+        selected = uplinks.select(INTERFACES, ['eth0', 'wwan0', 'wlan0', 'ppp0'])
+    assert names(selected) == ['eth0', 'wwan0']
+    assert selected[1] == {"name": "wwan0", "ipv4": "10.64.0.2", "inferred_type": "cellular"}
+    assert 'ppp0, wlan0' in caplog.text
+
+
+def test_no_warning_when_all_configured_found(caplog):
+    with caplog.at_level(logging.WARNING):
+        assert names(uplinks.select(INTERFACES, ['wwan0'])) == ['wwan0']
+    assert caplog.text == ''
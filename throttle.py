@@ -0,0 +1,177 @@
+import asyncio
+import multiprocessing
+import time
+from contextlib import contextmanager
+
+# Общие для процессов счетчики: [идущих проб, идущих отправок, отправлено байт]
+PROBES = 0
+UPLOADS = 1
+UPLOAD_BYTES = 2
+
+_state = None
+
+
+def shared_state():
+    """
+    Состояние процесса; создаётся при первом обращении. Главный процесс передаёт его
+    воркерам (attach), чтобы отправка в главном процессе видела пробы воркеров.
+    """
+    global _state
+    if _state is None:
+        _state = multiprocessing.Array('q', 3)
+    return _state
+
+
+def attach(state):
+    """
+    Подключает процесс-воркер к состоянию главного процесса.
+    """
+    global _state
+    _state = state
+
+
+def _add(index, value):
+    state = shared_state()
+    with state.get_lock():
+        state[index] += value
+
+
+def _get(index):
+    return shared_state()[index]
+
+
+class ProbeWindow:
+    """
+    Окно одной пробы: была ли во время неё открыта отправка и сколько байт ушло.
+    """
+
+    def __init__(self):
+        self.upload_seen = _get(UPLOADS) > 0
+        self.bytes_before = _get(UPLOAD_BYTES)
+        self.bytes_during = 0
+
+    def close(self):
+        self.upload_seen = self.upload_seen or _get(UPLOADS) > 0
+        self.bytes_during = _get(UPLOAD_BYTES) - self.bytes_before
+
+    def flags(self):
+        """
+        Поля для записи пробы.
+        """
+        return {
+            "upload_in_flight": self.upload_seen or self.bytes_during > 0,
+            "upload_bytes": self.bytes_during
+        }
+
+
+@contextmanager
+def probing():
+    """
+    Отмечает, что идёт проба задержки: на это время отправка архивов приостанавливается.
+    """
+    window = ProbeWindow()
+    _add(PROBES, 1)
+    try:
+        yield window
+    finally:
+        _add(PROBES, -1)
+        window.close()
+
+
+@contextmanager
+def uploading():
+    """
+    Отмечает, что идёт отправка архива.
+    """
+    _add(UPLOADS, 1)
+    try:
+        yield
+    finally:
+        _add(UPLOADS, -1)
+
+
+def probes_active():
+    return _get(PROBES) > 0
+
+
+class TokenBucket:
+    """
+    Ограничение скорости: не больше rate байт в секунду с запасом capacity байт.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    async def consume(self, amount):
+        amount = min(amount, self.capacity)
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class UploadStats:
+    """
+    Статистика одной отправки: байты, время, паузы на время проб.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.bytes = 0
+        self.pauses = 0
+        self.paused_secs = 0.0
+
+    def throughput(self):
+        elapsed = time.monotonic() - self.started
+        return self.bytes / elapsed if elapsed > 0 else 0.0
+
+
+async def wait_probes(max_pause_secs, poll_secs=0.05):
+    """
+    Ждёт окончания идущих проб, но не дольше max_pause_secs.
+
+    :return: Сколько секунд ждали.
+    """
+    if not probes_active():
+        return 0.0
+    started = time.monotonic()
+    while probes_active() and time.monotonic() - started < max_pause_secs:
+        await asyncio.sleep(poll_secs)
+    return time.monotonic() - started
+
+
+async def throttled_chunks(fileobj, read_fn, chunk_bytes, rate_limit, pause_during_probes, max_pause_secs, stats):
+    """
+    Отдаёт файл кусками с ограничением скорости и паузами на время проб задержки.
+
+    :param fileobj: Открытый бинарный файл.
+    :param read_fn: Асинхронная функция чтения (fileobj, size) -> bytes, вне event loop.
+    :param chunk_bytes: Размер куска.
+    :param rate_limit: Ограничение, байт/с (0 - без ограничения).
+    :param pause_during_probes: Останавливаться, пока идут пробы.
+    :param max_pause_secs: Максимальная пауза перед одним куском.
+    :param stats: UploadStats, обновляется на месте.
+    :return: Асинхронный генератор байтов.
+    """
+    bucket = TokenBucket(rate_limit, max(chunk_bytes, rate_limit // 10)) if rate_limit > 0 else None
+    while True:
+        chunk = await read_fn(fileobj, chunk_bytes)
+        if not chunk:
+            break
+        if pause_during_probes:
+            paused = await wait_probes(max_pause_secs)
+            if paused:
+                stats.pauses += 1
+                stats.paused_secs += paused
+        if bucket is not None:
+            await bucket.consume(len(chunk))
+        stats.bytes += len(chunk)
+        _add(UPLOAD_BYTES, len(chunk))
+        yield chunk
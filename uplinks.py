@@ -0,0 +1,90 @@
+import logging
+import platform
+import re
+import socket
+import time
+
+import executors
+import nettools
+
+# Типы интерфейсов, через которые не проверяются отдельные каналы
+SKIPPED_TYPES = ('loopback', 'vpn')
+
+# Кэш списка интерфейсов: (время обновления, список)
+_cache = (None, [])
+
+
+def clean_ipv4(value):
+    """
+    IPv4-адрес без приписок ipconfig ("192.168.1.5(Основной)" -> "192.168.1.5").
+    """
+    match = re.match(r'\s*(\d+\.\d+\.\d+\.\d+)', value or '')
+    return match.group(1) if match else None
+
+
+def select(interfaces, names=None):
+    """
+    Интерфейсы, через которые можно проверять каналы: поднятые, с IPv4, не loopback и не VPN.
+    При автоматическом выборе (names пуст) нужен ещё шлюз по умолчанию: без него интерфейс
+    не ведёт наружу (мосты docker, виртуальные сети). Явно заданные интерфейсы берутся и без
+    шлюза - у резервного канала маршрут по умолчанию часто только в отдельной таблице.
+
+    :param interfaces: Интерфейсы из network_info.
+    :param names: Только интерфейсы с этими именами (пусто - все подходящие).
+    :return: Список {"name", "ipv4", "inferred_type"}.
+    """
+    selected = []
+    for iface in interfaces:
+        if names and iface.get('name') not in names:
+            continue
+        ipv4 = clean_ipv4(iface.get('ipv4'))
+        if ipv4 is None or iface.get('status') == 'down' or iface.get('inferred_type') in SKIPPED_TYPES:
+            continue
+        if not names and not iface.get('gateway'):
+            continue
+        selected.append({"name": iface['name'], "ipv4": ipv4, "inferred_type": iface.get('inferred_type')})
+    missing = sorted(set(names or ()) - {iface['name'] for iface in selected})
+    if missing:
+        logging.warning(
+            "[UPLINK] Интерфейсы из uplinks.interfaces не проверяются (нет, выключены или без IPv4): %s",
+            ', '.join(missing)
+        )
+    return selected
+
+
+async def current(uplinks_config):
+    """
+    Текущий список каналов. Интерфейсы перечитываются не чаще раза в refresh_secs.
+
+    :param uplinks_config: UplinksConfig.
+    :return: Список интерфейсов (select).
+    """
+    global _cache
+    updated, interfaces = _cache
+    if updated is None or time.monotonic() - updated >= uplinks_config.refresh_secs:
+        info = await executors.run('ping', nettools.network_info)
+        interfaces = select(info['interfaces'], uplinks_config.interfaces)
+        _cache = (time.monotonic(), interfaces)
+    return interfaces
+
+
+def ping_source(interface):
+    """
+    Аргумент привязки для системного ping: на Linux имя интерфейса (ping -I, SO_BINDTODEVICE),
+    на Windows и macOS - адрес источника (ping -S).
+    """
+    return interface['name'] if platform.system().lower() == 'linux' else interface['ipv4']
+
+
+def bind_socket(sock, interface):
+    """
+    Привязывает сокет TCP-пробы к интерфейсу. На Linux сначала пробуется SO_BINDTODEVICE
+    (выход точно через этот интерфейс), при отказе в правах - привязка к адресу источника.
+    """
+    if hasattr(socket, 'SO_BINDTODEVICE'):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, interface['name'].encode())
+            return
+        except OSError:
+            pass
+    sock.bind((interface['ipv4'], 0))